@@ -0,0 +1,155 @@
+from unittest import IsolatedAsyncioTestCase
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from traction_innkeeper.v1_0.oca.bundle_resolver import (
+    OcaBundleResolveError,
+    OcaBundleResolver,
+)
+
+BUNDLE = {"capture_base": {"attributes": {"name": "Text"}}}
+ETAG = '"v1"'
+
+
+class OriginTestCase(IsolatedAsyncioTestCase):
+    """An origin server on 127.0.0.1, serving bundles with an ETag."""
+
+    async def asyncSetUp(self):
+        self.requests = []
+        app = web.Application()
+        app.router.add_get("/bundle.json", self.bundle)
+        app.router.add_get("/large.json", self.large)
+        app.router.add_get("/streamed.json", self.streamed)
+        app.router.add_get("/redirect", self.redirect)
+        self.server = TestServer(app, host="127.0.0.1")
+        await self.server.start_server()
+        self.url = str(self.server.make_url("/bundle.json"))
+        self.resolvers = []
+
+    async def asyncTearDown(self):
+        for resolver in self.resolvers:
+            await resolver.close()
+        await self.server.close()
+
+    def resolver(self, **kwargs) -> OcaBundleResolver:
+        kwargs.setdefault("allowed_hosts", ["127.0.0.1"])
+        resolver = OcaBundleResolver(**kwargs)
+        self.resolvers.append(resolver)
+        return resolver
+
+    async def bundle(self, request: web.Request):
+        self.requests.append(request.headers.get("If-None-Match"))
+        if request.headers.get("If-None-Match") == ETAG:
+            return web.Response(status=304, headers={"ETag": ETAG})
+        return web.json_response(BUNDLE, headers={"ETag": ETAG})
+
+    async def large(self, request: web.Request):
+        return web.json_response({"padding": "x" * 2048})
+
+    async def streamed(self, request: web.Request):
+        # no content length, the size is only known while reading
+        response = web.StreamResponse()
+        await response.prepare(request)
+        await response.write(b'{"padding": "')
+        for _ in range(4):
+            await response.write(b"x" * 1024)
+        await response.write(b'"}')
+        await response.write_eof()
+        return response
+
+    async def redirect(self, request: web.Request):
+        raise web.HTTPFound(request.query["to"])
+
+
+class TestResolve(OriginTestCase):
+    async def test_fetches_bundle(self):
+        resolver = self.resolver()
+        assert await resolver.resolve(self.url) == BUNDLE
+        # served from the cache while fresh
+        assert await resolver.resolve(self.url) == BUNDLE
+        assert self.requests == [None]
+
+    async def test_revalidates_with_etag(self):
+        resolver = self.resolver(max_age=0)
+        assert await resolver.resolve(self.url) == BUNDLE
+        assert await resolver.resolve(self.url) == BUNDLE
+        assert self.requests == [None, ETAG]
+
+    async def test_serves_stale_when_origin_is_down(self):
+        resolver = self.resolver(max_age=0)
+        assert await resolver.resolve(self.url) == BUNDLE
+        await self.server.close()
+        assert await resolver.resolve(self.url) == BUNDLE
+
+    async def test_fails_when_origin_is_down_and_not_cached(self):
+        resolver = self.resolver()
+        await self.server.close()
+        with self.assertRaises(OcaBundleResolveError):
+            await resolver.resolve(self.url)
+
+    async def test_refuses_large_bundle(self):
+        resolver = self.resolver(max_size=1024)
+        with self.assertRaises(OcaBundleResolveError):
+            await resolver.resolve(str(self.server.make_url("/large.json")))
+
+    async def test_refuses_large_streamed_bundle(self):
+        resolver = self.resolver(max_size=1024)
+        with self.assertRaises(OcaBundleResolveError):
+            await resolver.resolve(str(self.server.make_url("/streamed.json")))
+
+    async def test_follows_redirect(self):
+        resolver = self.resolver()
+        url = self.server.make_url("/redirect").with_query(to="/bundle.json")
+        assert await resolver.resolve(str(url)) == BUNDLE
+
+
+class TestRefuse(OriginTestCase):
+    async def test_refuses_other_schemes(self):
+        resolver = self.resolver()
+        for url in ("file:///etc/passwd", "ftp://127.0.0.1/bundle.json"):
+            with self.assertRaises(OcaBundleResolveError):
+                await resolver.resolve(url)
+
+    async def test_refuses_loopback_address(self):
+        resolver = self.resolver(allowed_hosts=[])
+        with self.assertRaises(OcaBundleResolveError):
+            await resolver.resolve(self.url)
+        assert self.requests == []
+
+    async def test_refuses_private_and_link_local_addresses(self):
+        resolver = self.resolver(allowed_hosts=[])
+        for url in (
+            "http://10.0.0.1/bundle.json",
+            "http://192.168.1.1/bundle.json",
+            "http://169.254.169.254/latest/meta-data",
+            "http://[::1]/bundle.json",
+            "http://[fe80::1]/bundle.json",
+        ):
+            with self.assertRaises(OcaBundleResolveError):
+                await resolver.resolve(url)
+
+    async def test_refuses_name_resolving_to_loopback(self):
+        resolver = self.resolver(allowed_hosts=[])
+        url = self.server.make_url("/bundle.json").with_host("localhost")
+        with self.assertRaises(OcaBundleResolveError):
+            await resolver.resolve(str(url))
+        assert self.requests == []
+
+    async def test_refuses_redirect_to_loopback(self):
+        resolver = self.resolver()
+        target = self.server.make_url("/bundle.json").with_host("localhost")
+        url = self.server.make_url("/redirect").with_query(to=str(target))
+        with self.assertRaises(OcaBundleResolveError):
+            await resolver.resolve(str(url))
+        assert self.requests == []
+
+    async def test_refuses_redirect_to_other_scheme(self):
+        resolver = self.resolver()
+        url = self.server.make_url("/redirect").with_query(to="file:///etc/passwd")
+        with self.assertRaises(OcaBundleResolveError):
+            await resolver.resolve(str(url))
+
+    async def test_allow_private(self):
+        resolver = self.resolver(allowed_hosts=[], allow_private=True)
+        assert await resolver.resolve(self.url) == BUNDLE
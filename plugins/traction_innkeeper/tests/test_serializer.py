@@ -0,0 +1,130 @@
+import uuid
+from datetime import datetime, timezone
+
+import pytest
+
+from traction_innkeeper.v1_0.innkeeper.models import (
+    ReservationRecord,
+    TenantAuthenticationApiRecord,
+    TenantRecord,
+)
+from traction_innkeeper.v1_0.innkeeper.serializer import (
+    serialize_record,
+    serialize_records,
+)
+from traction_innkeeper.v1_0.oca.models import OcaRecord
+
+CREATED_AT = "2023-01-02T03:04:05.123456Z"
+
+
+def tenants():
+    return [
+        # only the required fields, the rest None or default
+        TenantRecord(tenant_name="minimal"),
+        TenantRecord(
+            tenant_id=str(uuid.uuid4()),
+            tenant_name="Acme Corp",
+            wallet_id=str(uuid.uuid4()),
+            state=TenantRecord.STATE_DELETED,
+            curr_ledger_id="bcovrin-test",
+            connected_to_endorsers=[
+                {"endorser_alias": "endorser", "ledger_id": "bcovrin-test"}
+            ],
+            created_public_did=["bcovrin-test"],
+            auto_issuer=True,
+            enable_ledger_switch=True,
+            deleted_at=CREATED_AT,
+            contact_email="admin@acme.example",
+            created_at=CREATED_AT,
+            updated_at=CREATED_AT,
+        ),
+    ]
+
+
+def reservations():
+    return [
+        # reservation_id is derived from the record id, which every saved one has
+        ReservationRecord(
+            reservation_id=str(uuid.uuid4()),
+            tenant_name="minimal",
+            contact_email="min@example.com",
+        ),
+        ReservationRecord(
+            reservation_id=str(uuid.uuid4()),
+            state=ReservationRecord.STATE_APPROVED,
+            tenant_name="Acme Corp",
+            tenant_reason="testing",
+            contact_name="Alice",
+            contact_email="alice@acme.example",
+            contact_phone="555-0100",
+            context_data={"tenant_reason": "testing", "nested": {"n": 1}},
+            tenant_id=str(uuid.uuid4()),
+            wallet_id=str(uuid.uuid4()),
+            reservation_token_salt="salt",
+            reservation_token_hash="hash",
+            reservation_token_expiry=datetime(2023, 1, 2, tzinfo=timezone.utc),
+            state_notes="approved for testing",
+            connect_to_endorsers=[{"endorser_alias": "endorser"}],
+            create_public_did=["bcovrin-test"],
+            created_at=CREATED_AT,
+            updated_at=CREATED_AT,
+        ),
+    ]
+
+
+def api_keys():
+    return [
+        TenantAuthenticationApiRecord(tenant_id=str(uuid.uuid4())),
+        TenantAuthenticationApiRecord(
+            tenant_authentication_api_id=str(uuid.uuid4()),
+            tenant_id=str(uuid.uuid4()),
+            api_key_token_salt="salt",
+            api_key_token_hash="hash",
+            alias="ci key",
+            created_at=CREATED_AT,
+            updated_at=CREATED_AT,
+        ),
+    ]
+
+
+def ocas():
+    return [
+        OcaRecord(schema_id="WgWxqztrNooG92RXvxSTWv:2:schema_name:1.0"),
+        OcaRecord(
+            oca_id=str(uuid.uuid4()),
+            cred_def_id="WgWxqztrNooG92RXvxSTWv:3:CL:20:tag",
+            url="https://example.com/bundle.json",
+            owner_did="WgWxqztrNooG92RXvxSTWv",
+            created_at=CREATED_AT,
+            updated_at=CREATED_AT,
+        ),
+        OcaRecord(
+            oca_id=str(uuid.uuid4()),
+            schema_id="WgWxqztrNooG92RXvxSTWv:2:schema_name:1.0",
+            cred_def_id="WgWxqztrNooG92RXvxSTWv:3:CL:20:tag",
+            bundle={"capture_base": {"attributes": {"name": "Text"}}},
+            bundle_hash="abc123",
+            owner_did="WgWxqztrNooG92RXvxSTWv",
+        ),
+    ]
+
+
+@pytest.mark.parametrize(
+    "records",
+    [tenants(), reservations(), api_keys(), ocas()],
+    ids=["tenant", "reservation", "api_key", "oca"],
+)
+def test_serialize_records_matches_serialize(records):
+    assert serialize_records(records) == [r.serialize() for r in records]
+
+
+@pytest.mark.parametrize(
+    "record",
+    tenants() + reservations() + api_keys() + ocas(),
+)
+def test_serialize_record_matches_serialize(record):
+    assert serialize_record(record) == record.serialize()
+
+
+def test_serialize_records_empty():
+    assert serialize_records([]) == []
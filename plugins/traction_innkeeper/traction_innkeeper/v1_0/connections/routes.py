@@ -11,6 +11,8 @@ from aries_cloudagent.protocols.connections.v1_0.routes import (
 )
 from aries_cloudagent.storage.error import StorageNotFoundError
 
+from ..innkeeper.responses import json_response
+
 
 LOGGER = logging.getLogger(__name__)
 
@@ -61,7 +63,7 @@ async def connections_invitation(request: web.BaseRequest):
     if connection.alias:
         result["alias"] = connection.alias
 
-    return web.json_response(result)
+    return json_response(request, result)
 
 
 async def register(app: web.Application):
@@ -11,6 +11,12 @@ from aries_cloudagent.messaging.models.openapi import OpenAPISchema
 from aries_cloudagent.storage.error import StorageNotFoundError, StorageError
 from marshmallow import fields
 
+from ..innkeeper.responses import (
+    CACHE_REVALIDATE,
+    json_response,
+    record_response,
+)
+from ..innkeeper.serializer import serialize_records
 from .models import CredDefStorageRecordSchema
 from .creddef_storage_service import CredDefStorageService
 
@@ -73,9 +79,9 @@ async def creddef_storage_list(request: web.BaseRequest):
     tag_filter = {}
     post_filter = {}
     records = await storage_srv.list_items(profile, tag_filter, post_filter)
-    results = [record.serialize() for record in records]
+    results = serialize_records(records)
 
-    return web.json_response({"results": results})
+    return json_response(request, {"results": results})
 
 
 @docs(
@@ -90,9 +96,17 @@ async def creddef_storage_get(request: web.BaseRequest):
     storage_srv = context.inject_or(CredDefStorageService)
     cred_def_id = request.match_info["cred_def_id"]
 
+    # read first, the record may have been deleted (or be another tenant's)
     record = await storage_srv.read_item(profile, cred_def_id)
-
-    return web.json_response(record.serialize())
+    if not record:
+        raise web.HTTPNotFound(reason=f"Credential definition {cred_def_id} not found.")
+
+    return record_response(
+        request,
+        record,
+        cache_control=CACHE_REVALIDATE,
+        wallet_id=profile.settings.get("wallet.id"),
+    )
 
 
 @docs(
@@ -109,7 +123,7 @@ async def creddef_storage_remove(request: web.BaseRequest):
 
     success = await storage_srv.remove_item(profile, cred_def_id)
 
-    return web.json_response({"success": success})
+    return json_response(request, {"success": success})
 
 
 async def register(app: web.Application):
@@ -16,6 +16,7 @@ from aries_cloudagent.storage.error import StorageNotFoundError, StorageError
 from aries_cloudagent.wallet.error import WalletError
 from marshmallow import fields
 
+from ..innkeeper.responses import json_response
 from .endorser_connection_service import EndorserConnectionService
 from ..tenant.routes import SWAGGER_CATEGORY
 from ..innkeeper.tenant_manager import TenantManager
@@ -107,9 +108,9 @@ async def endorser_connection_set(request: web.BaseRequest):
     if not info:
         raise web.HTTPConflict(reason="Endorser is not configured")
 
-    request = await endorser_srv.connect_with_endorser(profile, context.injector)
+    conn_record = await endorser_srv.connect_with_endorser(profile, context.injector)
 
-    return web.json_response(request.serialize())
+    return json_response(request, conn_record.serialize())
 
 
 @docs(
@@ -128,7 +129,7 @@ async def endorser_connection_get(request: web.BaseRequest):
     if not rec:
         raise web.HTTPNotFound(reason="Connection with endorser not found")
 
-    return web.json_response(rec.serialize())
+    return json_response(request, rec.serialize())
 
 
 @docs(
@@ -147,7 +148,7 @@ async def endorser_info_get(request: web.BaseRequest):
     if not info:
         raise web.HTTPNotFound(reason="Configured Endorser Information not found.")
 
-    return web.json_response(info)
+    return json_response(request, info)
 
 
 async def register(app: web.Application):
@@ -8,14 +8,18 @@ from aries_cloudagent.core.event_bus import EventBus, Event
 from aries_cloudagent.core.plugin_registry import PluginRegistry
 from aries_cloudagent.core.profile import Profile
 from aries_cloudagent.core.protocol_registry import ProtocolRegistry
-from aries_cloudagent.core.util import STARTUP_EVENT_PATTERN
+from aries_cloudagent.core.util import SHUTDOWN_EVENT_PATTERN, STARTUP_EVENT_PATTERN
 
+from .cache import TenantRecordCache
 from .config import get_config
+from .invalidation import TOPIC_TENANT
+from .models import TENANT_EVENT_TOPIC, InnkeeperStatsRecord
 from .tenant_manager import TenantManager
 
 LOGGER = logging.getLogger(__name__)
 
 CONNECTIONS_EVENT_PATTERN = re.compile(f"acapy::record::{ConnRecord.RECORD_TOPIC}::.*")
+TENANT_EVENT_PATTERN = re.compile(f"^{TENANT_EVENT_TOPIC}$")
 
 
 async def setup(context: InjectionContext):
@@ -34,6 +38,8 @@ async def setup(context: InjectionContext):
         raise ValueError("EventBus missing in context")
 
     bus.subscribe(STARTUP_EVENT_PATTERN, on_startup)
+    bus.subscribe(SHUTDOWN_EVENT_PATTERN, on_shutdown)
+    bus.subscribe(TENANT_EVENT_PATTERN, on_tenant_event)
 
     LOGGER.info("< plugin setup.")
 
@@ -46,7 +52,22 @@ async def on_startup(profile: Profile, event: Event):
         _config = get_config(profile.settings)
         mgr = TenantManager(profile, _config)
         profile.context.injector.bind_instance(TenantManager, mgr)
+        if _config.tenant_cache.enabled:
+            profile.context.injector.bind_instance(
+                TenantRecordCache,
+                TenantRecordCache(
+                    _config.tenant_cache.max_size, _config.tenant_cache.ttl_seconds
+                ),
+            )
+        await mgr.invalidation.start()
+        # before any record is saved, so existing records are counted
+        await InnkeeperStatsRecord.ensure(mgr.profile)
         await mgr.create_innkeeper()
+        await mgr.wallet_pool.start()
+        await mgr.reservation_sweeper.start()
+        await mgr.stats_folder.start()
+        await mgr.tenant_purge.start()
+        mgr.server_config.rebuild()
     else:
         # what type of error should this throw?
         raise ValueError(
@@ -54,3 +75,28 @@ async def on_startup(profile: Profile, event: Event):
         )
 
     LOGGER.info("< on_startup")
+
+
+async def on_shutdown(profile: Profile, event: Event):
+    mgr = profile.inject_or(TenantManager)
+    if mgr:
+        # background tasks first, they use the crypto pool and the bus
+        await mgr.tenant_purge.stop()
+        await mgr.stats_folder.stop()
+        await mgr.reservation_sweeper.stop()
+        await mgr.wallet_pool.stop()
+        mgr.crypto.shutdown()
+        await mgr.invalidation.stop()
+
+
+async def on_tenant_event(profile: Profile, event: Event):
+    # a tenant record was saved or deleted, drop cached copies (on all instances)
+    mgr = profile.inject_or(TenantManager)
+    if mgr:
+        await mgr.invalidation.publish(
+            TOPIC_TENANT,
+            {
+                "tenant_id": event.payload.get("tenant_id"),
+                "wallet_id": event.payload.get("wallet_id"),
+            },
+        )
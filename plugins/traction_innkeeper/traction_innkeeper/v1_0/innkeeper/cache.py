@@ -0,0 +1,179 @@
+import hashlib
+import hmac
+import logging
+import secrets
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional, Tuple
+
+LOGGER = logging.getLogger(__name__)
+
+
+class TTLCache:
+    """Bounded in-process LRU cache with a time-to-live on each entry.
+
+    Entries are evicted when they expire or, once the cache is full, in least
+    recently used order. All operations are synchronous; the cache is meant to
+    be used from the (single) event loop only.
+    """
+
+    def __init__(self, max_size: int, ttl: float):
+        """
+        Initialize a TTLCache.
+
+        Args:
+            max_size: The maximum number of entries to hold
+            ttl: The default number of seconds an entry stays valid
+        """
+        self._max_size = max(max_size, 0)
+        self._ttl = ttl
+        # looks like { key: (expires, value) }
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+
+    @property
+    def max_size(self) -> int:
+        return self._max_size
+
+    @property
+    def ttl(self) -> float:
+        return self._ttl
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._data.get(key)
+        if entry is None:
+            return default
+        expires, value = entry
+        if time.monotonic() >= expires:
+            del self._data[key]
+            return default
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        if not self._max_size:
+            return
+        expires = time.monotonic() + (self._ttl if ttl is None else ttl)
+        self._data[key] = (expires, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self._max_size:
+            self._data.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._data.pop(key, None)
+        return default if entry is None else entry[1]
+
+    def evict(self, predicate: Callable[[Hashable, Any], bool]) -> int:
+        """Remove every entry for which predicate(key, value) is true."""
+        keys = [k for k, (_, v) in self._data.items() if predicate(k, v)]
+        for k in keys:
+            del self._data[k]
+        return len(keys)
+
+    def clear(self):
+        self._data.clear()
+
+
+class ApiKeyCache:
+    """Cache of successful API key verifications.
+
+    Verifying an API key costs several bcrypt rounds per candidate record, so
+    once a key has been verified we remember it for a short time. Entries are
+    keyed by an HMAC of (tenant_id, api_key) under a per-process secret, so the
+    plain key is never held in memory longer than the request that carried it.
+    The cached value is the id of the TenantAuthenticationApiRecord that
+    matched, which lets us drop entries when that record is deleted.
+    """
+
+    def __init__(self, max_size: int, ttl: float):
+        self._secret = secrets.token_bytes(32)
+        self._cache = TTLCache(max_size, ttl)
+
+    def _digest(self, tenant_id: str, api_key: str) -> str:
+        msg = f"{tenant_id}\x00{api_key}".encode("utf-8")
+        return hmac.new(self._secret, msg, hashlib.sha256).hexdigest()
+
+    def get(self, tenant_id: str, api_key: str) -> Optional[str]:
+        """Return the matching tenant_authentication_api_id, if verified recently."""
+        if not tenant_id or not api_key:
+            return None
+        return self._cache.get(self._digest(tenant_id, api_key))
+
+    def put(self, tenant_id: str, api_key: str, tenant_authentication_api_id: str):
+        self._cache.set(self._digest(tenant_id, api_key), tenant_authentication_api_id)
+
+    def invalidate(self, tenant_authentication_api_id: str) -> int:
+        """Drop all verifications made against the given API key record."""
+        count = self._cache.evict(lambda _, v: v == tenant_authentication_api_id)
+        LOGGER.debug(
+            f"invalidated {count} cached verification(s) for api key record "
+            f"'{tenant_authentication_api_id}'"
+        )
+        return count
+
+    def clear(self):
+        self._cache.clear()
+
+
+class TenantRecordCache:
+    """Cache of stored TenantRecord values by tenant_id and by wallet_id.
+
+    Entries hold the stored (json) value, not the record object, so every hit
+    builds a fresh record and callers cannot modify the cached copy. Entries
+    are evicted from the record events TenantRecord emits on every save and
+    delete, the ttl bounds how long a write made elsewhere can go unnoticed.
+
+    Every invalidation bumps the generation. A fill passes the generation read
+    before going to storage, and is dropped if an invalidation came in between:
+    the value read may be the one that was just invalidated.
+    """
+
+    def __init__(self, max_size: int, ttl: float):
+        self._by_tenant_id = TTLCache(max_size, ttl)
+        self._by_wallet_id = TTLCache(max_size, ttl)
+        self._generation = 0
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def get_by_tenant_id(self, tenant_id: str) -> Optional[Tuple[str, str]]:
+        """Return (record id, stored value) for tenant_id, if cached."""
+        return self._by_tenant_id.get(tenant_id)
+
+    def get_by_wallet_id(self, wallet_id: str) -> Optional[Tuple[str, str]]:
+        """Return (record id, stored value) for wallet_id, if cached."""
+        return self._by_wallet_id.get(wallet_id)
+
+    def put(
+        self,
+        tenant_id: str,
+        wallet_id: Optional[str],
+        value: str,
+        generation: Optional[int] = None,
+    ):
+        if generation is not None and generation != self._generation:
+            return
+        self._by_tenant_id.set(tenant_id, (tenant_id, value))
+        if wallet_id:
+            self._by_wallet_id.set(wallet_id, (tenant_id, value))
+
+    def invalidate(self, tenant_id: str = None, wallet_id: str = None):
+        self._generation += 1
+        if tenant_id:
+            self._by_tenant_id.pop(tenant_id)
+            # also catch entries cached under the wallet_id we were not given
+            self._by_wallet_id.evict(lambda _, v: v[0] == tenant_id)
+        if wallet_id:
+            self._by_wallet_id.pop(wallet_id)
+        LOGGER.debug(
+            f"invalidated cached tenant record: tenant_id = '{tenant_id}', "
+            f"wallet_id = '{wallet_id}'"
+        )
+
+    def clear(self):
+        self._generation += 1
+        self._by_tenant_id.clear()
+        self._by_wallet_id.clear()
@@ -2,7 +2,7 @@ import logging
 from typing import Any, Mapping, Optional, List
 
 from mergedeep import merge
-from pydantic import BaseModel
+from pydantic import BaseModel, validator
 
 LOGGER = logging.getLogger(__name__)
 
@@ -62,6 +62,10 @@ class ReservationConfig(BaseModel):
     expiry_minutes: int
     auto_approve: bool
     auto_issuer: bool = False
+    bulk_concurrency: int = 4  # wallets created at once by bulk provisioning
+    bulk_max_tenants: int = 500  # tenants accepted per bulk request
+    sweep_interval_seconds: int = 300  # expire approved reservations, 0 = never
+    expired_retention_days: int = 0  # delete expired reservations, 0 = keep
 
     class Config:
         alias_generator = _alias_generator
@@ -69,23 +73,232 @@ class ReservationConfig(BaseModel):
 
     @classmethod
     def default(cls):
-        return cls(expiry_minutes=60, auto_approve=False, auto_issuer=False)
+        return cls(
+            expiry_minutes=60,
+            auto_approve=False,
+            auto_issuer=False,
+            bulk_concurrency=4,
+            bulk_max_tenants=500,
+            sweep_interval_seconds=300,
+            expired_retention_days=0,
+        )
+
+
+class ApiKeyCacheConfig(BaseModel):
+    enabled: bool = True
+    max_size: int = 1000
+    ttl_seconds: int = 300
+
+    class Config:
+        alias_generator = _alias_generator
+        allow_population_by_field_name = True
+
+    @classmethod
+    def default(cls):
+        return cls(enabled=True, max_size=1000, ttl_seconds=300)
+
+
+class TenantCacheConfig(BaseModel):
+    enabled: bool = True
+    max_size: int = 1000
+    ttl_seconds: int = 60
+
+    class Config:
+        alias_generator = _alias_generator
+        allow_population_by_field_name = True
+
+    @classmethod
+    def default(cls):
+        return cls(enabled=True, max_size=1000, ttl_seconds=60)
+
+
+class CryptoConfig(BaseModel):
+    executor: str = "thread"  # thread or process
+    max_workers: int = 0  # 0 = min(4, cpu count)
+    max_queue: int = 100  # 0 = unbounded
+
+    class Config:
+        alias_generator = _alias_generator
+        allow_population_by_field_name = True
+
+    @validator("executor")
+    def executor_type(cls, value: str):
+        if value not in ("thread", "process"):
+            raise ValueError("executor must be 'thread' or 'process'")
+        return value
+
+    @classmethod
+    def default(cls):
+        return cls(executor="thread", max_workers=0, max_queue=100)
+
+
+class TokenConfig(BaseModel):
+    reuse: bool = False
+    reuse_refresh_window_seconds: int = 300  # mint a new token this close to expiry
+    reuse_max_age_seconds: int = 3600  # lifetime assumed for tokens without "exp"
+    max_size: int = 1000
+
+    class Config:
+        alias_generator = _alias_generator
+        allow_population_by_field_name = True
+
+    @classmethod
+    def default(cls):
+        return cls(
+            reuse=False,
+            reuse_refresh_window_seconds=300,
+            reuse_max_age_seconds=3600,
+            max_size=1000,
+        )
+
+
+class WalletPoolConfig(BaseModel):
+    enabled: bool = False
+    size: int = 10  # unassigned wallets to keep ready (all instances together)
+    name_prefix: str = "traction-pool"
+
+    class Config:
+        alias_generator = _alias_generator
+        allow_population_by_field_name = True
+
+    @classmethod
+    def default(cls):
+        return cls(enabled=False, size=10, name_prefix="traction-pool")
+
+
+class InvalidationConfig(BaseModel):
+    backend: str = "auto"  # auto (postgres if possible), postgres or memory
+    channel: str = "traction_innkeeper_invalidation"
+    reconnect_seconds: int = 5
+
+    class Config:
+        alias_generator = _alias_generator
+        allow_population_by_field_name = True
+
+    @validator("backend")
+    def backend_type(cls, value: str):
+        if value not in ("auto", "postgres", "memory"):
+            raise ValueError("backend must be 'auto', 'postgres' or 'memory'")
+        return value
+
+    @classmethod
+    def default(cls):
+        return cls(
+            backend="auto",
+            channel="traction_innkeeper_invalidation",
+            reconnect_seconds=5,
+        )
+
+
+class TenantPurgeConfig(BaseModel):
+    retention_days: int = 0  # purge tenants deleted this long ago, 0 = never
+    interval_seconds: int = 3600  # between scheduled purges
+    batch_size: int = 50  # tenants (and API keys) deleted per batch
+
+    class Config:
+        alias_generator = _alias_generator
+        allow_population_by_field_name = True
+
+    @classmethod
+    def default(cls):
+        return cls(
+            retention_days=0,
+            interval_seconds=3600,
+            batch_size=50,
+        )
+
+
+class StatsConfig(BaseModel):
+    fold_interval_seconds: int = 10  # pending stats deltas applied this often
+
+    class Config:
+        alias_generator = _alias_generator
+        allow_population_by_field_name = True
+
+    @validator("fold_interval_seconds")
+    def positive_interval(cls, value: int):
+        if value <= 0:
+            raise ValueError("fold_interval_seconds must be greater than 0")
+        return value
+
+    @classmethod
+    def default(cls):
+        return cls(fold_interval_seconds=10)
+
+
+class OcaConfig(BaseModel):
+    bulk_max_records: int = 500  # OCA records accepted per bulk request
+
+    class Config:
+        alias_generator = _alias_generator
+        allow_population_by_field_name = True
+
+    @classmethod
+    def default(cls):
+        return cls(bulk_max_records=500)
+
+
+class OcaResolverConfig(BaseModel):
+    # hosts OCA bundle urls may point to even if their address is not public
+    allowed_hosts: List[str] = []
+    allow_private: bool = False  # any address, e.g. for local development
+
+    class Config:
+        alias_generator = _alias_generator
+        allow_population_by_field_name = True
+
+    @classmethod
+    def default(cls):
+        return cls(allowed_hosts=[], allow_private=False)
 
 
 class TractionInnkeeperConfig(BaseModel):
     innkeeper_wallet: Optional[InnkeeperWalletConfig]
     reservation: Optional[ReservationConfig]
+    api_key_cache: Optional[ApiKeyCacheConfig]
+    tenant_cache: Optional[TenantCacheConfig]
+    crypto: Optional[CryptoConfig]
+    token: Optional[TokenConfig]
+    wallet_pool: Optional[WalletPoolConfig]
+    invalidation: Optional[InvalidationConfig]
+    tenant_purge: Optional[TenantPurgeConfig]
+    stats: Optional[StatsConfig]
+    oca: Optional[OcaConfig]
+    oca_resolver: Optional[OcaResolverConfig]
 
     @classmethod
     def default(cls):
         return cls(
             innkeeper_wallet=InnkeeperWalletConfig.default(),
             reservation=ReservationConfig.default(),
+            api_key_cache=ApiKeyCacheConfig.default(),
+            tenant_cache=TenantCacheConfig.default(),
+            crypto=CryptoConfig.default(),
+            token=TokenConfig.default(),
+            wallet_pool=WalletPoolConfig.default(),
+            invalidation=InvalidationConfig.default(),
+            tenant_purge=TenantPurgeConfig.default(),
+            stats=StatsConfig.default(),
+            oca=OcaConfig.default(),
+            oca_resolver=OcaResolverConfig.default(),
         )
 
 
 def process_config_dict(config_dict: dict) -> dict:
-    _filter = ["innkeeper_wallet", "reservation"]
+    _filter = [
+        "innkeeper_wallet",
+        "reservation",
+        "api_key_cache",
+        "tenant_cache",
+        "crypto",
+        "token",
+        "wallet_pool",
+        "invalidation",
+        "tenant_purge",
+        "stats",
+        "oca",
+        "oca_resolver",
+    ]
     for key, value in config_dict.items():
         if key in _filter:
             config_dict[key] = value
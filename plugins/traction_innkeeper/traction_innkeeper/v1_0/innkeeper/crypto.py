@@ -0,0 +1,165 @@
+import asyncio
+import functools
+import logging
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Optional, Tuple
+
+import bcrypt
+from aries_cloudagent.core.error import BaseError
+
+from .config import CryptoConfig
+
+LOGGER = logging.getLogger(__name__)
+
+
+class CryptoServiceBusyError(BaseError):
+    """Crypto work queue is full."""
+
+
+# the following functions are executed in the crypto pool.
+# they must stay at module level so they can be pickled for a process pool.
+
+
+def hash_secret(secret: str) -> Tuple[bytes, bytes]:
+    """Generate a salt and the bcrypt hash of secret."""
+    _salt = bcrypt.gensalt()
+    _hash = bcrypt.hashpw(secret.encode("utf-8"), _salt)
+    return _salt, _hash
+
+
+def check_secret(secret: str, salt: str, hashed: str) -> Optional[str]:
+    """Check secret against a stored salt and hash.
+
+    Returns the calculated hash (as a string) when the secret matches, else None.
+    """
+    # make a hash from passed in value with saved salt...
+    token = bcrypt.hashpw(secret.encode("utf-8"), salt.encode("utf-8"))
+    # check the passed in value/hash against the calculated hash.
+    checkpw = bcrypt.checkpw(secret.encode("utf-8"), token)
+    # check the passed in value against the saved hash
+    checkpw2 = bcrypt.checkpw(secret.encode("utf-8"), hashed.encode("utf-8"))
+    if checkpw and checkpw2:
+        return token.decode("utf-8")
+    return None
+
+
+class CryptoService:
+    """Run CPU bound crypto (bcrypt) calls off the event loop.
+
+    Work is handed to a thread or process pool. At most `max_workers` calls run
+    at once; up to `max_queue` more may wait for a worker, anything beyond that
+    is rejected with CryptoServiceBusyError so a burst of check-ins or token
+    requests cannot pile up unbounded work.
+    """
+
+    def __init__(self, config: CryptoConfig):
+        """
+        Initialize a CryptoService.
+
+        Args:
+            config: The crypto pool configuration
+        """
+        self._config = config
+        self._logger = logging.getLogger(__name__)
+        self._max_workers = config.max_workers or min(4, os.cpu_count() or 1)
+        self._executor: Optional[Executor] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        # stats
+        self._queued = 0
+        self._active = 0
+        self._max_queued = 0
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+        self._wait_total = 0.0
+        self._run_total = 0.0
+        self._run_max = 0.0
+
+    @property
+    def executor(self) -> Executor:
+        if not self._executor:
+            if self._config.executor == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self._max_workers)
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self._max_workers,
+                    thread_name_prefix="traction-crypto",
+                )
+            self._logger.info(
+                f"crypto pool started: executor = {self._config.executor}, "
+                f"max_workers = {self._max_workers}"
+            )
+        return self._executor
+
+    async def run(self, fn: Callable, *args) -> Any:
+        """Run fn(*args) in the crypto pool and return its result."""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self._max_workers)
+        max_queue = self._config.max_queue
+        if max_queue and self._semaphore.locked() and self._queued >= max_queue:
+            self._rejected += 1
+            raise CryptoServiceBusyError("Server is busy, please try again later.")
+
+        self._submitted += 1
+        self._queued += 1
+        self._max_queued = max(self._max_queued, self._queued)
+        queued_at = time.perf_counter()
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self._queued -= 1
+        started_at = time.perf_counter()
+        self._wait_total += started_at - queued_at
+        self._active += 1
+        try:
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(
+                self.executor, functools.partial(fn, *args)
+            )
+            self._completed += 1
+            return result
+        except Exception:
+            self._failed += 1
+            raise
+        finally:
+            elapsed = time.perf_counter() - started_at
+            self._run_total += elapsed
+            self._run_max = max(self._run_max, elapsed)
+            self._active -= 1
+            self._semaphore.release()
+
+    async def hash_secret(self, secret: str) -> Tuple[bytes, bytes]:
+        return await self.run(hash_secret, secret)
+
+    async def check_secret(self, secret: str, salt: str, hashed: str) -> Optional[str]:
+        return await self.run(check_secret, secret, salt, hashed)
+
+    def stats(self) -> dict:
+        finished = self._completed + self._failed
+        return {
+            "executor": self._config.executor,
+            "max_workers": self._max_workers,
+            "max_queue": self._config.max_queue,
+            "active": self._active,
+            "queued": self._queued,
+            "max_queued": self._max_queued,
+            "submitted": self._submitted,
+            "completed": self._completed,
+            "failed": self._failed,
+            "rejected": self._rejected,
+            "avg_wait_ms": round(self._wait_total * 1000 / finished, 3)
+            if finished
+            else 0,
+            "avg_run_ms": round(self._run_total * 1000 / finished, 3)
+            if finished
+            else 0,
+            "max_run_ms": round(self._run_max * 1000, 3),
+        }
+
+    def shutdown(self):
+        if self._executor:
+            self._executor.shutdown(wait=False)
+            self._executor = None
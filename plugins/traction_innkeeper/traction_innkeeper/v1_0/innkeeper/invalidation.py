@@ -0,0 +1,203 @@
+import asyncio
+import json
+import logging
+import urllib.parse
+import uuid
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from aries_cloudagent.core.profile import Profile
+
+from .config import InvalidationConfig
+
+try:
+    import asyncpg
+except ImportError:
+    asyncpg = None
+
+LOGGER = logging.getLogger(__name__)
+
+# topics, payloads carry the ids of what changed
+TOPIC_TENANT = "tenant"  # {tenant_id, wallet_id}
+TOPIC_API_KEY = "api_key"  # {tenant_authentication_api_id}
+TOPIC_PUBLIC_DID = "public_did"  # {wallet_id}
+# published locally when invalidations may have been missed, drop everything
+TOPIC_RESET = "reset"
+
+InvalidationHandler = Callable[[dict], Awaitable[None]]
+
+
+class InvalidationBus:
+    """Channel for cache invalidations, shared by all instances of the plugin.
+
+    Anything that writes a cached record publishes an invalidation; every
+    instance (including the publisher) runs the handlers subscribed to that
+    topic, which evict their in-process copies.
+    This base implementation is in-memory: single instance (and test) runs.
+    """
+
+    def __init__(self):
+        self._handlers: Dict[str, List[InvalidationHandler]] = {}
+
+    @property
+    def backend(self) -> str:
+        return "memory"
+
+    def subscribe(self, topic: str, handler: InvalidationHandler):
+        self._handlers.setdefault(topic, []).append(handler)
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    async def publish(self, topic: str, payload: dict):
+        await self._dispatch(topic, payload)
+
+    async def _dispatch(self, topic: str, payload: dict):
+        for handler in self._handlers.get(topic, []):
+            try:
+                await handler(payload)
+            except Exception as err:
+                LOGGER.error(f"invalidation handler for '{topic}' failed: {err}")
+
+
+class PostgresInvalidationBus(InvalidationBus):
+    """Invalidation bus over Postgres LISTEN/NOTIFY on the Askar database.
+
+    Publishing runs the local handlers right away and sends a NOTIFY; the
+    other instances get it through their LISTEN connection. If that connection
+    drops, notifications may have been missed, so on reconnect a reset is
+    dispatched locally to drop all cached data.
+    NOTIFYs go out on a connection of their own, one at a time: an asyncpg
+    connection runs one operation at once, the listener's is left alone.
+    """
+
+    def __init__(self, dsn: str, config: InvalidationConfig):
+        super().__init__()
+        self._dsn = dsn
+        self._config = config
+        self._origin = uuid.uuid4().hex
+        self._conn = None
+        self._publish_conn = None
+        self._publish_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._closed = asyncio.Event()
+
+    @property
+    def backend(self) -> str:
+        return "postgres"
+
+    async def start(self):
+        self._task = asyncio.ensure_future(self._listen())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        await self._close()
+        async with self._publish_lock:
+            await self._close_publisher()
+
+    async def _close(self):
+        conn, self._conn = self._conn, None
+        if conn and not conn.is_closed():
+            await conn.close()
+
+    async def _close_publisher(self):
+        conn, self._publish_conn = self._publish_conn, None
+        if conn and not conn.is_closed():
+            try:
+                await conn.close()
+            except Exception:
+                conn.terminate()
+
+    async def _listen(self):
+        connected_before = False
+        while True:
+            try:
+                self._closed.clear()
+                self._conn = await asyncpg.connect(self._dsn)
+                self._conn.add_termination_listener(lambda _: self._closed.set())
+                await self._conn.add_listener(self._config.channel, self._on_notify)
+                LOGGER.info(f"listening for invalidations on '{self._config.channel}'")
+                if connected_before:
+                    await self._dispatch(TOPIC_RESET, {})
+                connected_before = True
+                await self._closed.wait()
+                LOGGER.warning("invalidation listener connection lost")
+            except asyncio.CancelledError:
+                raise
+            except Exception as err:
+                LOGGER.error(f"invalidation listener failed: {err}")
+            await self._close()
+            await asyncio.sleep(self._config.reconnect_seconds)
+
+    def _on_notify(self, connection, pid, channel, message: str):
+        try:
+            data = json.loads(message)
+        except ValueError:
+            LOGGER.warning(f"ignoring malformed invalidation: {message}")
+            return
+        if data.get("origin") == self._origin:
+            # we already ran our own handlers on publish
+            return
+        asyncio.ensure_future(self._dispatch(data.get("topic"), data.get("payload")))
+
+    async def publish(self, topic: str, payload: dict):
+        await self._dispatch(topic, payload)
+        message = json.dumps(
+            {"origin": self._origin, "topic": topic, "payload": payload}
+        )
+        async with self._publish_lock:
+            # a second attempt on a new connection, the first may have been dropped
+            for attempt in range(2):
+                try:
+                    if not self._publish_conn or self._publish_conn.is_closed():
+                        self._publish_conn = await asyncpg.connect(self._dsn)
+                    await self._publish_conn.execute(
+                        "SELECT pg_notify($1, $2)", self._config.channel, message
+                    )
+                    return
+                except Exception as err:
+                    await self._close_publisher()
+                    if attempt:
+                        LOGGER.error(f"invalidation not sent: {topic}: {err}")
+
+
+def postgres_dsn(profile: Profile) -> Optional[str]:
+    """Build a connection string for the (postgres) Askar database of profile."""
+    settings = profile.settings
+    if settings.get("wallet.storage_type") != "postgres_storage":
+        return None
+    config = json.loads(settings.get("wallet.storage_config") or "{}")
+    creds = json.loads(settings.get("wallet.storage_creds") or "{}")
+    if not config.get("url") or "account" not in creds:
+        return None
+    # same conventions as aries_cloudagent.askar.store.AskarStoreConfig
+    account = urllib.parse.quote(creds["account"])
+    password = urllib.parse.quote(creds.get("password", ""))
+    db_name = urllib.parse.quote(settings.get("wallet.name") or Profile.DEFAULT_NAME)
+    return f"postgres://{account}:{password}@{config['url']}/{db_name}"
+
+
+def create_invalidation_bus(
+    profile: Profile, config: InvalidationConfig
+) -> InvalidationBus:
+    """Create the configured invalidation bus, falling back to in-memory."""
+    if config.backend == "memory":
+        return InvalidationBus()
+    dsn = postgres_dsn(profile)
+    if not dsn:
+        if config.backend == "postgres":
+            LOGGER.warning(
+                "invalidation backend 'postgres' needs a postgres wallet, using 'memory'"
+            )
+        return InvalidationBus()
+    if not asyncpg:
+        LOGGER.warning(
+            "asyncpg is not installed, invalidation backend 'memory' is used; "
+            "caches are not invalidated across instances"
+        )
+        return InvalidationBus()
+    return PostgresInvalidationBus(dsn, config)
@@ -3,14 +3,19 @@ import uuid
 from datetime import datetime, timezone
 from typing import Optional, Union, List
 
-from aries_cloudagent.core.profile import ProfileSession
+from aries_cloudagent.core.profile import Profile, ProfileSession
 from aries_cloudagent.ledger.base import LOGGER
 from aries_cloudagent.messaging.models.base_record import BaseRecord, BaseRecordSchema
 from aries_cloudagent.messaging.util import datetime_to_str, str_to_datetime
 from aries_cloudagent.messaging.valid import UUIDFour
+from aries_cloudagent.storage.record import StorageRecord
 from aries_cloudagent.storage.error import StorageDuplicateError, StorageNotFoundError
 from marshmallow import fields, EXCLUDE, validate
 
+from .cache import TenantRecordCache
+from .pagination import scan_records
+from .search import search_tags
+
 ENDORSER_LEDGER_CONFIG_EXAMPLE = {
     "endorser_alias": " ... ",
     "ledger_id": " ... ",
@@ -22,6 +27,13 @@ RESERVATION_CONTEXT_EXAMPLE = {
     "contact_phone": " ... ",
 }
 
+# plugin private, unlike acapy::record:: events these are not sent to webhooks
+TENANT_EVENT_TOPIC = "traction::innkeeper::tenant"
+
+
+class ReservationException(Exception):
+    pass
+
 
 class ReservationRecord(BaseRecord):
     """Innkeeper Tenant Reservation Record."""
@@ -36,12 +48,18 @@ class ReservationRecord(BaseRecord):
     TAG_NAMES = {
         "state",
         "tenant_name",
+        "tenant_id",
     }
 
     STATE_REQUESTED = "requested"
     STATE_APPROVED = "approved"
     STATE_DENIED = "denied"
     STATE_CHECKED_IN = "checked_in"
+    STATE_EXPIRED = "expired"  # approved, but not checked in before the expiry
+
+    # reservations are tagged with the hour their token expires in
+    EXPIRY_BUCKET_TAG = "expiry_bucket"
+    EXPIRY_BUCKET_FORMAT = "%Y-%m-%dT%H"
 
     def __init__(
         self,
@@ -124,6 +142,13 @@ class ReservationRecord(BaseRecord):
     def reservation_token_expiry(self, value: Union[str, datetime] = None) -> None:
         self._reservation_token_expiry = datetime_to_str(value)
 
+    @classmethod
+    def expiry_bucket(cls, value: datetime) -> str:
+        """Return the expiry bucket (UTC hour) of a datetime."""
+        if value.tzinfo:
+            value = value.astimezone(timezone.utc)
+        return value.strftime(cls.EXPIRY_BUCKET_FORMAT)
+
     @property
     def expired(self) -> bool:
         if not self._reservation_token_expiry:
@@ -156,6 +181,39 @@ class ReservationRecord(BaseRecord):
             )
         }
 
+    @property
+    def storage_record(self) -> StorageRecord:
+        """Storage record, tagged for search by name prefix and email."""
+        record = super().storage_record
+        record.tags.update(search_tags(self.tenant_name, self.contact_email))
+        if self._reservation_token_expiry:
+            record.tags[self.EXPIRY_BUCKET_TAG] = self.expiry_bucket(
+                str_to_datetime(self._reservation_token_expiry)
+            )
+        return record
+
+    async def post_save(
+        self,
+        session: ProfileSession,
+        new_record: bool,
+        last_state: Optional[str],
+        event: bool = None,
+    ):
+        await super().post_save(session, new_record, last_state, event)
+        await InnkeeperStatsRecord.adjust(
+            session,
+            InnkeeperStatsRecord.RESERVATIONS,
+            None if new_record else last_state,
+            self.state,
+        )
+
+    async def delete_record(self, session: ProfileSession):
+        state = self.state
+        await super().delete_record(session)
+        await InnkeeperStatsRecord.adjust(
+            session, InnkeeperStatsRecord.RESERVATIONS, state, None
+        )
+
 
 class ReservationRecordSchema(BaseRecordSchema):
     """Innkeeper Tenant Reservation Record Schema."""
@@ -214,6 +272,7 @@ class ReservationRecordSchema(BaseRecordSchema):
                 ReservationRecord.STATE_REQUESTED,
                 ReservationRecord.STATE_APPROVED,
                 ReservationRecord.STATE_CHECKED_IN,
+                ReservationRecord.STATE_EXPIRED,
             ]
         ),
     )
@@ -266,6 +325,8 @@ class TenantRecord(BaseRecord):
 
     STATE_ACTIVE = "active"
     STATE_DELETED = "deleted"  # TODO: figure out states and other data...
+    # deleted and past retention, being hard deleted by the tenant purge
+    STATE_PURGING = "purging"
 
     def __init__(
         self,
@@ -322,12 +383,44 @@ class TenantRecord(BaseRecord):
             )
         }
 
+    @property
+    def storage_record(self) -> StorageRecord:
+        """Storage record, tagged for search by name prefix and email."""
+        record = super().storage_record
+        record.tags.update(search_tags(self.tenant_name, self.contact_email))
+        return record
+
     @classmethod
     def transform_tenant_id(cls, value: str):
         if "-" not in value:
             return str(uuid.UUID(hex=value))
         return value
 
+    @classmethod
+    async def retrieve_by_id(
+        cls,
+        session: ProfileSession,
+        record_id: str,
+        *,
+        for_update=False,
+    ) -> "TenantRecord":
+        """Retrieve TenantRecord by tenant_id, from the tenant cache if possible.
+        Args:
+            session: the profile session to use
+            record_id: the tenant_id
+        """
+        cache = session.inject_or(TenantRecordCache)
+        if cache:
+            generation = cache.generation
+            if not for_update:
+                cached = cache.get_by_tenant_id(record_id)
+                if cached:
+                    return cls.from_cache(*cached)
+        record = await super().retrieve_by_id(session, record_id, for_update=for_update)
+        if cache:
+            record.cache(cache, generation)
+        return record
+
     @classmethod
     async def query_by_wallet_id(
         cls,
@@ -339,6 +432,14 @@ class TenantRecord(BaseRecord):
             session: the profile session to use
             wallet_id: the wallet_id by which to filter
         """
+        cache = session.inject_or(TenantRecordCache)
+        if cache:
+            generation = cache.generation
+            if wallet_id:
+                cached = cache.get_by_wallet_id(wallet_id)
+                if cached:
+                    return cls.from_cache(*cached)
+
         tag_filter = {
             **{"wallet_id": wallet_id for _ in [""] if wallet_id},
         }
@@ -350,14 +451,64 @@ class TenantRecord(BaseRecord):
             )
         if not result:
             raise StorageNotFoundError("No TenantRecord found for the given wallet_id")
+        if cache:
+            result[0].cache(cache, generation)
         return result[0]
 
+    @classmethod
+    def from_cache(cls, record_id: str, value: str) -> "TenantRecord":
+        return cls.from_storage(record_id, json.loads(value))
+
+    def cache(self, cache: TenantRecordCache, generation: int = None):
+        cache.put(self.tenant_id, self.wallet_id, json.dumps(self.value), generation)
+
+    async def post_save(
+        self,
+        session: ProfileSession,
+        new_record: bool,
+        last_state: Optional[str],
+        event: bool = None,
+    ):
+        await super().post_save(session, new_record, last_state, event)
+        # notify on every save (not only on state changes),
+        # the tenant record cache is invalidated by these events.
+        # in a transaction the caller notifies once it is committed
+        if not session.is_transaction:
+            await self.notify_changed(session.profile)
+        await InnkeeperStatsRecord.adjust(
+            session,
+            InnkeeperStatsRecord.TENANTS,
+            None if new_record else last_state,
+            self.state,
+        )
+
+    async def delete_record(self, session: ProfileSession):
+        state = self.state
+        await super().delete_record(session)
+        if not session.is_transaction:
+            await self.notify_changed(session.profile)
+        await InnkeeperStatsRecord.adjust(
+            session, InnkeeperStatsRecord.TENANTS, state, None
+        )
+
+    async def notify_changed(self, profile: Profile):
+        """Notify a committed save or delete, call it after committing a transaction."""
+        # ids only, the record (contact email...) is not needed to invalidate
+        await profile.notify(
+            TENANT_EVENT_TOPIC,
+            {
+                "tenant_id": self.tenant_id,
+                "wallet_id": self.wallet_id,
+                "state": self.state,
+            },
+        )
+
     async def soft_delete(self, session: ProfileSession):
         """
         Soft delete the tenant record by setting its state to 'deleted'.
         Note: This method should be called on an instance of the TenantRecord.
         """
-        if self.state != self.STATE_DELETED:
+        if self.state not in (self.STATE_DELETED, self.STATE_PURGING):
             self.state = self.STATE_DELETED
             self.deleted_at = datetime_to_str(datetime.utcnow())
             await self.save(session, reason="Soft delete")
@@ -408,6 +559,7 @@ class TenantRecordSchema(BaseRecordSchema):
             [
                 TenantRecord.STATE_ACTIVE,
                 TenantRecord.STATE_DELETED,
+                TenantRecord.STATE_PURGING,
             ]
         ),
     )
@@ -487,7 +639,22 @@ class TenantAuthenticationApiRecord(BaseRecord):
     @property
     def tenant_authentication_api_id(self) -> Optional[str]:
         """Return record id."""
-        return uuid.UUID(self._id).hex
+        return uuid.UUID(self._id).hex if self._id else None
+
+    def assign_id(self) -> str:
+        """Assign the record id ahead of the first save (so it can be shared)."""
+        if not self._id:
+            self._id = str(uuid.uuid4())
+            self._new_with_id = True
+        return self.tenant_authentication_api_id
+
+    @classmethod
+    def transform_auth_api_id(cls, value: str):
+        # since the record id is created/stored with dashes and returned without
+        # we need a transform function so we can retrieve the records...
+        if "-" not in value:
+            return str(uuid.UUID(hex=value))
+        return value
 
     @classmethod
     async def retrieve_by_auth_api_id(
@@ -502,9 +669,8 @@ class TenantAuthenticationApiRecord(BaseRecord):
             session: the profile session to use
             tenant_authentication_api_id: the tenant_authentication_api_id by which to filter
         """
-        record = await cls.retrieve_by_id(
-            session, tenant_authentication_api_id, for_update=for_update
-        )
+        record_id = cls.transform_auth_api_id(tenant_authentication_api_id)
+        record = await cls.retrieve_by_id(session, record_id, for_update=for_update)
         return record
 
     @classmethod
@@ -564,3 +730,418 @@ class TenantAuthenticationApiRecordSchema(BaseRecordSchema):
         required=True,
         description="Alias description for this API key",
     )
+
+
+class WalletNameIndexRecord(BaseRecord):
+    """Innkeeper Wallet Name Index Record.
+
+    One record per requested (base) wallet name, keyed by that name, counting
+    how many wallets have been allocated under it. The next unique name is then
+    a single read/update instead of probing name, name-1, name-2...
+    """
+
+    class Meta:
+        """WalletNameIndexRecord Meta."""
+
+        schema_class = "WalletNameIndexRecordSchema"
+
+    RECORD_TYPE = "innkeeper_wallet_name_index"
+    RECORD_ID_NAME = "wallet_name"
+    TAG_NAMES = {}
+
+    def __init__(
+        self,
+        *,
+        wallet_name: str = None,
+        allocated: int = 0,
+        **kwargs,
+    ):
+        """Construct record."""
+        super().__init__(wallet_name, **kwargs)
+        self.allocated = allocated
+
+    @property
+    def wallet_name(self) -> str:
+        """Return record id (the base wallet name)."""
+        return self._id
+
+    @classmethod
+    async def retrieve_by_wallet_name(
+        cls,
+        session: ProfileSession,
+        wallet_name: str,
+        *,
+        for_update=False,
+    ) -> Optional["WalletNameIndexRecord"]:
+        """Retrieve WalletNameIndexRecord by base wallet name, None if not found.
+        Args:
+            session: the profile session to use
+            wallet_name: the base wallet name
+        """
+        try:
+            return await cls.retrieve_by_id(session, wallet_name, for_update=for_update)
+        except StorageNotFoundError:
+            return None
+
+    @property
+    def record_value(self) -> dict:
+        """Return record value."""
+        return {prop: getattr(self, prop) for prop in ("allocated",)}
+
+
+class WalletNameIndexRecordSchema(BaseRecordSchema):
+    """Innkeeper Wallet Name Index Record Schema."""
+
+    class Meta:
+        """WalletNameIndexRecordSchema Meta."""
+
+        model_class = "WalletNameIndexRecord"
+        unknown = EXCLUDE
+
+    wallet_name = fields.Str(
+        required=True,
+        description="Base wallet name",
+        example="line of business short name",
+    )
+
+    allocated = fields.Int(
+        required=True,
+        description="Number of wallet names allocated under this base name",
+        example=1,
+    )
+
+
+class WalletPoolEntryRecord(BaseRecord):
+    """Innkeeper Wallet Pool Entry Record.
+
+    Marks a pre-created wallet as unassigned and available in the wallet pool.
+    The record is deleted when the wallet is claimed.
+    """
+
+    class Meta:
+        """WalletPoolEntryRecord Meta."""
+
+        schema_class = "WalletPoolEntryRecordSchema"
+
+    RECORD_TYPE = "innkeeper_wallet_pool_entry"
+    RECORD_ID_NAME = "wallet_pool_entry_id"
+    TAG_NAMES = {}
+
+    def __init__(
+        self,
+        *,
+        wallet_pool_entry_id: str = None,
+        wallet_id: str = None,
+        **kwargs,
+    ):
+        """Construct record."""
+        super().__init__(wallet_pool_entry_id, **kwargs)
+        self.wallet_id = wallet_id
+
+    @property
+    def wallet_pool_entry_id(self) -> Optional[str]:
+        """Return record id."""
+        return self._id
+
+    @property
+    def record_value(self) -> dict:
+        """Return record value."""
+        return {prop: getattr(self, prop) for prop in ("wallet_id",)}
+
+
+class WalletPoolEntryRecordSchema(BaseRecordSchema):
+    """Innkeeper Wallet Pool Entry Record Schema."""
+
+    class Meta:
+        """WalletPoolEntryRecordSchema Meta."""
+
+        model_class = "WalletPoolEntryRecord"
+        unknown = EXCLUDE
+
+    wallet_pool_entry_id = fields.Str(
+        required=True,
+        description="Wallet pool entry identifier",
+        example=UUIDFour.EXAMPLE,
+    )
+
+    wallet_id = fields.Str(
+        required=True,
+        description="Pooled wallet identifier",
+        example=UUIDFour.EXAMPLE,
+    )
+
+
+class InnkeeperStatsRecord(BaseRecord):
+    """Innkeeper Stats Record.
+
+    A single record counting reservations and tenants by state, for the
+    innkeeper dashboard. Every reservation or tenant created, changing state or
+    deleted writes a delta, folded into the counters periodically; rebuild()
+    recounts them.
+    """
+
+    class Meta:
+        """InnkeeperStatsRecord Meta."""
+
+        schema_class = "InnkeeperStatsRecordSchema"
+
+    RECORD_TYPE = "innkeeper_stats"
+    RECORD_ID_NAME = "innkeeper_stats_id"
+    TAG_NAMES = {}
+
+    STATS_ID = "innkeeper_stats"
+    RESERVATIONS = "reservations"
+    TENANTS = "tenants"
+
+    def __init__(
+        self,
+        *,
+        innkeeper_stats_id: str = None,
+        reservations: dict = None,
+        tenants: dict = None,
+        **kwargs,
+    ):
+        """Construct record."""
+        super().__init__(innkeeper_stats_id or self.STATS_ID, **kwargs)
+        self.reservations = reservations or {}
+        self.tenants = tenants or {}
+
+    @property
+    def innkeeper_stats_id(self) -> str:
+        """Return record id."""
+        return self._id
+
+    @property
+    def record_value(self) -> dict:
+        """Return record value."""
+        return {prop: getattr(self, prop) for prop in ("reservations", "tenants")}
+
+    @classmethod
+    async def retrieve(
+        cls, session: ProfileSession, *, for_update=False
+    ) -> Optional["InnkeeperStatsRecord"]:
+        """Retrieve the stats record, None if it has not been created yet."""
+        try:
+            return await cls.retrieve_by_id(
+                session, cls.STATS_ID, for_update=for_update
+            )
+        except StorageNotFoundError:
+            return None
+
+    @classmethod
+    async def adjust(
+        cls,
+        session: ProfileSession,
+        counter: str,
+        from_state: Optional[str],
+        to_state: Optional[str],
+    ):
+        """Move one record of counter (RESERVATIONS/TENANTS) between states.
+
+        from_state is None for a new record, to_state is None for a deleted one.
+        The change is saved in session as a delta record, the stats record is not
+        locked: deltas are folded into it by fold(), on a schedule (StatsFolder).
+        Failures are logged, not raised: a miscount must not fail the save
+        that caused it and can be repaired with rebuild().
+        """
+        if from_state == to_state:
+            return
+        try:
+            delta = InnkeeperStatsDeltaRecord(
+                counter=counter, from_state=from_state, to_state=to_state
+            )
+            await delta.save(session, reason="Adjust innkeeper stats", event=False)
+        except Exception as err:
+            LOGGER.error(f"innkeeper stats not updated ({counter}): {err}")
+
+    def _apply(self, delta: "InnkeeperStatsDeltaRecord"):
+        counts = getattr(self, delta.counter)
+        if delta.from_state:
+            counts[delta.from_state] = counts.get(delta.from_state, 0) - 1
+        if delta.to_state:
+            counts[delta.to_state] = counts.get(delta.to_state, 0) + 1
+
+    @classmethod
+    async def fold(cls, profile: Profile) -> "InnkeeperStatsRecord":
+        """Apply the pending deltas to the stats record and delete them.
+
+        The stats record is locked while folding, so a delta is applied once
+        when replicas fold at the same time.
+        """
+        await cls._create_missing(profile)
+        async with profile.transaction() as txn:
+            stats = await cls.retrieve_by_id(txn, cls.STATS_ID, for_update=True)
+            deltas = await InnkeeperStatsDeltaRecord.query(txn)
+            for delta in deltas:
+                stats._apply(delta)
+                await delta.delete_record(txn)
+            if deltas:
+                await stats.save(txn, reason="Fold innkeeper stats", event=False)
+            await txn.commit()
+        return stats
+
+    @classmethod
+    async def rebuild(cls, profile: Profile) -> "InnkeeperStatsRecord":
+        """Recount reservations and tenants by state, replacing the counters.
+
+        Pending deltas are dropped. Changes saved while the records are being
+        counted may be missed.
+        """
+        counts = {}
+        for counter, record_cls in (
+            (cls.RESERVATIONS, ReservationRecord),
+            (cls.TENANTS, TenantRecord),
+        ):
+            counts[counter] = {}
+            async for record in scan_records(profile, record_cls):
+                counts[counter][record.state] = counts[counter].get(record.state, 0) + 1
+
+        await cls._create_missing(profile)
+        async with profile.transaction() as txn:
+            stats = await cls.retrieve_by_id(txn, cls.STATS_ID, for_update=True)
+            for delta in await InnkeeperStatsDeltaRecord.query(txn):
+                await delta.delete_record(txn)
+            stats.reservations = counts[cls.RESERVATIONS]
+            stats.tenants = counts[cls.TENANTS]
+            await stats.save(txn, reason="Rebuild innkeeper stats", event=False)
+            await txn.commit()
+        return stats
+
+    @classmethod
+    async def _create_missing(cls, profile: Profile):
+        """Create an empty stats record, if there is none yet."""
+        async with profile.session() as session:
+            if await cls.retrieve(session):
+                return
+            try:
+                await cls(new_with_id=True).save(
+                    session, reason="Create innkeeper stats", event=False
+                )
+            except StorageDuplicateError:
+                # another replica created it meanwhile
+                pass
+
+    @classmethod
+    async def ensure(cls, profile: Profile):
+        """Create the stats record, counting existing records, if missing.
+
+        An existing stats record gets its pending deltas folded in.
+        """
+        async with profile.session() as session:
+            exists = await cls.retrieve(session)
+        if exists:
+            await cls.fold(profile)
+            return
+        LOGGER.info("counting reservations and tenants for innkeeper stats")
+        await cls.rebuild(profile)
+
+
+class InnkeeperStatsRecordSchema(BaseRecordSchema):
+    """Innkeeper Stats Record Schema."""
+
+    class Meta:
+        """InnkeeperStatsRecordSchema Meta."""
+
+        model_class = "InnkeeperStatsRecord"
+        unknown = EXCLUDE
+
+    innkeeper_stats_id = fields.Str(
+        required=True,
+        description="Innkeeper stats identifier",
+        example=InnkeeperStatsRecord.STATS_ID,
+    )
+
+    reservations = fields.Dict(
+        keys=fields.Str(),
+        values=fields.Int(),
+        description="Number of reservations by state",
+        example={ReservationRecord.STATE_REQUESTED: 3},
+    )
+
+    tenants = fields.Dict(
+        keys=fields.Str(),
+        values=fields.Int(),
+        description="Number of tenants by state",
+        example={TenantRecord.STATE_ACTIVE: 10},
+    )
+
+
+class InnkeeperStatsDeltaRecord(BaseRecord):
+    """Innkeeper Stats Delta Record.
+
+    One pending change of the innkeeper stats counters: a reservation or tenant
+    created, moved between states or deleted. Deltas are written without locking
+    the stats record and folded into it later.
+    """
+
+    class Meta:
+        """InnkeeperStatsDeltaRecord Meta."""
+
+        schema_class = "InnkeeperStatsDeltaRecordSchema"
+
+    RECORD_TYPE = "innkeeper_stats_delta"
+    RECORD_ID_NAME = "innkeeper_stats_delta_id"
+    TAG_NAMES = {}
+
+    def __init__(
+        self,
+        *,
+        innkeeper_stats_delta_id: str = None,
+        counter: str = None,
+        from_state: str = None,
+        to_state: str = None,
+        **kwargs,
+    ):
+        """Construct record."""
+        super().__init__(innkeeper_stats_delta_id, **kwargs)
+        self.counter = counter
+        self.from_state = from_state
+        self.to_state = to_state
+
+    @property
+    def innkeeper_stats_delta_id(self) -> Optional[str]:
+        """Return record id."""
+        return self._id
+
+    @property
+    def record_value(self) -> dict:
+        """Return record value."""
+        return {
+            prop: getattr(self, prop) for prop in ("counter", "from_state", "to_state")
+        }
+
+
+class InnkeeperStatsDeltaRecordSchema(BaseRecordSchema):
+    """Innkeeper Stats Delta Record Schema."""
+
+    class Meta:
+        """InnkeeperStatsDeltaRecordSchema Meta."""
+
+        model_class = "InnkeeperStatsDeltaRecord"
+        unknown = EXCLUDE
+
+    innkeeper_stats_delta_id = fields.Str(
+        required=True,
+        description="Innkeeper stats delta identifier",
+        example=UUIDFour.EXAMPLE,
+    )
+
+    counter = fields.Str(
+        required=True,
+        description="Counter changed",
+        example=InnkeeperStatsRecord.RESERVATIONS,
+    )
+
+    from_state = fields.Str(
+        required=False,
+        allow_none=True,
+        description="State the record left, none for a new record",
+        example=ReservationRecord.STATE_REQUESTED,
+    )
+
+    to_state = fields.Str(
+        required=False,
+        allow_none=True,
+        description="State the record entered, none for a deleted record",
+        example=ReservationRecord.STATE_APPROVED,
+    )
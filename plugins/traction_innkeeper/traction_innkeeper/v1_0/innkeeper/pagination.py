@@ -0,0 +1,134 @@
+import base64
+import bisect
+import json
+from functools import total_ordering
+from typing import Any, AsyncIterator, Callable, List, Optional, Sequence, Tuple, Type
+
+from aries_cloudagent.core.profile import Profile
+from aries_cloudagent.messaging.models.base_record import BaseRecord
+from aries_cloudagent.storage.base import BaseStorageSearch
+
+# records read from storage per fetch
+DEFAULT_BATCH_SIZE = 100
+MAX_LIMIT = 1000
+
+SORT_ASC = "asc"
+SORT_DESC = "desc"
+
+
+class PaginationError(Exception):
+    pass
+
+
+async def scan_records(
+    profile: Profile,
+    record_cls: Type[BaseRecord],
+    tag_filter: dict = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> AsyncIterator[BaseRecord]:
+    """Yield the matching records, reading storage batch_size records at a time.
+
+    Unlike BaseRecord.query, only one batch of records is held in memory.
+    """
+    search = profile.inject(BaseStorageSearch).search_records(
+        record_cls.RECORD_TYPE,
+        record_cls.prefix_tag_filter(tag_filter or {}),
+        batch_size,
+    )
+    try:
+        while True:
+            rows = await search.fetch(batch_size)
+            for row in rows:
+                yield record_cls.from_storage(row.id, json.loads(row.value))
+            if len(rows) < batch_size:
+                break
+    finally:
+        await search.close()
+
+
+def record_sort_key(sort: str) -> Callable[[BaseRecord], tuple]:
+    """Sort key for records: the sort field value, then the record id."""
+
+    def _key(record: BaseRecord) -> tuple:
+        value = getattr(record, sort, None)
+        return ("" if value is None else str(value), record._id)
+
+    return _key
+
+
+@total_ordering
+class _Descending:
+    """Wrap a sort key so it orders in reverse."""
+
+    def __init__(self, key: tuple):
+        self.key = key
+
+    def __eq__(self, other: "_Descending"):
+        return self.key == other.key
+
+    def __lt__(self, other: "_Descending"):
+        return self.key > other.key
+
+
+def encode_cursor(sort: str, order: str, key: Sequence[Any]) -> str:
+    data = json.dumps({"sort": sort, "order": order, "key": list(key)})
+    return base64.urlsafe_b64encode(data.encode("utf-8")).decode("utf-8")
+
+
+def decode_cursor(cursor: str, sort: str, order: str) -> tuple:
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor.encode("utf-8")))
+        key = tuple(data["key"])
+    except (ValueError, KeyError, TypeError) as err:
+        raise PaginationError("Invalid cursor.") from err
+    if data.get("sort") != sort or data.get("order") != order or len(key) != 2:
+        raise PaginationError("Cursor does not match the requested sort.")
+    return key
+
+
+async def paginate_records(
+    profile: Profile,
+    record_cls: Type[BaseRecord],
+    tag_filter: dict = None,
+    *,
+    sort: str = "created_at",
+    order: str = SORT_ASC,
+    limit: int = 100,
+    cursor: str = None,
+) -> Tuple[List[BaseRecord], Optional[str]]:
+    """Return one page of records, ordered by sort then record id.
+
+    The cursor holds the (sort value, record id) of the last record of the
+    previous page; the page is the limit records that follow it (keyset).
+    Storage cannot scan in order, so the matching records are scanned in
+    batches, keeping only the best limit + 1 candidates in memory.
+
+    Returns the page and the cursor for the next page (None on the last page).
+    """
+    if order not in (SORT_ASC, SORT_DESC):
+        raise PaginationError(f"Invalid order '{order}'.")
+    if not 0 < limit <= MAX_LIMIT:
+        raise PaginationError(f"limit must be between 1 and {MAX_LIMIT}.")
+
+    _key = record_sort_key(sort)
+    wrap = _Descending if order == SORT_DESC else tuple
+    after = wrap(decode_cursor(cursor, sort, order)) if cursor else None
+
+    # sorted (key, record) candidates, at most limit + 1 of them
+    page: List[Tuple[Any, BaseRecord]] = []
+    async for record in scan_records(profile, record_cls, tag_filter):
+        key = wrap(_key(record))
+        if after is not None and not after < key:
+            continue
+        if len(page) > limit and not key < page[-1][0]:
+            continue
+        # keys end with the (unique) record id, records are never compared
+        bisect.insort(page, (key, record))
+        if len(page) > limit + 1:
+            page.pop()
+
+    next_cursor = None
+    if len(page) > limit:
+        page = page[:limit]
+        next_cursor = encode_cursor(sort, order, _key(page[-1][1]))
+    return [record for _, record in page], next_cursor
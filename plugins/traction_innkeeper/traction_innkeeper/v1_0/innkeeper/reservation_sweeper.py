@@ -0,0 +1,176 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from aries_cloudagent.core.profile import Profile
+from aries_cloudagent.messaging.util import str_to_datetime
+from aries_cloudagent.storage.error import StorageNotFoundError
+
+from .config import ReservationConfig
+from .models import ReservationRecord
+from .pagination import scan_records
+
+LOGGER = logging.getLogger(__name__)
+
+
+class ReservationSweeper:
+    """Background task expiring approved reservations that were never used.
+
+    Approved reservations are tagged with the hour their token expires in (the
+    expiry bucket), so a sweep only reads the reservations of the buckets that
+    passed since the previous sweep. Expired reservations are moved to the
+    expired state and lose their token hash; after the retention period they
+    are deleted.
+    """
+
+    def __init__(self, profile: Profile, config: ReservationConfig):
+        """
+        Initialize a ReservationSweeper.
+
+        Args:
+            profile: The root profile, reservations live under it
+            config: The reservation configuration
+        """
+        self._profile = profile
+        self._config = config
+        self._task: Optional[asyncio.Task] = None
+        # first bucket not known to be fully swept, None until the first sweep
+        self._next_bucket: Optional[datetime] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self._config.sweep_interval_seconds > 0
+
+    async def start(self):
+        if not self.enabled:
+            return
+        self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        if self._task and not self._task.done():
+            self._task.cancel()
+        self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.sweep()
+            except asyncio.CancelledError:
+                raise
+            except Exception as err:
+                LOGGER.error(f"reservation sweep failed: {err}")
+            await asyncio.sleep(self._config.sweep_interval_seconds)
+
+    async def sweep(self) -> dict:
+        """Expire (and purge) reservations, return the number of each."""
+        now = datetime.now(tz=timezone.utc)
+        current = now.replace(minute=0, second=0, microsecond=0)
+        if self._next_bucket is None:
+            # nothing is known about earlier buckets, look at all approved
+            tag_filters = [{"state": ReservationRecord.STATE_APPROVED}]
+        else:
+            tag_filters = [
+                {
+                    "state": ReservationRecord.STATE_APPROVED,
+                    ReservationRecord.EXPIRY_BUCKET_TAG: (
+                        ReservationRecord.expiry_bucket(bucket)
+                    ),
+                }
+                for bucket in _buckets(self._next_bucket, current)
+            ]
+
+        expired = 0
+        for tag_filter in tag_filters:
+            # collect first, expiring changes the records being scanned
+            candidates = [
+                record.reservation_id
+                async for record in scan_records(
+                    self._profile, ReservationRecord, tag_filter
+                )
+                if record.expired
+            ]
+            for reservation_id in candidates:
+                if await self._expire(reservation_id):
+                    expired += 1
+        # the current hour is swept again until it has passed
+        self._next_bucket = current
+
+        purged = await self.purge(now)
+        if expired or purged:
+            LOGGER.info(f"reservations expired = {expired}, purged = {purged}")
+        return {"expired": expired, "purged": purged}
+
+    async def _expire(self, reservation_id: str) -> bool:
+        async with self._profile.transaction() as txn:
+            # re-read under lock, it may have been checked in or refreshed
+            try:
+                record = await ReservationRecord.retrieve_by_reservation_id(
+                    txn, reservation_id, for_update=True
+                )
+            except StorageNotFoundError:
+                return False
+            if record.state != ReservationRecord.STATE_APPROVED or not record.expired:
+                return False
+            record.state = ReservationRecord.STATE_EXPIRED
+            # the token can no longer be used, keep the expiry for the purge
+            record.reservation_token_hash = None
+            record.reservation_token_salt = None
+            await record.save(txn, reason="Reservation expired")
+            await txn.commit()
+        return True
+
+    async def purge(self, now: datetime = None) -> int:
+        """Delete expired reservations that are past the retention period."""
+        if self._config.expired_retention_days <= 0:
+            return 0
+        now = now or datetime.now(tz=timezone.utc)
+        cutoff = now - timedelta(days=self._config.expired_retention_days)
+        # collect first, deleting changes the records being scanned
+        candidates = [
+            record.reservation_id
+            async for record in scan_records(
+                self._profile,
+                ReservationRecord,
+                {"state": ReservationRecord.STATE_EXPIRED},
+            )
+            if _past(record, cutoff)
+        ]
+        purged = 0
+        for reservation_id in candidates:
+            if await self._purge(reservation_id, cutoff):
+                purged += 1
+        return purged
+
+    async def _purge(self, reservation_id: str, cutoff: datetime) -> bool:
+        async with self._profile.transaction() as txn:
+            # re-read under lock, it may have been deleted or refreshed
+            try:
+                record = await ReservationRecord.retrieve_by_reservation_id(
+                    txn, reservation_id, for_update=True
+                )
+            except StorageNotFoundError:
+                return False
+            if record.state != ReservationRecord.STATE_EXPIRED or not _past(
+                record, cutoff
+            ):
+                return False
+            await record.delete_record(txn)
+            await txn.commit()
+        return True
+
+
+def _past(record: ReservationRecord, cutoff: datetime) -> bool:
+    """Whether the token of an expired reservation expired before cutoff."""
+    return (
+        not record.reservation_token_expiry
+        or str_to_datetime(record.reservation_token_expiry) < cutoff
+    )
+
+
+def _buckets(start: datetime, end: datetime):
+    """Yield the hours from start to end, both included."""
+    bucket = start
+    while bucket <= end:
+        yield bucket
+        bucket += timedelta(hours=1)
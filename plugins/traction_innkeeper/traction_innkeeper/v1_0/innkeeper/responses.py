@@ -0,0 +1,206 @@
+import gzip
+import hashlib
+import json
+import logging
+from typing import Any, Dict, Mapping, Optional
+
+from aiohttp import hdrs, web
+from aries_cloudagent.messaging.models.base_record import BaseRecord
+
+from .serializer import serialize_record
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+LOGGER = logging.getLogger(__name__)
+
+# smaller bodies are not worth compressing
+COMPRESS_MIN_SIZE = 1024
+# favour speed, responses are compressed on every request
+GZIP_LEVEL = 5
+BROTLI_QUALITY = 4
+
+# cached by the client but revalidated on every use (a 304 while unchanged)
+CACHE_REVALIDATE = "private, no-cache"
+
+
+def dumps(data: Any) -> bytes:
+    """Encode data as JSON, with orjson if it is installed."""
+    if orjson:
+        try:
+            return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            # types orjson does not handle (e.g. ints over 64 bits)
+            pass
+    return json.dumps(data).encode("utf-8")
+
+
+def accepted_encoding(request: web.BaseRequest) -> Optional[str]:
+    """Pick br or gzip from the Accept-Encoding of request, None for identity."""
+    accepted = {}
+    for item in request.headers.get(hdrs.ACCEPT_ENCODING, "").split(","):
+        coding, _, params = item.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[coding.strip().lower()] = quality
+
+    def _q(coding: str) -> float:
+        return accepted.get(coding, accepted.get("*", 0.0))
+
+    candidates = ["br", "gzip"] if brotli else ["gzip"]
+    best = max(candidates, key=_q)
+    return best if _q(best) > 0 else None
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+
+def make_etag(*parts: Any) -> str:
+    """A (weak) ETag from a hash of parts, e.g. a body or a record id and version."""
+    digest = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        digest.update(part if isinstance(part, bytes) else str(part).encode("utf-8"))
+        digest.update(b"\0")
+    return f'W/"{digest.hexdigest()}"'
+
+
+def record_etag(record: BaseRecord, wallet_id: str = None) -> str:
+    """ETag of a record version, changes on every save (updated_at).
+
+    wallet_id scopes it for records stored per wallet, under the same id.
+    """
+    return make_etag(record.RECORD_TYPE, wallet_id, record._id, record.updated_at)
+
+
+def etag_matches(request: web.BaseRequest, etag: str) -> bool:
+    """True if the If-None-Match of request matches etag (weak comparison)."""
+    if request.method not in (hdrs.METH_GET, hdrs.METH_HEAD):
+        return False
+    header = request.headers.get(hdrs.IF_NONE_MATCH)
+    if not header:
+        return False
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+
+def not_modified(etag: str, cache_control: str = None) -> web.Response:
+    headers = {hdrs.ETAG: etag}
+    if cache_control:
+        headers[hdrs.CACHE_CONTROL] = cache_control
+    return web.Response(status=304, headers=headers)
+
+
+def record_response(
+    request: web.BaseRequest,
+    record: BaseRecord,
+    *,
+    cache_control: str = None,
+    wallet_id: str = None,
+) -> web.Response:
+    """Response for a single record, 304 if the client has this version."""
+    etag = record_etag(record, wallet_id)
+    if etag_matches(request, etag):
+        # not even serialized
+        return not_modified(etag, cache_control)
+    return json_response(
+        request, serialize_record(record), etag=etag, cache_control=cache_control
+    )
+
+
+class PreparedJson:
+    """A JSON body encoded (and hashed) once, for responses sent many times.
+
+    Compressed variants are kept as well, each computed on first use.
+    """
+
+    def __init__(self, data: Any):
+        self.body = dumps(data)
+        self.etag = make_etag(self.body)
+        self._compressed: Dict[str, bytes] = {}
+
+    def encoded(self, encoding: str) -> bytes:
+        body = self._compressed.get(encoding)
+        if body is None:
+            body = self._compressed[encoding] = compress(self.body, encoding)
+        return body
+
+
+def prepared_response(
+    request: web.BaseRequest, prepared: PreparedJson, *, cache_control: str = None
+) -> web.Response:
+    """Response for a prepared body, 304 if the client has it already."""
+    if etag_matches(request, prepared.etag):
+        return not_modified(prepared.etag, cache_control)
+    body = prepared.body
+    headers = {hdrs.ETAG: prepared.etag}
+    if cache_control:
+        headers[hdrs.CACHE_CONTROL] = cache_control
+    if len(body) >= COMPRESS_MIN_SIZE:
+        headers[hdrs.VARY] = hdrs.ACCEPT_ENCODING
+        encoding = accepted_encoding(request)
+        if encoding:
+            body = prepared.encoded(encoding)
+            headers[hdrs.CONTENT_ENCODING] = encoding
+    return web.Response(body=body, headers=headers, content_type="application/json")
+
+
+def json_response(
+    request: web.BaseRequest,
+    data: Any,
+    *,
+    status: int = 200,
+    headers: Mapping[str, str] = None,
+    etag: str = None,
+    cache_control: str = None,
+) -> web.Response:
+    """Like web.json_response, with a faster encoder and compression.
+
+    Bodies of COMPRESS_MIN_SIZE bytes or more are sent gzip (or brotli, if
+    installed) compressed to clients that accept it.
+    Successful GET responses carry an ETag (a hash of the body unless etag is
+    given) and are answered with 304 Not Modified when it matches If-None-Match.
+    """
+    conditional = status == 200 and request.method in (hdrs.METH_GET, hdrs.METH_HEAD)
+    if conditional and etag and etag_matches(request, etag):
+        return not_modified(etag, cache_control)
+    body = dumps(data)
+    headers = dict(headers or {})
+    if conditional:
+        etag = etag or make_etag(body)
+        if etag_matches(request, etag):
+            return not_modified(etag, cache_control)
+        headers[hdrs.ETAG] = etag
+        if cache_control:
+            headers[hdrs.CACHE_CONTROL] = cache_control
+    if len(body) >= COMPRESS_MIN_SIZE:
+        headers[hdrs.VARY] = hdrs.ACCEPT_ENCODING
+        encoding = accepted_encoding(request)
+        if encoding:
+            body = compress(body, encoding)
+            headers[hdrs.CONTENT_ENCODING] = encoding
+    return web.Response(
+        body=body, status=status, headers=headers, content_type="application/json"
+    )
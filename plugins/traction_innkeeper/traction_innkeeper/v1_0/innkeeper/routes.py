@@ -1,6 +1,8 @@
+import asyncio
 import functools
+import json
 import logging
-import uuid
+from typing import List, Type
 
 from aiohttp import ClientSession, web
 from aiohttp_apispec import (
@@ -12,33 +14,53 @@ from aiohttp_apispec import (
 )
 from aries_cloudagent.admin.request_context import AdminRequestContext
 from aries_cloudagent.admin.server import AdminConfigSchema
+from aries_cloudagent.core.profile import Profile
 from aries_cloudagent.messaging.models.base import BaseModelError
+from aries_cloudagent.messaging.models.base_record import BaseRecord
 from aries_cloudagent.messaging.models.openapi import OpenAPISchema
 from aries_cloudagent.messaging.valid import JSONWebToken, UUIDFour
 from aries_cloudagent.multitenant.admin.routes import (
     CreateWalletTokenRequestSchema,
     CreateWalletTokenResponseSchema,
 )
-from aries_cloudagent.multitenant.base import BaseMultitenantManager
 from aries_cloudagent.multitenant.error import WalletKeyMissingError
 from aries_cloudagent.storage.error import StorageError, StorageNotFoundError
-from aries_cloudagent.version import __version__
 from aries_cloudagent.wallet.error import WalletSettingsError
 from aries_cloudagent.wallet.models.wallet_record import WalletRecord
 from marshmallow import fields, validate
 
+from .responses import json_response, prepared_response
 from . import TenantManager
 from .config import InnkeeperWalletConfig
+from .crypto import CryptoServiceBusyError
+from .invalidation import TOPIC_API_KEY
+from .search import reindex_records, search_records
+from .serializer import serialize_record, serialize_records
 from .utils import (
     approve_reservation,
+    checkin_reservation,
+    provision_tenant,
     refresh_registration_token,
     create_api_key,
+    find_api_keys,
     EndorserLedgerConfigSchema,
     ReservationException,
     TenantApiKeyException,
     TenantConfigSchema,
+    verify_api_key,
+)
+from .pagination import (
+    MAX_LIMIT,
+    SORT_ASC,
+    SORT_DESC,
+    PaginationError,
+    paginate_records,
+    record_sort_key,
+    scan_records,
 )
 from .models import (
+    InnkeeperStatsRecord,
+    InnkeeperStatsRecordSchema,
     ReservationRecord,
     ReservationRecordSchema,
     TenantRecord,
@@ -50,6 +72,26 @@ from .models import (
 LOGGER = logging.getLogger(__name__)
 SWAGGER_CATEGORY = "traction-innkeeper"
 
+# fields the innkeeper lists can be sorted by
+TENANT_SORT_FIELDS = ["created_at", "updated_at", "tenant_name", "state"]
+RESERVATION_SORT_FIELDS = ["created_at", "updated_at", "tenant_name", "state"]
+API_KEY_SORT_FIELDS = ["created_at", "updated_at", "alias", "tenant_id"]
+SEARCH_DEFAULT_LIMIT = 50
+
+# always reported by /innkeeper/stats
+RESERVATION_STATES = [
+    ReservationRecord.STATE_REQUESTED,
+    ReservationRecord.STATE_APPROVED,
+    ReservationRecord.STATE_DENIED,
+    ReservationRecord.STATE_CHECKED_IN,
+    ReservationRecord.STATE_EXPIRED,
+]
+TENANT_STATES = [
+    TenantRecord.STATE_ACTIVE,
+    TenantRecord.STATE_DELETED,
+    TenantRecord.STATE_PURGING,
+]
+
 
 def innkeeper_only(func):
     @functools.wraps(func)
@@ -86,6 +128,8 @@ def error_handler(func):
             raise web.HTTPNotFound(reason=err.roll_up) from err
         except WalletKeyMissingError as err:
             raise web.HTTPUnauthorized(reason=err.roll_up) from err
+        except CryptoServiceBusyError as err:
+            raise web.HTTPServiceUnavailable(reason=err.roll_up) from err
         except (WalletSettingsError, StorageError, BaseModelError) as err:
             raise web.HTTPBadRequest(reason=err.roll_up) from err
         except Exception as err:
@@ -108,7 +152,7 @@ class CustomCreateWalletTokenRequestSchema(CreateWalletTokenRequestSchema):
     api_key = fields.Str(
         description="API key for this wallet",
         required=False,
-        example="3bd14a1e8fb645ddadf9913c0922ff3b",
+        example="tak_5d4c6e2b0c1b4c4e9e8f0a3a2b1c0d9e_3bd14a1e8fb645ddadf9913c0922ff3b",
     )
 
 
@@ -184,6 +228,47 @@ class CheckinResponseSchema(OpenAPISchema):
     )
 
 
+class BulkTenantSpecSchema(ReservationRequestSchema):
+    """Tenant spec for bulk provisioning."""
+
+    state_notes = fields.Str(
+        required=False,
+        description="Reason(s) for approving this tenant",
+        example="Welcome",
+    )
+
+
+class BulkTenantRequestSchema(OpenAPISchema):
+    """Request schema for bulk tenant provisioning."""
+
+    tenants = fields.List(
+        fields.Nested(BulkTenantSpecSchema()),
+        required=True,
+        description="Tenants to reserve, approve and check in",
+    )
+    concurrency = fields.Int(
+        required=False,
+        description="Wallets to create at once, capped by server configuration",
+        example=4,
+    )
+
+
+class BulkTenantResultSchema(OpenAPISchema):
+    """Result (one line per tenant) of bulk tenant provisioning."""
+
+    index = fields.Int(description="Position of the tenant spec in the request")
+    tenant_name = fields.Str(description="Requested tenant name")
+    reservation_id = fields.Str(description="Reservation identifier")
+    tenant_id = fields.Str(description="Tenant identifier")
+    wallet_id = fields.Str(description="Subwallet identifier")
+    wallet_key = fields.Str(description="Master key used for key derivation.")
+    token = fields.Str(
+        description="Authorization token to authenticate wallet requests",
+        example=JSONWebToken.EXAMPLE,
+    )
+    error = fields.Str(description="Reason provisioning failed for this tenant")
+
+
 class ReservationListSchema(OpenAPISchema):
     """Response schema for reservations list."""
 
@@ -191,6 +276,42 @@ class ReservationListSchema(OpenAPISchema):
         fields.Nested(ReservationRecordSchema()),
         description="List of reservations",
     )
+    next_cursor = fields.Str(
+        required=False,
+        description="Cursor for the next page, absent on the last page",
+    )
+
+
+class PaginationQuerySchema(OpenAPISchema):
+    """Query parameters schema for paginated lists."""
+
+    limit = fields.Int(
+        required=False,
+        description="Page size, all records are returned if not set",
+        example=100,
+        validate=validate.Range(min=1, max=MAX_LIMIT),
+    )
+    cursor = fields.Str(
+        required=False,
+        description="The next_cursor of the previous page",
+    )
+    order = fields.Str(
+        required=False,
+        description="Sort order",
+        example=SORT_ASC,
+        validate=validate.OneOf([SORT_ASC, SORT_DESC]),
+    )
+
+
+class ReservationListQuerySchema(PaginationQuerySchema):
+    """Query parameters schema for reservations list."""
+
+    sort = fields.Str(
+        required=False,
+        description="Field to sort by",
+        example="created_at",
+        validate=validate.OneOf(RESERVATION_SORT_FIELDS),
+    )
 
 
 class ReservationIdMatchInfoSchema(OpenAPISchema):
@@ -270,7 +391,7 @@ class TenantAuthenticationsApiResponseSchema(OpenAPISchema):
     api_key = fields.Str(
         required=True,
         description="The API key",
-        example="3bd14a1e8fb645ddadf9913c0922ff3b",
+        example="tak_5d4c6e2b0c1b4c4e9e8f0a3a2b1c0d9e_3bd14a1e8fb645ddadf9913c0922ff3b",
     )
 
 
@@ -281,18 +402,38 @@ class TenantListSchema(OpenAPISchema):
         fields.Nested(TenantRecordSchema()),
         description="List of tenants",
     )
+    next_cursor = fields.Str(
+        required=False,
+        description="Cursor for the next page, absent on the last page",
+    )
 
 
-class TenantListQuerySchema(OpenAPISchema):
+class TenantListQuerySchema(PaginationQuerySchema):
     """Query parameters schema for tenants list."""
 
+    sort = fields.Str(
+        required=False,
+        description="Field to sort by",
+        example="created_at",
+        validate=validate.OneOf(TENANT_SORT_FIELDS),
+    )
+
     state = fields.Str(
         required=False,
         description="The state of the tenants to filter by.",
         example=TenantRecord.STATE_ACTIVE,
-        validate=validate.OneOf(
-            [TenantRecord.STATE_ACTIVE, TenantRecord.STATE_DELETED, "all"]
-        ),
+        validate=validate.OneOf(TENANT_STATES + ["all"]),
+    )
+
+
+class TenantExportQuerySchema(OpenAPISchema):
+    """Query parameters schema for tenants export."""
+
+    state = fields.Str(
+        required=False,
+        description="The state of the tenants to filter by.",
+        example=TenantRecord.STATE_ACTIVE,
+        validate=validate.OneOf(TENANT_STATES + ["all"]),
     )
 
 
@@ -303,6 +444,21 @@ class TenantAuthenticationApiListSchema(OpenAPISchema):
         fields.Nested(TenantAuthenticationApiRecordSchema()),
         description="List of reservations",
     )
+    next_cursor = fields.Str(
+        required=False,
+        description="Cursor for the next page, absent on the last page",
+    )
+
+
+class TenantAuthenticationApiListQuerySchema(PaginationQuerySchema):
+    """Query parameters schema for authentications - API keys list."""
+
+    sort = fields.Str(
+        required=False,
+        description="Field to sort by",
+        example="created_at",
+        validate=validate.OneOf(API_KEY_SORT_FIELDS),
+    )
 
 
 class TenantAuthenticationApiIdMatchInfoSchema(OpenAPISchema):
@@ -324,6 +480,178 @@ class TenantAuthenticationApiOperationResponseSchema(OpenAPISchema):
     )
 
 
+class CryptoStatsSchema(OpenAPISchema):
+    """Response schema for crypto pool statistics."""
+
+    executor = fields.Str(description="Executor type", example="thread")
+    max_workers = fields.Int(description="Maximum concurrent crypto calls")
+    max_queue = fields.Int(description="Maximum queued crypto calls (0 = unbounded)")
+    active = fields.Int(description="Crypto calls currently running")
+    queued = fields.Int(description="Crypto calls currently waiting for a worker")
+    max_queued = fields.Int(description="High water mark of queued crypto calls")
+    submitted = fields.Int(description="Total crypto calls submitted")
+    completed = fields.Int(description="Total crypto calls completed")
+    failed = fields.Int(description="Total crypto calls failed")
+    rejected = fields.Int(description="Total crypto calls rejected, queue full")
+    avg_wait_ms = fields.Float(description="Average time waiting for a worker (ms)")
+    avg_run_ms = fields.Float(description="Average time running (ms)")
+    max_run_ms = fields.Float(description="Maximum time running (ms)")
+
+
+class WalletPoolStatsSchema(OpenAPISchema):
+    """Response schema for wallet pool statistics."""
+
+    enabled = fields.Bool(description="True if the wallet pool is enabled")
+    size = fields.Int(description="Configured number of pooled wallets")
+    available = fields.Int(description="Pooled wallets ready to be claimed")
+    refilling = fields.Bool(description="True if the pool is being refilled")
+    hits = fields.Int(description="Check-ins served from the pool")
+    misses = fields.Int(description="Check-ins that found the pool empty")
+    created = fields.Int(description="Pooled wallets created")
+    failed = fields.Int(description="Pooled wallet creations failed")
+
+
+class SearchQuerySchema(OpenAPISchema):
+    """Query parameters schema for tenant and reservation search."""
+
+    name = fields.Str(
+        required=False,
+        description="Tenant name prefix (case insensitive)",
+        example="acme",
+    )
+    email = fields.Str(
+        required=False,
+        description="Contact email (case insensitive, exact)",
+        example="admin@example.com",
+    )
+    state = fields.Str(
+        required=False,
+        description="Only tenants and reservations in this state",
+        example=TenantRecord.STATE_ACTIVE,
+    )
+    limit = fields.Int(
+        required=False,
+        description="Maximum number of tenants and of reservations returned",
+        example=SEARCH_DEFAULT_LIMIT,
+        validate=validate.Range(min=1, max=MAX_LIMIT),
+    )
+
+
+class SearchResultSchema(OpenAPISchema):
+    """Response schema for tenant and reservation search."""
+
+    tenants = fields.List(
+        fields.Nested(TenantRecordSchema()),
+        description="Matching tenants",
+    )
+    reservations = fields.List(
+        fields.Nested(ReservationRecordSchema()),
+        description="Matching reservations",
+    )
+
+
+class SearchReindexResultSchema(OpenAPISchema):
+    """Response schema for search reindex."""
+
+    tenants = fields.Int(description="Number of tenants reindexed")
+    reservations = fields.Int(description="Number of reservations reindexed")
+
+
+class TenantPurgeQuerySchema(OpenAPISchema):
+    """Query parameters schema for tenant purge."""
+
+    retention_days = fields.Int(
+        required=False,
+        description="Purge tenants deleted at least this many days ago "
+        "(default: tenant_purge.retention_days)",
+        example=30,
+        validate=validate.Range(min=1),
+    )
+
+
+class TenantPurgeProgressSchema(OpenAPISchema):
+    """Response schema for tenant purge progress."""
+
+    status = fields.Str(
+        description="Purge status",
+        validate=validate.OneOf(["idle", "running", "finished", "failed"]),
+        example="running",
+    )
+    retention_days = fields.Int(description="Retention of this purge")
+    started_at = fields.Str(description="Time the purge started")
+    finished_at = fields.Str(description="Time the purge finished")
+    candidates = fields.Int(description="Deleted tenants past the retention")
+    purged = fields.Int(description="Tenants purged so far")
+    failed = fields.Int(description="Tenants that could not be purged")
+    api_keys_deleted = fields.Int(description="API keys deleted so far")
+    reservations_deleted = fields.Int(description="Reservations deleted so far")
+    wallets_removed = fields.Int(description="Wallets removed so far")
+    error = fields.Str(description="Why the purge failed")
+
+
+async def list_records(
+    request: web.BaseRequest,
+    profile: Profile,
+    record_cls: Type[BaseRecord],
+    tag_filter: dict,
+    sort_fields: List[str],
+) -> dict:
+    """Build a list response: one page of records with limit, else all of them."""
+    limit = request.query.get("limit")
+    sort = request.query.get("sort", "created_at")
+    order = request.query.get("order", SORT_ASC)
+    if sort not in sort_fields:
+        raise web.HTTPBadRequest(reason=f"Cannot sort by '{sort}'.")
+
+    if not limit:
+        async with profile.session() as session:
+            records = await record_cls.query(
+                session=session,
+                tag_filter=tag_filter,
+                post_filter_positive={},
+                alt=True,
+            )
+        if "sort" in request.query:
+            records = sorted(
+                records, key=record_sort_key(sort), reverse=order == SORT_DESC
+            )
+        return {"results": serialize_records(records)}
+
+    try:
+        records, next_cursor = await paginate_records(
+            profile,
+            record_cls,
+            tag_filter,
+            sort=sort,
+            order=order,
+            limit=int(limit),
+            cursor=request.query.get("cursor"),
+        )
+    except (PaginationError, ValueError) as err:
+        raise web.HTTPBadRequest(reason=str(err))
+    response = {"results": serialize_records(records)}
+    if next_cursor:
+        response["next_cursor"] = next_cursor
+    return response
+
+
+async def stream_records(
+    request: web.BaseRequest,
+    profile: Profile,
+    record_cls: Type[BaseRecord],
+    tag_filter: dict,
+) -> web.StreamResponse:
+    """Stream the matching records as newline delimited JSON, batch by batch."""
+    response = web.StreamResponse()
+    response.content_type = "application/x-ndjson"
+    await response.prepare(request)
+    async for record in scan_records(profile, record_cls, tag_filter):
+        line = json.dumps(serialize_record(record)).encode("utf-8")
+        await response.write(line + b"\n")
+    await response.write_eof()
+    return response
+
+
 @docs(
     tags=["multitenancy"],
 )
@@ -348,13 +676,13 @@ async def tenant_reservation(request: web.BaseRequest):
         LOGGER.info("Tenant auto-approve is on, approving newly created tenant")
         try:
             _pwd = await approve_reservation(rec.reservation_id, rec.state_notes, mgr)
-            return web.json_response(
-                {"reservation_id": rec.reservation_id, "reservation_pwd": _pwd}
+            return json_response(
+                request, {"reservation_id": rec.reservation_id, "reservation_pwd": _pwd}
             )
         except ReservationException as err:
             raise web.HTTPConflict(reason=str(err))
 
-    return web.json_response({"reservation_id": rec.reservation_id})
+    return json_response(request, {"reservation_id": rec.reservation_id})
 
 
 @docs(
@@ -378,7 +706,7 @@ async def tenant_reservation_get(request: web.BaseRequest):
         )
         LOGGER.info(rec)
 
-    return web.json_response(rec.serialize())
+    return json_response(request, rec.serialize())
 
 
 @docs(
@@ -403,50 +731,34 @@ async def tenant_checkin(request: web.BaseRequest):
         res_rec = await ReservationRecord.retrieve_by_reservation_id(
             session, reservation_id
         )
-        reservation_pwd = body.get("reservation_pwd")
-
-        if res_rec.expired:
-            raise web.HTTPUnauthorized(reason="Reservation has expired")
-
-        if res_rec.state == ReservationRecord.STATE_APPROVED:
-            reservation_token = mgr.check_reservation_password(reservation_pwd, res_rec)
-            if not reservation_token:
-                raise web.HTTPUnauthorized(reason="Reservation password incorrect")
-
-            # ok, let's update this, create a tenant, create a wallet
-            wallet_key = str(uuid.uuid4())
-            settings_dict = {}
-            if res_rec.connect_to_endorsers and len(res_rec.connect_to_endorsers) > 0:
-                settings_dict["tenant.endorser_config"] = res_rec.connect_to_endorsers
-            if res_rec.create_public_did and len(res_rec.create_public_did) > 0:
-                settings_dict["tenant.public_did_config"] = res_rec.create_public_did
-            tenant, wallet_record, token = await mgr.create_wallet(
-                wallet_name=res_rec.tenant_name,
-                wallet_key=wallet_key,
-                tenant_email=res_rec.contact_email,
-                extra_settings=settings_dict,
-            )
+    reservation_pwd = body.get("reservation_pwd")
 
-            # update this reservation
-            res_rec.state = ReservationRecord.STATE_CHECKED_IN
-            res_rec.wallet_id = wallet_record.wallet_id
-            res_rec.tenant_id = tenant.tenant_id
-            # do not need reservation token data
-            res_rec.reservation_token_hash = None
-            res_rec.reservation_token_salt = None
-            res_rec.reservation_token_expiry = None
-            await res_rec.save(session)
-        else:
-            raise web.HTTPConflict(
-                reason=f"Reservation state is currently '{res_rec.state}' and cannot be set to '{ReservationRecord.STATE_CHECKED_IN}'."
-            )
+    if res_rec.expired:
+        raise web.HTTPUnauthorized(reason="Reservation has expired")
+
+    if res_rec.state != ReservationRecord.STATE_APPROVED:
+        raise web.HTTPConflict(
+            reason=f"Reservation state is currently '{res_rec.state}' and cannot "
+            f"be set to '{ReservationRecord.STATE_CHECKED_IN}'."
+        )
+
+    reservation_token = await mgr.check_reservation_password(reservation_pwd, res_rec)
+    if not reservation_token:
+        raise web.HTTPUnauthorized(reason="Reservation password incorrect")
+
+    # ok, let's create a wallet and a tenant, and check in this reservation
+    try:
+        wallet_record, wallet_key, token = await checkin_reservation(res_rec, mgr)
+    except ReservationException as err:
+        raise web.HTTPConflict(reason=str(err))
 
-    return web.json_response(
+    return json_response(
+        request,
         {
             "wallet_id": wallet_record.wallet_id,
             "wallet_key": wallet_key,
             "token": token,
-        }
+        },
     )
 
 
@@ -483,43 +795,36 @@ async def tenant_create_token(request: web.BaseRequest):
             reason="Wallet Key and API Key cannot be provided together"
         )
 
-    # if an API key is provided verify it is valid
-    if api_key:
-        async with profile.session() as session:
-            tenant_keys = await TenantAuthenticationApiRecord.query_by_tenant_id(
-                session, tenant_id
-            )
-            LOGGER.warning(f"tenant_keys = {tenant_keys}")
-            # if no keys found raise an error
+    # look up the API keys, the tenant and its wallet in one session, and close
+    # it before verifying the key: hashing waits on the crypto pool
+    async with profile.session() as session:
+        if api_key:
+            tenant_keys = await find_api_keys(session, tenant_id, api_key)
+            # before the tenant lookup, as when the key was verified first
             if not tenant_keys:
                 raise web.HTTPUnauthorized(reason="API Key not found")
-            # check if the provided key matches any of the tenant keys
-            for tenant_key in tenant_keys:
-                if mgr.check_api_key(api_key, tenant_key):
-                    break
-            else:
-                raise web.HTTPUnauthorized(reason="API Key mismatch")
-
-    # first look up the tenant...
-    async with profile.session() as session:
         tenant_record = await TenantRecord.retrieve_by_id(session, tenant_id)
-
-    # now just do the same wallet_id based token create.
-    wallet_id = tenant_record.wallet_id
-    multitenant_mgr = profile.inject(BaseMultitenantManager)
-    async with profile.session() as session:
+        wallet_id = tenant_record.wallet_id
         wallet_record = await WalletRecord.retrieve_by_id(session, wallet_id)
 
+    # if an API key is provided verify it is valid
+    if api_key:
+        try:
+            await verify_api_key(tenant_id, api_key, tenant_keys, mgr)
+        except TenantApiKeyException as err:
+            raise web.HTTPUnauthorized(reason=str(err))
+
     if (not wallet_record.requires_external_key) and wallet_key:
         LOGGER.warning(
             f"Wallet {wallet_id} doesn't require the wallet key but one was provided"
         )
 
     # Wallet key access use suppled, API key access used looked up key
+    # the tenant manager reuses a still valid token when configured to do so
     key = wallet_key if wallet_key else wallet_record.wallet_key
-    token = await multitenant_mgr.create_auth_token(wallet_record, key)
+    token = await mgr.get_token(wallet_record, key)
 
-    return web.json_response({"token": token})
+    return json_response(request, {"token": token})
 
 
 @docs(
@@ -534,6 +839,61 @@ async def innkeeper_tenant_reservation(request: web.BaseRequest):
     return res
 
 
+@docs(
+    tags=[SWAGGER_CATEGORY],
+    summary="Reserve, approve and check in many tenants",
+    description="Results are streamed back as newline delimited JSON "
+    "(application/x-ndjson), one line per tenant as each one completes.",
+)
+@request_schema(BulkTenantRequestSchema())
+@response_schema(BulkTenantResultSchema(), 200, description="")
+@innkeeper_only
+@error_handler
+async def innkeeper_tenants_bulk(request: web.BaseRequest):
+    context: AdminRequestContext = request["context"]
+
+    # records are under base/root profile, use Tenant Manager profile
+    mgr = context.inject(TenantManager)
+    reservation_config = mgr._config.reservation
+
+    body = await request.json()
+    specs = body.get("tenants") or []
+    if len(specs) > reservation_config.bulk_max_tenants:
+        raise web.HTTPBadRequest(
+            reason=f"Too many tenants, at most {reservation_config.bulk_max_tenants} "
+            "per request."
+        )
+    concurrency = min(
+        body.get("concurrency") or reservation_config.bulk_concurrency,
+        reservation_config.bulk_concurrency,
+    )
+    semaphore = asyncio.Semaphore(max(concurrency, 1))
+
+    async def _provision(index: int, spec: dict):
+        async with semaphore:
+            try:
+                result = await provision_tenant(spec, mgr)
+            except Exception as err:
+                LOGGER.error(f"bulk provisioning of tenant #{index} failed: {err}")
+                result = {"tenant_name": spec.get("tenant_name"), "error": str(err)}
+        return {"index": index, **result}
+
+    response = web.StreamResponse()
+    response.content_type = "application/x-ndjson"
+    await response.prepare(request)
+    tasks = [asyncio.ensure_future(_provision(i, s)) for i, s in enumerate(specs)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            result = await next_done
+            await response.write(json.dumps(result).encode("utf-8") + b"\n")
+    finally:
+        # client went away, stop provisioning the rest
+        for task in tasks:
+            task.cancel()
+    await response.write_eof()
+    return response
+
+
 @docs(
     tags=[SWAGGER_CATEGORY],
 )
@@ -544,14 +904,15 @@ async def tenant_default_config_settings(request: web.BaseRequest):
     context: AdminRequestContext = request["context"]
     mgr = context.inject(TenantManager)
     innkeeper_wallet_config: InnkeeperWalletConfig = mgr._config.innkeeper_wallet
-    return web.json_response(
+    return json_response(
+        request,
         {
             "connected_to_endorsers": list(
                 endorser_config.serialize()
                 for endorser_config in innkeeper_wallet_config.connect_to_endorser
             ),
             "created_public_did": innkeeper_wallet_config.create_public_did,
-        }
+        },
     )
 
 
@@ -583,7 +944,7 @@ async def tenant_config_update(request: web.BaseRequest):
             tenant_record.curr_ledger_id = curr_ledger_id
         tenant_record.enable_ledger_switch = enable_ledger_switch
         await tenant_record.save(session)
-    return web.json_response(tenant_record.serialize())
+    return json_response(request, tenant_record.serialize())
 
 
 @docs(
@@ -612,13 +973,14 @@ async def innkeeper_tenant_res_update(request: web.BaseRequest):
         if create_public_did:
             res_rec.create_public_did = create_public_did
         await res_rec.save(session)
-    return web.json_response(res_rec.serialize())
+    return json_response(request, res_rec.serialize())
 
 
 @docs(
     tags=[SWAGGER_CATEGORY],
 )
 @response_schema(ReservationListSchema(), 200, description="")
+@use_kwargs(ReservationListQuerySchema(), location="query")
 @innkeeper_only
 @error_handler
 async def innkeeper_reservations_list(request: web.BaseRequest):
@@ -629,18 +991,12 @@ async def innkeeper_reservations_list(request: web.BaseRequest):
     profile = mgr.profile
 
     tag_filter = {}
-    post_filter = {}
-    async with profile.session() as session:
-        # innkeeper can access all reservation records
-        records = await ReservationRecord.query(
-            session=session,
-            tag_filter=tag_filter,
-            post_filter_positive=post_filter,
-            alt=True,
-        )
-    results = [record.serialize() for record in records]
+    # innkeeper can access all reservation records
+    response = await list_records(
+        request, profile, ReservationRecord, tag_filter, RESERVATION_SORT_FIELDS
+    )
 
-    return web.json_response({"results": results})
+    return json_response(request, response)
 
 
 @docs(
@@ -667,7 +1023,7 @@ async def innkeeper_reservations_approve(request: web.BaseRequest):
     except ReservationException as err:
         raise web.HTTPConflict(reason=str(err))
 
-    return web.json_response({"reservation_pwd": _pwd})
+    return json_response(request, {"reservation_pwd": _pwd})
 
 
 @docs(
@@ -686,7 +1042,7 @@ async def innkeeper_reservations_refresh_password(request: web.BaseRequest):
         _pwd = await refresh_registration_token(reservation_id, mgr)
     except ReservationException as err:
         raise web.HTTPConflict(reason=str(err))
-    return web.json_response({"reservation_pwd": _pwd})
+    return json_response(request, {"reservation_pwd": _pwd})
 
 
 @docs(
@@ -724,7 +1080,7 @@ async def innkeeper_reservations_deny(request: web.BaseRequest):
                 reason=f"Reservation state is currently '{rec.state}' and cannot be set to '{ReservationRecord.STATE_DENIED}'."
             )
 
-    return web.json_response(rec.serialize())
+    return json_response(request, rec.serialize())
 
 
 @docs(
@@ -749,19 +1105,12 @@ async def innkeeper_tenants_list(request: web.BaseRequest):
     if state != "all":
         tag_filter["state"] = state
 
-    post_filter = {}
-
-    async with profile.session() as session:
-        # innkeeper can access all tenant records
-        records = await TenantRecord.query(
-            session=session,
-            tag_filter=tag_filter,
-            post_filter_positive=post_filter,
-            alt=True,
-        )
-    results = [record.serialize() for record in records]
+    # innkeeper can access all tenant records
+    response = await list_records(
+        request, profile, TenantRecord, tag_filter, TENANT_SORT_FIELDS
+    )
 
-    return web.json_response({"results": results})
+    return json_response(request, response)
 
 
 @docs(
@@ -784,7 +1133,7 @@ async def innkeeper_tenant_get(request: web.BaseRequest):
         rec = await TenantRecord.retrieve_by_id(session, tenant_id)
         LOGGER.info(rec)
 
-    return web.json_response(rec.serialize())
+    return json_response(request, rec.serialize())
 
 
 @docs(
@@ -801,12 +1150,17 @@ async def innkeeper_tenant_delete(request: web.BaseRequest):
     mgr = context.inject(TenantManager)
     profile = mgr.profile
 
-    async with profile.session() as session:
-        rec = await TenantRecord.retrieve_by_id(session, tenant_id)
+    async with profile.transaction() as txn:
+        # locked and read from storage, the tenant purge may be changing it
+        rec = await TenantRecord.retrieve_by_id(txn, tenant_id, for_update=True)
         if rec:
-            await rec.soft_delete(session)
+            await rec.soft_delete(txn)
+            await txn.commit()
+            await rec.notify_changed(profile)
             LOGGER.info("Tenant %s soft deleted.", tenant_id)
-            return web.json_response({"success": f"Tenant {tenant_id} soft deleted."})
+            return json_response(
+                request, {"success": f"Tenant {tenant_id} soft deleted."}
+            )
         else:
             raise web.HTTPNotFound(reason=f"Tenant {tenant_id} not found.")
     
@@ -826,15 +1180,20 @@ async def innkeeper_tenant_restore(request: web.BaseRequest):
     mgr = context.inject(TenantManager)
     profile = mgr.profile
     
-    async with profile.session() as session:
-        rec = await TenantRecord.retrieve_by_id(session, tenant_id)
+    async with profile.transaction() as txn:
+        # locked and read from storage, the tenant purge may be changing it
+        rec = await TenantRecord.retrieve_by_id(txn, tenant_id, for_update=True)
         if rec:
             if rec.state != TenantRecord.STATE_DELETED:
                 raise web.HTTPBadRequest(reason=f"Tenant {tenant_id} is not deleted.")
             else:
-                await rec.restore_deleted(session)
+                await rec.restore_deleted(txn)
+                await txn.commit()
+                await rec.notify_changed(profile)
                 LOGGER.info("Tenant %s has been restored.", tenant_id)
-                return web.json_response({"success": f"Tenant {tenant_id} restored."})
+                return json_response(
+                    request, {"success": f"Tenant {tenant_id} restored."}
+                )
         else:
             raise web.HTTPNotFound(reason=f"Tenant {tenant_id} not found.")
  
@@ -859,16 +1218,18 @@ async def innkeeper_authentications_api(request: web.BaseRequest):
     except TenantApiKeyException as err:
         raise web.HTTPConflict(reason=str(err))
 
-    return web.json_response(
+    return json_response(
+        request,
         {
             "tenant_authentication_api_id": tenant_authentication_api_id,
             "api_key": api_key,
-        }
+        },
     )
 
 
 @docs(tags=[SWAGGER_CATEGORY], summary="List all API Key Records")
 @response_schema(TenantAuthenticationApiListSchema(), 200, description="")
+@use_kwargs(TenantAuthenticationApiListQuerySchema(), location="query")
 @innkeeper_only
 @error_handler
 async def innkeeper_authentications_api_list(request: web.BaseRequest):
@@ -879,18 +1240,144 @@ async def innkeeper_authentications_api_list(request: web.BaseRequest):
     profile = mgr.profile
 
     tag_filter = {}
-    post_filter = {}
-    async with profile.session() as session:
-        # innkeeper can access all reservation records
-        records = await TenantAuthenticationApiRecord.query(
-            session=session,
-            tag_filter=tag_filter,
-            post_filter_positive=post_filter,
-            alt=True,
-        )
-    results = [record.serialize() for record in records]
+    # innkeeper can access all api key records
+    response = await list_records(
+        request,
+        profile,
+        TenantAuthenticationApiRecord,
+        tag_filter,
+        API_KEY_SORT_FIELDS,
+    )
+
+    return json_response(request, response)
+
+
+@docs(
+    tags=[SWAGGER_CATEGORY],
+    summary="Export tenants",
+    description="Matching tenants as newline delimited JSON (application/x-ndjson).",
+)
+@response_schema(TenantRecordSchema(), 200, description="One tenant per line")
+@use_kwargs(TenantExportQuerySchema(), location="query")
+@innkeeper_only
+@error_handler
+async def innkeeper_tenants_export(request: web.BaseRequest):
+    context: AdminRequestContext = request["context"]
+
+    # records are under base/root profile, use Tenant Manager profile
+    mgr = context.inject(TenantManager)
+    profile = mgr.profile
+
+    # same state filter as the tenants list
+    state = request.query.get("state", TenantRecord.STATE_ACTIVE)
+    tag_filter = {}
+    if state != "all":
+        tag_filter["state"] = state
 
-    return web.json_response({"results": results})
+    return await stream_records(request, profile, TenantRecord, tag_filter)
+
+
+@docs(
+    tags=[SWAGGER_CATEGORY],
+    summary="Export reservations",
+    description="All reservations as newline delimited JSON (application/x-ndjson).",
+)
+@response_schema(ReservationRecordSchema(), 200, description="One reservation per line")
+@innkeeper_only
+@error_handler
+async def innkeeper_reservations_export(request: web.BaseRequest):
+    context: AdminRequestContext = request["context"]
+
+    # records are under base/root profile, use Tenant Manager profile
+    mgr = context.inject(TenantManager)
+    profile = mgr.profile
+
+    return await stream_records(request, profile, ReservationRecord, {})
+
+
+@docs(
+    tags=[SWAGGER_CATEGORY],
+    summary="Export API Key Records",
+    description="All API key records as newline delimited JSON (application/x-ndjson).",
+)
+@response_schema(
+    TenantAuthenticationApiRecordSchema(), 200, description="One record per line"
+)
+@innkeeper_only
+@error_handler
+async def innkeeper_authentications_api_export(request: web.BaseRequest):
+    context: AdminRequestContext = request["context"]
+
+    # records are under base/root profile, use Tenant Manager profile
+    mgr = context.inject(TenantManager)
+    profile = mgr.profile
+
+    return await stream_records(request, profile, TenantAuthenticationApiRecord, {})
+
+
+@docs(
+    tags=[SWAGGER_CATEGORY],
+    summary="Search tenants and reservations",
+    description="Find tenants and reservations by name prefix and/or contact email.",
+)
+@response_schema(SearchResultSchema(), 200, description="")
+@use_kwargs(SearchQuerySchema(), location="query")
+@innkeeper_only
+@error_handler
+async def innkeeper_search(request: web.BaseRequest):
+    context: AdminRequestContext = request["context"]
+
+    # records are under base/root profile, use Tenant Manager profile
+    mgr = context.inject(TenantManager)
+    profile = mgr.profile
+
+    name = request.query.get("name")
+    email = request.query.get("email")
+    if not name and not email:
+        raise web.HTTPBadRequest(reason="name or email is required.")
+    kwargs = {
+        "name": name,
+        "email": email,
+        "state": request.query.get("state"),
+        "limit": int(request.query.get("limit", SEARCH_DEFAULT_LIMIT)),
+    }
+
+    tenants, reservations = await asyncio.gather(
+        search_records(profile, TenantRecord, **kwargs),
+        search_records(profile, ReservationRecord, **kwargs),
+    )
+    return json_response(
+        request,
+        {
+            "tenants": serialize_records(tenants),
+            "reservations": serialize_records(reservations),
+        },
+    )
+
+
+@docs(
+    tags=[SWAGGER_CATEGORY],
+    summary="Rebuild the search index",
+    description="Rewrite the tags of all tenants and reservations (search, "
+    "tenant and expiry tags), needed once for records created before these tags.",
+)
+@response_schema(SearchReindexResultSchema(), 200, description="")
+@innkeeper_only
+@error_handler
+async def innkeeper_search_reindex(request: web.BaseRequest):
+    context: AdminRequestContext = request["context"]
+
+    # records are under base/root profile, use Tenant Manager profile
+    mgr = context.inject(TenantManager)
+    profile = mgr.profile
+
+    return json_response(
+        request,
+        {
+            "tenants": await reindex_records(profile, TenantRecord),
+            "reservations": await reindex_records(profile, ReservationRecord),
+        },
+    )
 
 
 @docs(tags=[SWAGGER_CATEGORY], summary="Read API Key Record")
@@ -913,7 +1400,7 @@ async def innkeeper_authentications_api_get(request: web.BaseRequest):
         )
         LOGGER.info(rec)
 
-    return web.json_response(rec.serialize())
+    return json_response(request, rec.serialize())
 
 
 @docs(tags=[SWAGGER_CATEGORY], summary="Delete API Key")
@@ -936,6 +1423,10 @@ async def innkeeper_authentications_api_delete(request: web.BaseRequest):
         )
 
         await rec.delete_record(session)
+        await mgr.invalidation.publish(
+            TOPIC_API_KEY,
+            {"tenant_authentication_api_id": rec.tenant_authentication_api_id},
+        )
 
         try:
             await TenantAuthenticationApiRecord.retrieve_by_auth_api_id(
@@ -945,7 +1436,7 @@ async def innkeeper_authentications_api_delete(request: web.BaseRequest):
             # this is to be expected... do nothing, do not log
             result = True
 
-    return web.json_response({"success": result})
+    return json_response(request, {"success": result})
 
 
 @docs(tags=[SWAGGER_CATEGORY], summary="Fetch the server configuration")
@@ -957,30 +1448,118 @@ async def innkeeper_config_handler(request: web.BaseRequest):
     # use base/root profile for server config, use Tenant Manager profile
     # this is to not get the Innkeeper tenant's config, but the server cfg
     mgr = context.inject(TenantManager)
-    profile = mgr.profile
 
-    config = {
-        key: (
-           profile.context.settings[key]
+    return prepared_response(request, mgr.server_config.innkeeper)
+
+
+@docs(tags=[SWAGGER_CATEGORY], summary="Fetch the crypto pool statistics")
+@response_schema(CryptoStatsSchema(), 200, description="")
+@innkeeper_only
+@error_handler
+async def innkeeper_crypto_stats_handler(request: web.BaseRequest):
+    context: AdminRequestContext = request["context"]
+    mgr = context.inject(TenantManager)
+
+    return json_response(request, mgr.crypto.stats())
+
+
+@docs(tags=[SWAGGER_CATEGORY], summary="Fetch the wallet pool statistics")
+@response_schema(WalletPoolStatsSchema(), 200, description="")
+@innkeeper_only
+@error_handler
+async def innkeeper_wallet_pool_stats_handler(request: web.BaseRequest):
+    context: AdminRequestContext = request["context"]
+    mgr = context.inject(TenantManager)
+
+    return json_response(request, mgr.wallet_pool.stats())
+
+
+@docs(
+    tags=[SWAGGER_CATEGORY],
+    summary="Purge deleted tenants",
+    description="Start hard deleting tenants (with their wallet, API keys and "
+    "reservation) that were deleted longer than the retention ago.",
+)
+@response_schema(TenantPurgeProgressSchema(), 200, description="")
+@use_kwargs(TenantPurgeQuerySchema(), location="query")
+@innkeeper_only
+@error_handler
+async def innkeeper_tenants_purge(request: web.BaseRequest):
+    context: AdminRequestContext = request["context"]
+    mgr = context.inject(TenantManager)
+
+    retention_days = request.query.get("retention_days")
+    if retention_days is None and not mgr.tenant_purge.enabled:
+        raise web.HTTPBadRequest(
+            reason="retention_days is required, tenant_purge.retention_days is 0."
         )
-        for key in profile.context.settings
-        if key
-        not in [
-            "admin.admin_api_key",
-            "multitenant.jwt_secret",
-            "wallet.key",
-            "wallet.rekey",
-            "wallet.seed",
-            "wallet.storage_creds",
-        ]
+    if retention_days is not None:
+        retention_days = int(retention_days)
+    if not await mgr.tenant_purge.trigger(retention_days):
+        raise web.HTTPConflict(reason="A tenant purge is already running.")
+
+    return json_response(request, mgr.tenant_purge.progress())
+
+
+@docs(tags=[SWAGGER_CATEGORY], summary="Fetch the progress of the tenant purge")
+@response_schema(TenantPurgeProgressSchema(), 200, description="")
+@innkeeper_only
+@error_handler
+async def innkeeper_tenants_purge_progress(request: web.BaseRequest):
+    context: AdminRequestContext = request["context"]
+    mgr = context.inject(TenantManager)
+
+    return json_response(request, mgr.tenant_purge.progress())
+
+
+@docs(
+    tags=[SWAGGER_CATEGORY],
+    summary="Fetch the number of reservations and tenants by state",
+)
+@response_schema(InnkeeperStatsRecordSchema(), 200, description="")
+@innkeeper_only
+@error_handler
+async def innkeeper_stats_handler(request: web.BaseRequest):
+    context: AdminRequestContext = request["context"]
+
+    # records are under base/root profile, use Tenant Manager profile
+    mgr = context.inject(TenantManager)
+    profile = mgr.profile
+
+    async with profile.session() as session:
+        stats = await InnkeeperStatsRecord.retrieve(session)
+    if not stats:
+        stats = await InnkeeperStatsRecord.rebuild(profile)
+
+    # report the known states even when there are no records in them
+    response = stats.serialize()
+    response["reservations"] = {
+        **{state: 0 for state in RESERVATION_STATES},
+        **stats.reservations,
     }
-    try:
-      del config["plugin_config"]["traction_innkeeper"]["innkeeper_wallet"]["wallet_key"]
-    except KeyError as e:
-      LOGGER.warn(f"The key to be removed: '{e.args[0]}' is missing from the dictionary.")
-    config["version"] = __version__
+    response["tenants"] = {
+        **{state: 0 for state in TENANT_STATES},
+        **stats.tenants,
+    }
+    return json_response(request, response)
+
+
+@docs(
+    tags=[SWAGGER_CATEGORY],
+    summary="Recount the reservations and tenants by state",
+)
+@response_schema(InnkeeperStatsRecordSchema(), 200, description="")
+@innkeeper_only
+@error_handler
+async def innkeeper_stats_rebuild(request: web.BaseRequest):
+    context: AdminRequestContext = request["context"]
+
+    # records are under base/root profile, use Tenant Manager profile
+    mgr = context.inject(TenantManager)
+    profile = mgr.profile
 
-    return web.json_response({"config": config})
+    stats = await InnkeeperStatsRecord.rebuild(profile)
+    return json_response(request, stats.serialize())
 
 
 async def register(app: web.Application):
@@ -1006,6 +1585,7 @@ async def register(app: web.Application):
     app.add_routes(
         [
             web.post("/innkeeper/reservations", innkeeper_tenant_reservation),
+            web.post("/innkeeper/tenants/bulk", innkeeper_tenants_bulk),
             web.get(
                 "/innkeeper/reservations/",
                 innkeeper_reservations_list,
@@ -1054,11 +1634,46 @@ async def register(app: web.Application):
                 "/innkeeper/authentications/api/{tenant_authentication_api_id}",
                 innkeeper_authentications_api_delete,
             ),
+            web.get(
+                "/innkeeper/export/tenants",
+                innkeeper_tenants_export,
+                allow_head=False,
+            ),
+            web.get(
+                "/innkeeper/export/reservations",
+                innkeeper_reservations_export,
+                allow_head=False,
+            ),
+            web.get(
+                "/innkeeper/export/authentications/api",
+                innkeeper_authentications_api_export,
+                allow_head=False,
+            ),
+            web.get("/innkeeper/search", innkeeper_search, allow_head=False),
+            web.post("/innkeeper/search/reindex", innkeeper_search_reindex),
+            web.get("/innkeeper/stats", innkeeper_stats_handler, allow_head=False),
+            web.post("/innkeeper/purge/tenants", innkeeper_tenants_purge),
+            web.get(
+                "/innkeeper/purge/tenants",
+                innkeeper_tenants_purge_progress,
+                allow_head=False,
+            ),
+            web.post("/innkeeper/stats/rebuild", innkeeper_stats_rebuild),
             web.get(
                 "/innkeeper/server/status/config",
                 innkeeper_config_handler,
                 allow_head=False,
             ),
+            web.get(
+                "/innkeeper/server/status/crypto",
+                innkeeper_crypto_stats_handler,
+                allow_head=False,
+            ),
+            web.get(
+                "/innkeeper/server/status/wallet-pool",
+                innkeeper_wallet_pool_stats_handler,
+                allow_head=False,
+            ),
         ]
     )
     LOGGER.info("< registering routes")
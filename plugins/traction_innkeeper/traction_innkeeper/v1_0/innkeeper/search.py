@@ -0,0 +1,99 @@
+import logging
+from typing import List, Optional, Type
+
+from aries_cloudagent.core.profile import Profile
+from aries_cloudagent.messaging.models.base_record import BaseRecord
+from aries_cloudagent.storage.base import BaseStorage
+from aries_cloudagent.storage.error import StorageNotFoundError
+
+from .pagination import scan_records
+
+LOGGER = logging.getLogger(__name__)
+
+# name prefixes up to this length are indexed (one tag per length)
+SEARCH_PREFIX_MAX = 12
+
+SEARCH_NAME_TAG = "search_name_{}"
+SEARCH_EMAIL_TAG = "search_email"
+
+
+def normalize_search_text(value: Optional[str]) -> str:
+    """Case fold and collapse whitespace, for indexing and for queries."""
+    return " ".join((value or "").casefold().split())
+
+
+def search_tags(name: Optional[str], email: Optional[str]) -> dict:
+    """Tags indexing a record by name prefix and by email.
+
+    Tag queries only match exact values, so every prefix of the normalized
+    name (up to SEARCH_PREFIX_MAX characters) gets its own tag.
+    """
+    tags = {}
+    name = normalize_search_text(name)
+    for length in range(1, min(len(name), SEARCH_PREFIX_MAX) + 1):
+        tags[SEARCH_NAME_TAG.format(length)] = name[:length]
+    email = normalize_search_text(email)
+    if email:
+        tags[SEARCH_EMAIL_TAG] = email
+    return tags
+
+
+async def search_records(
+    profile: Profile,
+    record_cls: Type[BaseRecord],
+    *,
+    name: str = None,
+    email: str = None,
+    state: str = None,
+    limit: int = 50,
+) -> List[BaseRecord]:
+    """Find records by name prefix, email and/or state using the search tags."""
+    tag_filter = {}
+    name = normalize_search_text(name)
+    if name:
+        length = min(len(name), SEARCH_PREFIX_MAX)
+        tag_filter[SEARCH_NAME_TAG.format(length)] = name[:length]
+    email = normalize_search_text(email)
+    if email:
+        tag_filter[SEARCH_EMAIL_TAG] = email
+    if state:
+        tag_filter["state"] = state
+
+    results = []
+    async for record in scan_records(profile, record_cls, tag_filter):
+        # longer names than we index are checked here
+        if len(name) > SEARCH_PREFIX_MAX and not normalize_search_text(
+            record.tenant_name
+        ).startswith(name):
+            continue
+        results.append(record)
+        if len(results) >= limit:
+            break
+    return results
+
+
+async def reindex_records(profile: Profile, record_cls: Type[BaseRecord]) -> int:
+    """Rewrite the tags of every record, to add search tags to older records.
+
+    Each record is re-read under lock, so a concurrent update is not overwritten
+    with the scanned (stale) value. Values (and updated_at) are left as they are
+    and no record events are sent. Records deleted meanwhile are skipped.
+    """
+    count = 0
+    async for scanned in scan_records(profile, record_cls):
+        async with profile.transaction() as txn:
+            try:
+                record = await record_cls.retrieve_by_id(
+                    txn, scanned._id, for_update=True
+                )
+            except StorageNotFoundError:
+                continue
+            storage_record = record.storage_record
+            storage = txn.inject(BaseStorage)
+            await storage.update_record(
+                storage_record, storage_record.value, storage_record.tags
+            )
+            await txn.commit()
+        count += 1
+    LOGGER.info(f"reindexed {count} {record_cls.RECORD_TYPE} record(s)")
+    return count
@@ -0,0 +1,125 @@
+import logging
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Type
+
+from aries_cloudagent.messaging.models.base import (
+    BaseModel,
+    BaseModelError,
+    resolve_meta_property,
+)
+from marshmallow import EXCLUDE, ValidationError, fields, missing
+
+LOGGER = logging.getLogger(__name__)
+
+# the only dump hook of BaseModelSchema, applied by RecordSerializer itself
+_BASE_DUMP_HOOKS = {"remove_skipped_values"}
+
+# values of these types are returned unchanged by these field types
+_PASSTHROUGH = {
+    fields.String._serialize: (str,),
+    fields.Boolean._serialize: (bool,),
+    fields.Raw._serialize: (object,),
+}
+
+
+class RecordSerializer:
+    """Serializer for one record class, equivalent to record.serialize().
+
+    serialize() builds a marshmallow schema and dumps the record field by field
+    through the schema machinery. This precomputes, per schema field, the key,
+    the attribute and how to convert its value (nothing at all for values
+    that the field would return unchanged, such as strings of a Str field).
+    Schemas with dump hooks of their own fall back to record.serialize().
+    """
+
+    def __init__(self, model_cls: Type[BaseModel]):
+        schema_cls = model_cls._get_schema_class()
+        self._model_cls = model_cls
+        self._schema = schema_cls(
+            unknown=resolve_meta_property(schema_cls, "unknown", EXCLUDE)
+        )
+        self._skip_values = resolve_meta_property(self._schema, "skip_values", [])
+        self._fast = self._compilable(self._schema)
+        self._fields: List[Tuple[str, str, Optional[str], Callable, tuple]] = (
+            [
+                self._compile(name, field)
+                for name, field in self._schema.dump_fields.items()
+            ]
+            if self._fast
+            else []
+        )
+
+    @staticmethod
+    def _compilable(schema) -> bool:
+        for (tag, _), names in schema._hooks.items():
+            if tag in ("pre_dump", "post_dump") and set(names) - _BASE_DUMP_HOOKS:
+                return False
+        return True
+
+    def _compile(self, name: str, field: fields.Field):
+        key = field.data_key if field.data_key is not None else name
+        attribute = field.attribute or name
+        if (
+            "." in attribute
+            or not field._CHECK_ATTRIBUTE
+            or field.dump_default is not missing
+        ):
+            # let the field do everything
+            def _field_serialize(record, _field=field, _name=name):
+                return _field.serialize(_name, record, self._schema.get_attribute)
+
+            return key, name, None, _field_serialize, ()
+
+        passthrough = _PASSTHROUGH.get(type(field)._serialize, ())
+        if type(field)._serialize is fields.Integer._serialize and not field.as_string:
+            passthrough = (int,)
+        return key, name, attribute, field._serialize, passthrough
+
+    def serialize(self, record: BaseModel) -> dict:
+        """Return the same dict as record.serialize()."""
+        if not self._fast:
+            return record.serialize()
+        skip_values = self._skip_values
+        result = {}
+        try:
+            for key, name, attribute, _serialize, passthrough in self._fields:
+                if attribute is None:
+                    value = _serialize(record)
+                    if value is missing:
+                        continue
+                else:
+                    value = getattr(record, attribute, missing)
+                    if value is missing:
+                        continue
+                    if value is not None and not (
+                        type(value) in passthrough or object in passthrough
+                    ):
+                        value = _serialize(value, name, record)
+                if value in skip_values:
+                    continue
+                result[key] = value
+        except (AttributeError, ValidationError) as err:
+            LOGGER.exception(f"{self._model_cls.__name__} serialization error:")
+            raise BaseModelError(
+                f"{self._model_cls.__name__} schema validation failed"
+            ) from err
+        return result
+
+
+_serializers: Dict[Type[BaseModel], RecordSerializer] = {}
+
+
+def get_serializer(model_cls: Type[BaseModel]) -> RecordSerializer:
+    serializer = _serializers.get(model_cls)
+    if not serializer:
+        serializer = _serializers[model_cls] = RecordSerializer(model_cls)
+    return serializer
+
+
+def serialize_record(record: BaseModel) -> dict:
+    """Serialize a record, same output as record.serialize()."""
+    return get_serializer(type(record)).serialize(record)
+
+
+def serialize_records(records: Iterable[BaseModel]) -> List[dict]:
+    """Serialize records for list responses, same output as record.serialize()."""
+    return [serialize_record(record) for record in records]
@@ -0,0 +1,127 @@
+import logging
+from typing import Any, Mapping, Optional, Sequence
+
+from aries_cloudagent.core.profile import Profile
+from aries_cloudagent.version import __version__
+
+from .responses import PreparedJson
+
+LOGGER = logging.getLogger(__name__)
+
+# settings never shown to the innkeeper
+INNKEEPER_EXCLUDED = [
+    "admin.admin_api_key",
+    "multitenant.jwt_secret",
+    "wallet.key",
+    "wallet.rekey",
+    "wallet.seed",
+    "wallet.storage_creds",
+]
+
+# settings never shown to tenants
+TENANT_EXCLUDED = [
+    "default_label",
+    "admin.admin_api_key",
+    "admin.admin_insecure_mode",
+    "admin.enabled",
+    "admin.host",
+    "admin.port",
+    "admin.webhook_urls",
+    "admin.admin_client_max_request_size",
+    "multitenant.jwt_secret",
+    "wallet.key",
+    "wallet.name",
+    "multitenant.wallet_name",
+    "wallet.storage_type",
+    "wallet.storage_config",
+    "wallet.rekey",
+    "wallet.seed",
+    "wallet.storage_creds",
+]
+
+
+def _without(config: Mapping[str, Any], path: Sequence[str]) -> dict:
+    """Copy of config without the (nested) key at path, settings are untouched."""
+    head, *rest = path
+    if head not in config:
+        raise KeyError(head)
+    result = dict(config)
+    if rest:
+        result[head] = _without(config[head], rest)
+    else:
+        del result[head]
+    return result
+
+
+def _redact(config: dict, path: Sequence[str]) -> dict:
+    try:
+        return _without(config, path)
+    except KeyError as e:
+        LOGGER.warning(
+            f"The key to be removed: '{e.args[0]}' is missing from the dictionary."
+        )
+        return config
+
+
+def innkeeper_config(settings: Mapping[str, Any]) -> dict:
+    """The server configuration as shown to the innkeeper."""
+    config = {key: settings[key] for key in settings if key not in INNKEEPER_EXCLUDED}
+    config = _redact(
+        config,
+        ("plugin_config", "traction_innkeeper", "innkeeper_wallet", "wallet_key"),
+    )
+    config["version"] = __version__
+    return config
+
+
+def tenant_config(settings: Mapping[str, Any]) -> dict:
+    """The server configuration as shown to tenants."""
+    config = {key: settings[key] for key in settings if key not in TENANT_EXCLUDED}
+    config = _redact(
+        config, ("plugin_config", "traction_innkeeper", "innkeeper_wallet")
+    )
+    if "ledger.ledger_config_list" in config:
+        config["ledger.ledger_config_list"] = [
+            {k: v for k, v in d.items() if k != "genesis_transactions"}
+            for d in config["ledger.ledger_config_list"]
+        ]
+    config["version"] = __version__
+    return config
+
+
+class ServerConfigSnapshot:
+    """Redacted server configurations, encoded once and served as is.
+
+    The innkeeper and tenant views are built from the root profile settings at
+    startup and kept as prepared bodies. The settings are not watched: code
+    changing root settings at runtime calls rebuild().
+    """
+
+    def __init__(self, profile: Profile):
+        """
+        Initialize a ServerConfigSnapshot.
+
+        Args:
+            profile: The root profile, holding the server settings
+        """
+        self._profile = profile
+        self._innkeeper: Optional[PreparedJson] = None
+        self._tenant: Optional[PreparedJson] = None
+
+    def rebuild(self):
+        """Build the snapshots from the current settings."""
+        settings = self._profile.settings
+        self._innkeeper = PreparedJson({"config": innkeeper_config(settings)})
+        self._tenant = PreparedJson({"config": tenant_config(settings)})
+
+    @property
+    def innkeeper(self) -> PreparedJson:
+        if self._innkeeper is None:
+            self.rebuild()
+        return self._innkeeper
+
+    @property
+    def tenant(self) -> PreparedJson:
+        if self._tenant is None:
+            self.rebuild()
+        return self._tenant
@@ -0,0 +1,49 @@
+import asyncio
+import logging
+from typing import Optional
+
+from aries_cloudagent.core.profile import Profile
+
+from .config import StatsConfig
+from .models import InnkeeperStatsRecord
+
+LOGGER = logging.getLogger(__name__)
+
+
+class StatsFolder:
+    """Background task folding pending deltas into the innkeeper stats record.
+
+    Reservation and tenant changes only write delta records; they are applied
+    to the stats record every fold_interval_seconds, so reading the stats is a
+    single retrieve (that lags the changes by at most one interval).
+    """
+
+    def __init__(self, profile: Profile, config: StatsConfig):
+        """
+        Initialize a StatsFolder.
+
+        Args:
+            profile: The root profile, the stats record lives under it
+            config: The stats configuration
+        """
+        self._profile = profile
+        self._config = config
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        if self._task and not self._task.done():
+            self._task.cancel()
+        self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self._config.fold_interval_seconds)
+            try:
+                await InnkeeperStatsRecord.fold(self._profile)
+            except asyncio.CancelledError:
+                raise
+            except Exception as err:
+                LOGGER.error(f"innkeeper stats fold failed: {err}")
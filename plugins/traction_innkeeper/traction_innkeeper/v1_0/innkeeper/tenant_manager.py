@@ -1,21 +1,47 @@
-import bcrypt
 from datetime import datetime, timedelta
 import logging
+import time
 from typing import List, Optional
 
+import jwt
+
 from aries_cloudagent.core.error import BaseError
-from aries_cloudagent.core.profile import Profile
+from aries_cloudagent.core.profile import Profile, ProfileSession
 from aries_cloudagent.messaging.models.base import BaseModelError
 from aries_cloudagent.multitenant.base import BaseMultitenantManager
 
 # from aries_cloudagent.ledger.multiple_ledger.base_manager import (
 #     BaseMultipleLedgerManager,
 # )
-from aries_cloudagent.storage.error import StorageError, StorageNotFoundError
+from aries_cloudagent.storage.error import (
+    StorageDuplicateError,
+    StorageError,
+    StorageNotFoundError,
+)
 from aries_cloudagent.wallet.models.wallet_record import WalletRecord
 
+from .cache import ApiKeyCache, TenantRecordCache, TTLCache
 from .config import TractionInnkeeperConfig, InnkeeperWalletConfig, ReservationConfig
-from .models import TenantAuthenticationApiRecord, TenantRecord, ReservationRecord
+from .crypto import CryptoService
+from .invalidation import (
+    TOPIC_API_KEY,
+    TOPIC_RESET,
+    TOPIC_TENANT,
+    InvalidationBus,
+    create_invalidation_bus,
+)
+from .models import (
+    ReservationException,
+    ReservationRecord,
+    TenantAuthenticationApiRecord,
+    TenantRecord,
+    WalletNameIndexRecord,
+)
+from .reservation_sweeper import ReservationSweeper
+from .stats_folder import StatsFolder
+from .server_config import ServerConfigSnapshot
+from .tenant_purge import TenantPurge
+from .wallet_pool import WalletPool
 
 
 class TenantManager:
@@ -31,6 +57,25 @@ class TenantManager:
         self._profile = profile
         self._logger = logging.getLogger(__name__)
         self._config = config
+        cache_config = config.api_key_cache
+        self._api_key_cache = ApiKeyCache(
+            cache_config.max_size if cache_config.enabled else 0,
+            cache_config.ttl_seconds,
+        )
+        self._crypto = CryptoService(config.crypto)
+        # issued tokens by wallet_id, only used when token reuse is enabled
+        self._token_cache = TTLCache(config.token.max_size, 0)
+        self._wallet_pool = WalletPool(profile, config.wallet_pool)
+        self._reservation_sweeper = ReservationSweeper(profile, config.reservation)
+        self._stats_folder = StatsFolder(profile, config.stats)
+        self._invalidation = create_invalidation_bus(profile, config.invalidation)
+        self._invalidation.subscribe(TOPIC_API_KEY, self._on_api_key_invalidation)
+        self._invalidation.subscribe(TOPIC_TENANT, self._on_tenant_invalidation)
+        self._invalidation.subscribe(TOPIC_RESET, self._on_reset_invalidation)
+        self._tenant_purge = TenantPurge(
+            profile, config.tenant_purge, self._invalidation
+        )
+        self._server_config = ServerConfigSnapshot(profile)
 
     @property
     def profile(self) -> Profile:
@@ -43,6 +88,111 @@ class TenantManager:
         """
         return self._profile
 
+    @property
+    def api_key_cache(self) -> ApiKeyCache:
+        """
+        Accessor for the cache of verified API keys.
+
+        Returns:
+            The API key verification cache for this tenant manager
+
+        """
+        return self._api_key_cache
+
+    @property
+    def crypto(self) -> CryptoService:
+        """
+        Accessor for the crypto service, use it for all bcrypt work.
+
+        Returns:
+            The crypto service for this tenant manager
+
+        """
+        return self._crypto
+
+    @property
+    def wallet_pool(self) -> WalletPool:
+        """
+        Accessor for the pool of pre-created tenant wallets.
+
+        Returns:
+            The wallet pool for this tenant manager
+
+        """
+        return self._wallet_pool
+
+    @property
+    def reservation_sweeper(self) -> ReservationSweeper:
+        """
+        Accessor for the background task expiring unused reservations.
+
+        Returns:
+            The reservation sweeper for this tenant manager
+
+        """
+        return self._reservation_sweeper
+
+    @property
+    def stats_folder(self) -> StatsFolder:
+        """
+        Accessor for the background task applying changes to the innkeeper stats.
+
+        Returns:
+            The stats folder for this tenant manager
+
+        """
+        return self._stats_folder
+
+    @property
+    def tenant_purge(self) -> TenantPurge:
+        """
+        Accessor for the job hard deleting long soft-deleted tenants.
+
+        Returns:
+            The tenant purge for this tenant manager
+
+        """
+        return self._tenant_purge
+
+    @property
+    def server_config(self) -> ServerConfigSnapshot:
+        """
+        Accessor for the redacted server configuration snapshots.
+
+        Returns:
+            The server configuration snapshot for this tenant manager
+
+        """
+        return self._server_config
+
+    @property
+    def invalidation(self) -> InvalidationBus:
+        """
+        Accessor for the cache invalidation bus, publish writes to cached records.
+
+        Returns:
+            The invalidation bus for this tenant manager
+
+        """
+        return self._invalidation
+
+    async def _on_api_key_invalidation(self, payload: dict):
+        self._api_key_cache.invalidate(payload.get("tenant_authentication_api_id"))
+
+    async def _on_tenant_invalidation(self, payload: dict):
+        cache = self._profile.inject_or(TenantRecordCache)
+        if cache:
+            cache.invalidate(
+                tenant_id=payload.get("tenant_id"), wallet_id=payload.get("wallet_id")
+            )
+
+    async def _on_reset_invalidation(self, payload: dict):
+        self._api_key_cache.clear()
+        self._token_cache.clear()
+        cache = self._profile.inject_or(TenantRecordCache)
+        if cache:
+            cache.clear()
+
     async def create_wallet(
         self,
         wallet_name: str,
@@ -50,9 +200,14 @@ class TenantManager:
         tenant_email: Optional[str],
         extra_settings: dict = {},
         tenant_id: str = None,
+        use_pool: bool = False,
+        reservation: ReservationRecord = None,
     ):
         # this is from multitenant / admin / routes.py -> wallet_create
         # (mostly) duplicate code.
+        # with use_pool, a pooled wallet (with its own key) may be claimed instead,
+        # so callers must use the returned wallet_record.wallet_key.
+        # a reservation is checked in along with the new tenant record.
 
         try:
             if "tenant.endorser_config" in extra_settings:
@@ -85,28 +240,37 @@ class TenantManager:
 
             label = wallet_name  # use the name they provided as the label
 
-            unique_wallet_name = await self.get_unique_wallet_name(wallet_name)
-            if unique_wallet_name != wallet_name:
-                # but... we have to change the actual wallet name
-                wallet_name = unique_wallet_name
-
-            settings = {
-                "wallet.type": self._profile.context.settings["wallet.type"],
-                "wallet.name": wallet_name,
-                "wallet.key": wallet_key,
-                "wallet.webhook_urls": wallet_webhook_urls,
-                "wallet.dispatch_type": wallet_dispatch_type,
-            }
-            settings.update(extra_settings)
-            # set the default label (our provided wallet name)
-            settings["default_label"] = label
-
             multitenant_mgr = self._profile.inject(BaseMultitenantManager)
 
-            wallet_record = await multitenant_mgr.create_wallet(
-                settings, key_management_mode
-            )
-            token = await self.get_token(wallet_record, wallet_key)
+            # pooled wallets can only be relabelled, not given other settings
+            wallet_record = None
+            if use_pool and not extra_settings:
+                wallet_record = await self._wallet_pool.claim()
+            if wallet_record:
+                wallet_record = await multitenant_mgr.update_wallet(
+                    wallet_record.wallet_id, {"default_label": label}
+                )
+                wallet_key = wallet_record.wallet_key
+            else:
+                unique_wallet_name = await self.get_unique_wallet_name(wallet_name)
+                if unique_wallet_name != wallet_name:
+                    # but... we have to change the actual wallet name
+                    wallet_name = unique_wallet_name
+
+                settings = {
+                    "wallet.type": self._profile.context.settings["wallet.type"],
+                    "wallet.name": wallet_name,
+                    "wallet.key": wallet_key,
+                    "wallet.webhook_urls": wallet_webhook_urls,
+                    "wallet.dispatch_type": wallet_dispatch_type,
+                }
+                settings.update(extra_settings)
+                # set the default label (our provided wallet name)
+                settings["default_label"] = label
+
+                wallet_record = await multitenant_mgr.create_wallet(
+                    settings, key_management_mode
+                )
         except BaseError as err:
             self._logger.error(f"Error creating wallet ('{wallet_name}').", err)
             raise err
@@ -115,20 +279,31 @@ class TenantManager:
         if not auto_issuer or tenant_id == innkeeper_tenant_id:
             connect_to_endorsers = []
             created_public_did = []
-        # ok, all is good, then create a tenant record
-        tenant = await self.create_tenant(
-            wallet_id=wallet_record.wallet_id,
-            email=tenant_email,
-            tenant_id=tenant_id,
-            connected_to_endorsers=connect_to_endorsers,
-            created_public_did=created_public_did,
-            auto_issuer=auto_issuer,
-            enable_ledger_switch=enable_ledger_switch,
-        )
+        # ok, all is good, then create a tenant record (and check in the reservation)
+        try:
+            tenant = await self.create_tenant(
+                wallet_id=wallet_record.wallet_id,
+                email=tenant_email,
+                tenant_id=tenant_id,
+                connected_to_endorsers=connect_to_endorsers,
+                created_public_did=created_public_did,
+                auto_issuer=auto_issuer,
+                enable_ledger_switch=enable_ledger_switch,
+                wallet_record=wallet_record,
+                reservation=reservation,
+            )
+        except ReservationException:
+            # reservation was checked in concurrently, this wallet is not needed
+            await multitenant_mgr.remove_wallet(wallet_record.wallet_id)
+            raise
+        token = await self.get_token(wallet_record, wallet_key)
 
         return tenant, wallet_record, token
 
     async def get_token(self, wallet_record: WalletRecord, wallet_key):
+        token = self.get_reusable_token(wallet_record)
+        if token:
+            return token
         try:
             multitenant_mgr = self._profile.inject(BaseMultitenantManager)
             token = await multitenant_mgr.create_auth_token(wallet_record, wallet_key)
@@ -137,8 +312,37 @@ class TenantManager:
                 f"Error getting token for wallet ('{wallet_record.wallet_name}').", err
             )
             raise err
+        self.remember_token(wallet_record, token)
         return token
 
+    def get_reusable_token(self, wallet_record: WalletRecord) -> Optional[str]:
+        """Return a previously issued, still valid token for the wallet, if any."""
+        if not self._config.token.reuse or wallet_record.requires_external_key:
+            return None
+        cached = self._token_cache.get(wallet_record.wallet_id)
+        if not cached:
+            return None
+        token, iat = cached
+        # a newer token was issued (elsewhere), ours may no longer be accepted
+        if wallet_record.jwt_iat and wallet_record.jwt_iat != iat:
+            self._token_cache.pop(wallet_record.wallet_id)
+            return None
+        self._logger.debug(f"reusing token for wallet '{wallet_record.wallet_id}'")
+        return token
+
+    def remember_token(self, wallet_record: WalletRecord, token: str):
+        """Keep a token for reuse until it is within the refresh window of expiry."""
+        token_config = self._config.token
+        # never cache tokens that carry a wallet key
+        if not token_config.reuse or wallet_record.requires_external_key:
+            return
+        claims = jwt.decode(token, options={"verify_signature": False})
+        iat = claims.get("iat")
+        exp = claims.get("exp") or (iat + token_config.reuse_max_age_seconds)
+        ttl = exp - token_config.reuse_refresh_window_seconds - time.time()
+        if ttl > 0:
+            self._token_cache.set(wallet_record.wallet_id, (token, iat), ttl)
+
     async def create_tenant(
         self,
         wallet_id: str,
@@ -148,10 +352,14 @@ class TenantManager:
         auto_issuer: bool = False,
         tenant_id: str = None,
         enable_ledger_switch: bool = False,
+        wallet_record: WalletRecord = None,
+        reservation: ReservationRecord = None,
     ):
         try:
-            async with self._profile.session() as session:
-                wallet_record = await WalletRecord.retrieve_by_id(session, wallet_id)
+            # tenant record and reservation check-in are committed together
+            async with self._profile.transaction() as txn:
+                if not wallet_record:
+                    wallet_record = await WalletRecord.retrieve_by_id(txn, wallet_id)
                 tenant_name = (
                     wallet_record.settings.get("default_label")
                     if wallet_record.settings.get("default_label")
@@ -171,15 +379,39 @@ class TenantManager:
                     enable_ledger_switch=enable_ledger_switch,
                     auto_issuer=auto_issuer,
                 )
-                await tenant.save(session, reason="New tenant")
-                await tenant.query(session)
-                self._logger.info(tenant)
+                await tenant.save(txn, reason="New tenant")
+                if reservation:
+                    await self.check_in_reservation(txn, reservation, tenant)
+                await txn.commit()
+            await tenant.notify_changed(self._profile)
+            self._logger.info(tenant)
         except Exception as err:
             self._logger.error(err)
             raise err
 
         return tenant
 
+    async def check_in_reservation(
+        self, txn: ProfileSession, reservation: ReservationRecord, tenant: TenantRecord
+    ):
+        # lock the stored reservation, only one check-in can get past this
+        current = await ReservationRecord.retrieve_by_id(
+            txn, reservation._id, for_update=True
+        )
+        if current.state != ReservationRecord.STATE_APPROVED:
+            raise ReservationException(
+                f"Reservation state is currently '{current.state}' and cannot be set "
+                f"to '{ReservationRecord.STATE_CHECKED_IN}'."
+            )
+        reservation.state = ReservationRecord.STATE_CHECKED_IN
+        reservation.wallet_id = tenant.wallet_id
+        reservation.tenant_id = tenant.tenant_id
+        # do not need reservation token data
+        reservation.reservation_token_hash = None
+        reservation.reservation_token_salt = None
+        reservation.reservation_token_expiry = None
+        await reservation.save(txn, reason="Reservation checked in")
+
     async def create_innkeeper(self):
         config: InnkeeperWalletConfig = self._config.innkeeper_wallet
         reservation_config: ReservationConfig = self._config.reservation
@@ -234,56 +466,69 @@ class TenantManager:
         if config.print_token:
             print(f"Bearer {token}\n")
 
-    def check_reservation_password(
+    async def check_reservation_password(
         self, reservation_pwd: str, reservation: ReservationRecord
     ):
         if reservation_pwd is None or reservation is None:
             return None
 
-        # make a hash from passed in value with saved salt...
-        reservation_token = bcrypt.hashpw(
-            reservation_pwd.encode("utf-8"),
-            reservation.reservation_token_salt.encode("utf-8"),
-        )
-        # check the passed in value/hash against the calculated hash.
-        checkpw = bcrypt.checkpw(reservation_pwd.encode("utf-8"), reservation_token)
-        self._logger.debug(
-            f"bcrypt.checkpw(reservation_pwd.encode('utf-8'), reservation_token) = {checkpw}"
-        )
-
-        # check the passed in value against the saved hash
-        checkpw2 = bcrypt.checkpw(
-            reservation_pwd.encode("utf-8"),
-            reservation.reservation_token_hash.encode("utf-8"),
+        # bcrypt is cpu bound, run the checks in the crypto pool...
+        reservation_token = await self._crypto.check_secret(
+            reservation_pwd,
+            reservation.reservation_token_salt,
+            reservation.reservation_token_hash,
         )
         self._logger.debug(
-            f"bcrypt.checkpw(reservation_pwd.encode('utf-8'), reservation.reservation_token_hash.encode('utf-8')) = {checkpw2}"
+            f"check_reservation_password({reservation.reservation_id}) = "
+            f"{reservation_token is not None}"
         )
-
-        if checkpw and checkpw2:
-            # if password is correct, then return the string equivalent...
-            return reservation_token.decode("utf-8")
-        else:
-            # else return None
-            return None
+        # if password is correct, then return the string equivalent, else None
+        return reservation_token
 
     async def get_unique_wallet_name(self, wallet_name: str):
         self._logger.info(f"> get_unique_wallet_name('{wallet_name}')")
-        unique_wallet_name = wallet_name
-        async with self._profile.session() as session:
-            w = await self.check_tables_for_wallet_name(session, unique_wallet_name)
-            idx = 1
-            while w:
-                self._logger.info(f"'{unique_wallet_name}': wallet_exists = {w}")
-                unique_wallet_name = f"{unique_wallet_name}-{idx}"
-                w = await self.check_tables_for_wallet_name(session, unique_wallet_name)
-                idx += 1
+        try:
+            unique_wallet_name = await self.allocate_wallet_name(wallet_name)
+        except StorageDuplicateError:
+            # a concurrent request created the index record first, go again
+            unique_wallet_name = await self.allocate_wallet_name(wallet_name)
         # return a unique wallet/tenant name, either the input or calculated...
         self._logger.info(
             f"< get_unique_wallet_name('{wallet_name}') = '{unique_wallet_name}'"
         )
         return unique_wallet_name
 
+    async def allocate_wallet_name(self, wallet_name: str):
+        """Hand out the next unique name for wallet_name from the name index.
+
+        The first wallet gets the name as is, the following get name-1, name-2...
+        The index record is locked for the duration of the transaction so
+        concurrent allocations of the same name get different suffixes. A
+        candidate is only probed against existing wallets to step over names
+        allocated before the index existed (or taken as a base name themselves).
+        """
+        async with self._profile.transaction() as txn:
+            index = await WalletNameIndexRecord.retrieve_by_wallet_name(
+                txn, wallet_name, for_update=True
+            )
+            if not index:
+                index = WalletNameIndexRecord(
+                    wallet_name=wallet_name, allocated=0, new_with_id=True
+                )
+            while True:
+                if index.allocated:
+                    unique_wallet_name = f"{wallet_name}-{index.allocated}"
+                else:
+                    unique_wallet_name = wallet_name
+                index.allocated += 1
+                w = await self.check_tables_for_wallet_name(txn, unique_wallet_name)
+                if not w:
+                    break
+                self._logger.info(f"'{unique_wallet_name}': wallet_exists = {w}")
+            await index.save(txn, reason="Allocate wallet name")
+            await txn.commit()
+        return unique_wallet_name
+
     async def check_tables_for_wallet_name(self, session, wallet_name: str):
         # we can add more tables here if need (ie reservations, tenants...)
         wallet_records = await WalletRecord.query(session, {"wallet_name": wallet_name})
@@ -311,33 +556,21 @@ class TenantManager:
             raise StorageNotFoundError(f"Tenant not found with wallet_id '{wallet_id}'")
         return wallet_record, tenant_record
 
-    def check_api_key(self, api_key: str, apiRecord: TenantAuthenticationApiRecord):
+    async def check_api_key(
+        self, api_key: str, apiRecord: TenantAuthenticationApiRecord
+    ):
         if api_key is None or apiRecord is None:
             return None
 
-        # make a hash from passed in value with saved salt...
-        key_token = bcrypt.hashpw(
-            api_key.encode("utf-8"),
-            apiRecord.api_key_token_salt.encode("utf-8"),
+        # bcrypt is cpu bound, run the checks in the crypto pool...
+        key_token = await self._crypto.check_secret(
+            api_key,
+            apiRecord.api_key_token_salt,
+            apiRecord.api_key_token_hash,
         )
-        # check the passed in value/hash against the calculated hash.
-        checkpw = bcrypt.checkpw(api_key.encode("utf-8"), key_token)
         self._logger.debug(
-            f"bcrypt.checkpw(api_key.encode('utf-8'), key_token) = {checkpw}"
+            f"check_api_key({apiRecord.tenant_authentication_api_id}) = "
+            f"{key_token is not None}"
         )
-
-        # check the passed in value against the saved hash
-        checkpw2 = bcrypt.checkpw(
-            api_key.encode("utf-8"),
-            apiRecord.api_key_token_hash.encode("utf-8"),
-        )
-        self._logger.debug(
-            f"bcrypt.checkpw(api_key.encode('utf-8'), reservation.api_key_token_hash.encode('utf-8')) = {checkpw2}"
-        )
-
-        if checkpw and checkpw2:
-            # if password is correct, then return...
-            return key_token.decode("utf-8")
-        else:
-            # else return None
-            return None
+        # if key is correct, then return the string equivalent, else None
+        return key_token
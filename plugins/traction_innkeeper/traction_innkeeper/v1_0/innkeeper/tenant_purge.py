@@ -0,0 +1,226 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+
+from aries_cloudagent.core.profile import Profile
+from aries_cloudagent.messaging.util import datetime_to_str, str_to_datetime
+from aries_cloudagent.multitenant.base import BaseMultitenantManager
+from aries_cloudagent.storage.error import StorageNotFoundError
+
+from .config import TenantPurgeConfig
+from .invalidation import TOPIC_API_KEY, InvalidationBus
+from .models import ReservationRecord, TenantAuthenticationApiRecord, TenantRecord
+from .pagination import scan_records
+
+LOGGER = logging.getLogger(__name__)
+
+
+class TenantPurge:
+    """Hard delete tenants that were soft deleted more than retention_days ago.
+
+    A tenant is first moved to the purging state, under lock, so it can no
+    longer be restored. Then the API keys (in batches), the reservation and the
+    wallet (through the multitenant manager) are removed, and the tenant record
+    last, so a tenant that fails part way is picked up again by the next purge.
+    Runs every interval_seconds, or when triggered; one purge at a time.
+    """
+
+    def __init__(
+        self, profile: Profile, config: TenantPurgeConfig, invalidation: InvalidationBus
+    ):
+        """
+        Initialize a TenantPurge.
+
+        Args:
+            profile: The root profile, tenants live under it
+            config: The tenant purge configuration
+            invalidation: Bus to publish deleted API keys on
+        """
+        self._profile = profile
+        self._config = config
+        self._invalidation = invalidation
+        self._task: Optional[asyncio.Task] = None
+        self._job: Optional[asyncio.Task] = None
+        self._progress = {"status": "idle"}
+
+    @property
+    def enabled(self) -> bool:
+        return self._config.retention_days > 0
+
+    @property
+    def running(self) -> bool:
+        return bool(self._job and not self._job.done())
+
+    def progress(self) -> dict:
+        """Progress of the running purge, or the outcome of the last one."""
+        return dict(self._progress)
+
+    async def start(self):
+        if not self.enabled or self._config.interval_seconds <= 0:
+            return
+        self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        for task in (self._task, self._job):
+            if task and not task.done():
+                task.cancel()
+        self._task = None
+        self._job = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.trigger()
+                # failures of the job are logged by _job_done
+                await asyncio.wait({self._job})
+            except asyncio.CancelledError:
+                raise
+            except Exception as err:
+                LOGGER.error(f"tenant purge failed: {err}")
+            await asyncio.sleep(self._config.interval_seconds)
+
+    async def trigger(self, retention_days: int = None) -> bool:
+        """Start a purge in the background, False if one is already running."""
+        if self.running:
+            return False
+        if retention_days is None:
+            retention_days = self._config.retention_days
+        self._progress = {
+            "status": "running",
+            "retention_days": retention_days,
+            "started_at": datetime_to_str(datetime.now(tz=timezone.utc)),
+            "candidates": 0,
+            "purged": 0,
+            "failed": 0,
+            "api_keys_deleted": 0,
+            "reservations_deleted": 0,
+            "wallets_removed": 0,
+        }
+        self._job = asyncio.ensure_future(self._purge(retention_days))
+        self._job.add_done_callback(self._job_done)
+        return True
+
+    def _job_done(self, job: asyncio.Task):
+        # triggered purges are not awaited by anyone, their failures end up here
+        if not job.cancelled() and job.exception():
+            LOGGER.error(f"tenant purge failed: {job.exception()!r}")
+
+    async def _purge(self, retention_days: int):
+        progress = self._progress
+        try:
+            cutoff = datetime.now(tz=timezone.utc) - timedelta(days=retention_days)
+            tenant_ids = [
+                record.tenant_id
+                async for record in scan_records(
+                    self._profile, TenantRecord, {"state": TenantRecord.STATE_DELETED}
+                )
+                if _deleted_before(record, cutoff)
+            ]
+            # purges that failed part way are resumed
+            tenant_ids += [
+                record.tenant_id
+                async for record in scan_records(
+                    self._profile, TenantRecord, {"state": TenantRecord.STATE_PURGING}
+                )
+            ]
+            progress["candidates"] = len(tenant_ids)
+
+            batch_size = self._config.batch_size
+            for start in range(0, len(tenant_ids), batch_size):
+                for tenant_id in tenant_ids[start : start + batch_size]:
+                    try:
+                        if await self._purge_tenant(tenant_id, cutoff):
+                            progress["purged"] += 1
+                    except Exception as err:
+                        progress["failed"] += 1
+                        LOGGER.error(f"tenant {tenant_id} not purged: {err}")
+                LOGGER.info(
+                    f"tenant purge: {progress['purged']} purged, "
+                    f"{progress['failed']} failed of {len(tenant_ids)}"
+                )
+            progress["status"] = "finished"
+        except Exception as err:
+            progress["status"] = "failed"
+            progress["error"] = str(err)
+            raise
+        finally:
+            progress["finished_at"] = datetime_to_str(datetime.now(tz=timezone.utc))
+
+    async def _purge_tenant(self, tenant_id: str, cutoff: datetime) -> bool:
+        progress = self._progress
+        async with self._profile.transaction() as txn:
+            # read from storage (not the cache) under lock, it may have been
+            # restored since the scan; once purging it can no longer be restored
+            try:
+                tenant = await TenantRecord.retrieve_by_id(
+                    txn, tenant_id, for_update=True
+                )
+            except StorageNotFoundError:
+                return False
+            if tenant.state == TenantRecord.STATE_DELETED and _deleted_before(
+                tenant, cutoff
+            ):
+                tenant.state = TenantRecord.STATE_PURGING
+                await tenant.save(txn, reason="Purging tenant")
+                await txn.commit()
+                await tenant.notify_changed(self._profile)
+            elif tenant.state != TenantRecord.STATE_PURGING:
+                return False
+
+        # API keys, could be many
+        api_keys = [
+            record
+            async for record in scan_records(
+                self._profile, TenantAuthenticationApiRecord, {"tenant_id": tenant_id}
+            )
+        ]
+        batch_size = self._config.batch_size
+        for start in range(0, len(api_keys), batch_size):
+            batch = api_keys[start : start + batch_size]
+            await self._delete_api_keys(batch)
+            progress["api_keys_deleted"] += len(batch)
+
+        async with self._profile.session() as session:
+            reservations = await ReservationRecord.query(
+                session, {"tenant_id": tenant_id}
+            )
+            for reservation in reservations:
+                await reservation.delete_record(session)
+                progress["reservations_deleted"] += 1
+
+        if tenant.wallet_id:
+            multitenant_mgr = self._profile.inject(BaseMultitenantManager)
+            try:
+                await multitenant_mgr.remove_wallet(tenant.wallet_id)
+                progress["wallets_removed"] += 1
+            except StorageNotFoundError:
+                # already gone
+                pass
+
+        async with self._profile.session() as session:
+            try:
+                await tenant.delete_record(session)
+            except StorageNotFoundError:
+                # purged by another replica meanwhile
+                return False
+        LOGGER.info(f"tenant {tenant_id} purged")
+        return True
+
+    async def _delete_api_keys(self, records: List[TenantAuthenticationApiRecord]):
+        async with self._profile.session() as session:
+            for record in records:
+                try:
+                    await record.delete_record(session)
+                except StorageNotFoundError:
+                    pass
+        for record in records:
+            await self._invalidation.publish(
+                TOPIC_API_KEY,
+                {"tenant_authentication_api_id": record.tenant_authentication_api_id},
+            )
+
+
+def _deleted_before(tenant: TenantRecord, cutoff: datetime) -> bool:
+    deleted_at = tenant.deleted_at or tenant.updated_at
+    return bool(deleted_at) and str_to_datetime(deleted_at) < cutoff
@@ -1,19 +1,30 @@
-import bcrypt
 import logging
+import re
 import uuid
 from datetime import datetime, timedelta
+from typing import List, Optional
 
-from aries_cloudagent.core.profile import Profile
+from aries_cloudagent.core.profile import ProfileSession
 from aries_cloudagent.messaging.models.openapi import OpenAPISchema
+from aries_cloudagent.storage.error import StorageNotFoundError
 from marshmallow import fields
 
-from .models import ReservationRecord, TenantAuthenticationApiRecord
+from .crypto import CryptoService
+from .models import (
+    ReservationException,
+    ReservationRecord,
+    TenantAuthenticationApiRecord,
+)
 
 
 from . import TenantManager
 
 LOGGER = logging.getLogger(__name__)
 
+# self identifying API keys look like tak_<record id>_<secret>
+API_KEY_PREFIX = "tak"
+API_KEY_PATTERN = re.compile(rf"^{API_KEY_PREFIX}_([0-9a-f]{{32}})_([0-9a-f]{{32}})$")
+
 
 class EndorserLedgerConfigSchema(OpenAPISchema):
     """Schema for EndorserLedgerConfig."""
@@ -58,14 +69,12 @@ class TenantConfigSchema(OpenAPISchema):
     )
 
 
-def generate_reservation_token_data(expiry_minutes: int):
+async def generate_reservation_token_data(expiry_minutes: int, crypto: CryptoService):
     _pwd = str(uuid.uuid4().hex)
     LOGGER.info(f"_pwd = {_pwd}")
 
-    _salt = bcrypt.gensalt()
+    _salt, _hash = await crypto.hash_secret(_pwd)
     LOGGER.info(f"_salt = {_salt}")
-
-    _hash = bcrypt.hashpw(_pwd.encode("utf-8"), _salt)
     LOGGER.info(f"_hash = {_hash}")
 
     minutes = expiry_minutes
@@ -78,15 +87,16 @@ def generate_reservation_token_data(expiry_minutes: int):
 async def approve_reservation(
     reservation_id: str, state_notes: str, manager: TenantManager
 ):
+    # generate the token before opening a session, no need to hold it during bcrypt
+    _pwd, _salt, _hash, _expiry = await generate_reservation_token_data(
+        manager._config.reservation.expiry_minutes, manager.crypto
+    )
     async with manager.profile.session() as session:
         # find reservation records.
         rec = await ReservationRecord.retrieve_by_reservation_id(
             session, reservation_id, for_update=True
         )
         if rec.state == ReservationRecord.STATE_REQUESTED:
-            _pwd, _salt, _hash, _expiry = generate_reservation_token_data(
-                manager._config.reservation.expiry_minutes
-            )
             rec.reservation_token_salt = _salt.decode("utf-8")
             rec.reservation_token_hash = _hash.decode("utf-8")
             rec.reservation_token_expiry = _expiry
@@ -107,6 +117,13 @@ async def refresh_registration_token(reservation_id: str, manager: TenantManager
     Invalidate the old token, generate a new token, and update the reservation record.
     :return: new_token: the new refreshed token
     """
+    # Generate new token data (in the crypto pool, before opening a session)
+    _pwd = str(uuid.uuid4().hex)  # This generates a new token
+    _salt, _hash = await manager.crypto.hash_secret(_pwd)
+
+    minutes = manager._config.reservation.expiry_minutes
+    _expiry = datetime.utcnow() + timedelta(minutes=minutes)
+
     async with manager.profile.session() as session:
         try:
             reservation = await ReservationRecord.retrieve_by_reservation_id(
@@ -116,18 +133,17 @@ async def refresh_registration_token(reservation_id: str, manager: TenantManager
             LOGGER.error("Failed to retrieve reservation: %s", err)
             raise ReservationException("Could not retrieve reservation record.") from err
 
-        if reservation.state != ReservationRecord.STATE_APPROVED:
-            raise ReservationException("Only approved reservations can refresh tokens.")
-
-        # Generate new token data
-        _pwd = str(uuid.uuid4().hex)  # This generates a new token
-        _salt = bcrypt.gensalt()
-        _hash = bcrypt.hashpw(_pwd.encode("utf-8"), _salt)
-
-        minutes = manager._config.reservation.expiry_minutes
-        _expiry = datetime.utcnow() + timedelta(minutes=minutes)
+        if reservation.state not in (
+            ReservationRecord.STATE_APPROVED,
+            ReservationRecord.STATE_EXPIRED,
+        ):
+            raise ReservationException(
+                "Only approved or expired reservations can refresh tokens."
+            )
 
         # Update the reservation record with the new token and related info
+        # (an expired reservation is approved again)
+        reservation.state = ReservationRecord.STATE_APPROVED
         reservation.reservation_token_salt = _salt.decode("utf-8")
         reservation.reservation_token_hash = _hash.decode("utf-8")
         reservation.reservation_token_expiry = _expiry
@@ -140,24 +156,109 @@ async def refresh_registration_token(reservation_id: str, manager: TenantManager
 
         LOGGER.info("Refreshed token for reservation %s", reservation_id)
 
-        return _pwd 
+        return _pwd
+
+
+async def checkin_reservation(res_rec: ReservationRecord, manager: TenantManager):
+    """
+    Create the tenant and wallet for an approved reservation and check it in.
+    The tenant record and the reservation update are committed in one transaction.
+    :return: wallet_record, wallet_key, token for the new tenant wallet
+    """
+    settings_dict = {}
+    if res_rec.connect_to_endorsers and len(res_rec.connect_to_endorsers) > 0:
+        settings_dict["tenant.endorser_config"] = res_rec.connect_to_endorsers
+    if res_rec.create_public_did and len(res_rec.create_public_did) > 0:
+        settings_dict["tenant.public_did_config"] = res_rec.create_public_did
+    tenant, wallet_record, token = await manager.create_wallet(
+        wallet_name=res_rec.tenant_name,
+        wallet_key=str(uuid.uuid4()),
+        tenant_email=res_rec.contact_email,
+        extra_settings=settings_dict,
+        use_pool=True,
+        reservation=res_rec,
+    )
+
+    # a pooled wallet comes with its own key
+    return wallet_record, wallet_record.wallet_key, token
+
+
+async def provision_tenant(spec: dict, manager: TenantManager):
+    """
+    Reserve, approve and check in a tenant in one go, for innkeeper provisioning.
+    No reservation password is generated: nobody else checks in for this tenant.
+    :return: result: reservation, tenant and wallet ids, wallet key and token
+    """
+    rec = ReservationRecord(
+        tenant_name=spec.get("tenant_name"),
+        contact_email=spec.get("contact_email"),
+        context_data=spec.get("context_data") or {},
+        state=ReservationRecord.STATE_APPROVED,
+        state_notes=spec.get("state_notes"),
+        # like any approved reservation, so the sweeper expires it if left behind
+        reservation_token_expiry=datetime.utcnow()
+        + timedelta(minutes=manager._config.reservation.expiry_minutes),
+    )
+    async with manager.profile.session() as session:
+        await rec.save(session, reason="New tenant reservation (bulk)")
+    try:
+        wallet_record, wallet_key, token = await checkin_reservation(rec, manager)
+    except Exception:
+        # nobody can check in for this tenant later, do not leave it approved
+        try:
+            async with manager.profile.session() as session:
+                await rec.delete_record(session)
+        except Exception as err:
+            LOGGER.error(f"reservation {rec.reservation_id} not rolled back: {err}")
+        raise
+
+    return {
+        "tenant_name": rec.tenant_name,
+        "reservation_id": rec.reservation_id,
+        "tenant_id": rec.tenant_id,
+        "wallet_id": wallet_record.wallet_id,
+        "wallet_key": wallet_key,
+        "token": token,
+    }
+
+
+def format_api_key(tenant_authentication_api_id: str, secret: str) -> str:
+    """Build a self-identifying API key: prefix, API key record id and secret."""
+    return f"{API_KEY_PREFIX}_{tenant_authentication_api_id}_{secret}"
+
 
-def generate_api_key_data():
+def parse_api_key(api_key: str) -> Optional[str]:
+    """Return the API key record id embedded in api_key, None for bare keys."""
+    match = API_KEY_PATTERN.match(api_key or "")
+    return match.group(1) if match else None
+
+
+async def generate_api_key_data(
+    crypto: CryptoService, tenant_authentication_api_id: str = None
+):
     _key = str(uuid.uuid4().hex)
+    if tenant_authentication_api_id:
+        _key = format_api_key(tenant_authentication_api_id, _key)
     LOGGER.info(f"_key = {_key}")
 
-    _salt = bcrypt.gensalt()
+    _salt, _hash = await crypto.hash_secret(_key)
     LOGGER.info(f"_salt = {_salt}")
-
-    _hash = bcrypt.hashpw(_key.encode("utf-8"), _salt)
     LOGGER.info(f"_hash = {_hash}")
 
     return _key, _salt, _hash
 
 
-async def create_api_key(rec: TenantAuthenticationApiRecord, manager: TenantManager):
+async def create_api_key(
+    rec: TenantAuthenticationApiRecord,
+    manager: TenantManager,
+    self_identifying: bool = True,
+):
+    # self identifying keys embed the record id, so assign it before the first save
+    tenant_authentication_api_id = rec.assign_id() if self_identifying else None
+    _key, _salt, _hash = await generate_api_key_data(
+        manager.crypto, tenant_authentication_api_id
+    )
     async with manager.profile.session() as session:
-        _key, _salt, _hash = generate_api_key_data()
         rec.api_key_token_salt = _salt.decode("utf-8")
         rec.api_key_token_hash = _hash.decode("utf-8")
         await rec.save(session)
@@ -167,8 +268,60 @@ async def create_api_key(rec: TenantAuthenticationApiRecord, manager: TenantMana
     return _key, rec.tenant_authentication_api_id
 
 
-class ReservationException(Exception):
-    pass
+async def find_api_keys(
+    session: ProfileSession, tenant_id: str, api_key: str
+) -> List[TenantAuthenticationApiRecord]:
+    """
+    Look up the tenant's API key records api_key can match, without verifying it.
+    :return: the candidate records, empty if there are none
+    """
+    tenant_authentication_api_id = parse_api_key(api_key)
+    if tenant_authentication_api_id:
+        # self identifying key, only the one record can match
+        try:
+            tenant_key = await TenantAuthenticationApiRecord.retrieve_by_auth_api_id(
+                session, tenant_authentication_api_id
+            )
+        except StorageNotFoundError:
+            return []
+        return [tenant_key] if tenant_key.tenant_id == tenant_id else []
+    # bare (legacy) key, try all of the tenant's keys
+    return await TenantAuthenticationApiRecord.query_by_tenant_id(session, tenant_id)
+
+
+async def verify_api_key(
+    tenant_id: str,
+    api_key: str,
+    tenant_keys: List[TenantAuthenticationApiRecord],
+    manager: TenantManager,
+):
+    """
+    Verify an API key against the records found by find_api_keys.
+
+    Hashing runs in the crypto pool, call this after closing the session the
+    records were read in. The verification cache is consulted first.
+    :return: tenant_authentication_api_id: the id of the matching API key record
+    """
+    # if no keys found raise an error
+    if not tenant_keys:
+        raise TenantApiKeyException("API Key not found")
+    cached_id = manager.api_key_cache.get(tenant_id, api_key)
+    if cached_id and any(
+        tenant_key.tenant_authentication_api_id == cached_id
+        for tenant_key in tenant_keys
+    ):
+        LOGGER.debug("API key for tenant %s verified from cache", tenant_id)
+        return cached_id
+
+    # check if the provided key matches any of the tenant keys
+    for tenant_key in tenant_keys:
+        if await manager.check_api_key(api_key, tenant_key):
+            manager.api_key_cache.put(
+                tenant_id, api_key, tenant_key.tenant_authentication_api_id
+            )
+            return tenant_key.tenant_authentication_api_id
+
+    raise TenantApiKeyException("API Key mismatch")
 
 
 class TenantApiKeyException(Exception):
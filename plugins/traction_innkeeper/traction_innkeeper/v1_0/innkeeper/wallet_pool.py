@@ -0,0 +1,159 @@
+import asyncio
+import logging
+import uuid
+from collections import deque
+from typing import Deque, Optional
+
+from aries_cloudagent.core.profile import Profile
+from aries_cloudagent.multitenant.base import BaseMultitenantManager
+from aries_cloudagent.storage.error import StorageNotFoundError
+from aries_cloudagent.wallet.models.wallet_record import WalletRecord
+
+from .config import WalletPoolConfig
+from .models import WalletPoolEntryRecord
+
+LOGGER = logging.getLogger(__name__)
+
+
+class WalletPool:
+    """Pool of pre-created, unassigned tenant wallets.
+
+    Creating a wallet (provisioning the store/profile and deriving keys) is the
+    slow part of a check-in. The pool creates wallets ahead of time in the
+    background; a check-in claims one and only has to relabel it. Available
+    wallets are persisted as WalletPoolEntryRecords so they survive restarts,
+    claiming deletes the entry in a transaction so a wallet is handed out once.
+
+    The pool is shared by all instances: size is the number of stored entries,
+    not a per instance count. Each instance tops the stored entries up to size
+    and claims entries created by any instance. Instances refilling at the same
+    time can overshoot size by one wallet each.
+    """
+
+    def __init__(self, profile: Profile, config: WalletPoolConfig):
+        """
+        Initialize a WalletPool.
+
+        Args:
+            profile: The root profile, pooled wallets live under it
+            config: The wallet pool configuration
+        """
+        self._profile = profile
+        self._config = config
+        self._logger = logging.getLogger(__name__)
+        self._available: Deque[str] = deque()
+        self._refill_task: Optional[asyncio.Task] = None
+        # stats
+        self._hits = 0
+        self._misses = 0
+        self._created = 0
+        self._failed = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self._config.enabled and self._config.size > 0
+
+    async def start(self):
+        """Load the persisted pool entries and start filling the pool."""
+        if not self.enabled:
+            return
+        await self._load()
+        self._logger.info(
+            f"wallet pool started: available = {len(self._available)}, "
+            f"size = {self._config.size}"
+        )
+        self.schedule_refill()
+
+    async def _load(self) -> int:
+        """Queue the stored entries (of all instances), return their number."""
+        async with self._profile.session() as session:
+            entries = await WalletPoolEntryRecord.query(session)
+        self._available = deque(entry.wallet_pool_entry_id for entry in entries)
+        return len(entries)
+
+    async def stop(self):
+        if self._refill_task and not self._refill_task.done():
+            self._refill_task.cancel()
+        self._refill_task = None
+
+    def schedule_refill(self):
+        """Top the pool up in the background (if it is not already being filled)."""
+        if not self.enabled:
+            return
+        if self._refill_task and not self._refill_task.done():
+            return
+        self._refill_task = asyncio.ensure_future(self._refill())
+
+    async def _refill(self):
+        # counted in storage, other instances claim and refill the same pool
+        while await self._load() < self._config.size:
+            try:
+                await self._create_pool_wallet()
+            except Exception as err:
+                # do not spin on a persistent error, next claim will try again
+                self._failed += 1
+                self._logger.error(f"wallet pool refill failed: {err}")
+                return
+            self._created += 1
+
+    async def _create_pool_wallet(self) -> str:
+        wallet_name = f"{self._config.name_prefix}-{uuid.uuid4().hex}"
+        settings = {
+            "wallet.type": self._profile.context.settings["wallet.type"],
+            "wallet.name": wallet_name,
+            "wallet.key": str(uuid.uuid4()),
+            "wallet.webhook_urls": [],
+            "wallet.dispatch_type": "base",
+            "default_label": wallet_name,
+        }
+        multitenant_mgr = self._profile.inject(BaseMultitenantManager)
+        wallet_record = await multitenant_mgr.create_wallet(
+            settings, WalletRecord.MODE_MANAGED
+        )
+        entry = WalletPoolEntryRecord(wallet_id=wallet_record.wallet_id)
+        async with self._profile.session() as session:
+            await entry.save(session, reason="New pooled wallet")
+        self._logger.debug(f"pooled wallet created: {wallet_record.wallet_id}")
+        return entry.wallet_pool_entry_id
+
+    async def claim(self) -> Optional[WalletRecord]:
+        """Take a wallet out of the pool, None if the pool is empty."""
+        if not self.enabled:
+            return None
+        wallet_record = None
+        if not self._available:
+            # other instances may have refilled the pool
+            await self._load()
+        while self._available and not wallet_record:
+            entry_id = self._available.popleft()
+            try:
+                async with self._profile.transaction() as txn:
+                    entry = await WalletPoolEntryRecord.retrieve_by_id(
+                        txn, entry_id, for_update=True
+                    )
+                    await entry.delete_record(txn)
+                    wallet_record = await WalletRecord.retrieve_by_id(
+                        txn, entry.wallet_id
+                    )
+                    await txn.commit()
+            except StorageNotFoundError:
+                # claimed elsewhere (another instance) or wallet removed, next...
+                self._logger.debug(f"pooled wallet no longer available: {entry_id}")
+        if wallet_record:
+            self._hits += 1
+        else:
+            self._misses += 1
+        self.schedule_refill()
+        return wallet_record
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "size": self._config.size,
+            "available": len(self._available),
+            "refilling": bool(self._refill_task and not self._refill_task.done()),
+            "hits": self._hits,
+            "misses": self._misses,
+            "created": self._created,
+            "failed": self._failed,
+        }
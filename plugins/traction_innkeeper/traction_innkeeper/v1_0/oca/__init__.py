@@ -7,8 +7,10 @@ from aries_cloudagent.core.event_bus import EventBus, Event
 from aries_cloudagent.core.plugin_registry import PluginRegistry
 from aries_cloudagent.core.profile import Profile
 from aries_cloudagent.core.protocol_registry import ProtocolRegistry
-from aries_cloudagent.core.util import STARTUP_EVENT_PATTERN
+from aries_cloudagent.core.util import SHUTDOWN_EVENT_PATTERN, STARTUP_EVENT_PATTERN
+from aries_cloudagent.wallet.util import EVENT_LISTENER_PATTERN
 
+from ..innkeeper.tenant_manager import TenantManager
 from .oca_service import OcaService
 
 LOGGER = logging.getLogger(__name__)
@@ -30,6 +32,8 @@ async def setup(context: InjectionContext):
         raise ValueError("EventBus missing in context")
 
     bus.subscribe(STARTUP_EVENT_PATTERN, on_startup)
+    bus.subscribe(SHUTDOWN_EVENT_PATTERN, on_shutdown)
+    bus.subscribe(EVENT_LISTENER_PATTERN, on_register_nym_event)
 
     LOGGER.info("< plugin setup.")
 
@@ -54,6 +58,10 @@ async def on_startup(profile: Profile, event: Event):
     profile.context.settings.set_value(
         "multitenant.base_wallet_routes", base_wallet_routes
     )
+    # the server configuration shown by the innkeeper plugin includes it
+    mgr = profile.inject_or(TenantManager)
+    if mgr:
+        mgr.server_config.rebuild()
     # and we need to tell the server to load the additional routes
     # first call to this property "builds" the underlying property...
     srv.additional_routes_pattern
@@ -61,3 +69,17 @@ async def on_startup(profile: Profile, event: Event):
     # second call to the property should return all the patterns it will use
     LOGGER.info(f"srv.additional_routes_pattern = {srv.additional_routes_pattern}")
     LOGGER.info("< on_startup")
+
+
+async def on_shutdown(profile: Profile, event: Event):
+    svc = profile.inject_or(OcaService)
+    if svc:
+        await svc.resolver.close()
+
+
+async def on_register_nym_event(profile: Profile, event: Event):
+    # the DID is about to be promoted to public DID of this wallet, possibly by a
+    # subscriber called after this one: keep it uncached until the wallet has it
+    svc = profile.inject_or(OcaService)
+    if svc:
+        await svc.evict_public_did(profile, event.payload.get("did"))
@@ -0,0 +1,219 @@
+import asyncio
+import ipaddress
+import json
+import logging
+import socket
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+from aiohttp import ClientError, ClientSession, ClientTimeout, TCPConnector, hdrs
+from aiohttp.abc import AbstractResolver
+from aiohttp.resolver import DefaultResolver
+from aries_cloudagent.core.error import BaseError
+from yarl import URL
+
+from ..innkeeper.cache import TTLCache
+
+LOGGER = logging.getLogger(__name__)
+
+# bundles fetched from urls, revalidated with the origin after max age
+RESOLVER_CACHE_SIZE = 256
+RESOLVER_MAX_AGE = 300
+# entries not revalidated for this long are dropped
+RESOLVER_CACHE_TTL = 86400
+RESOLVER_TIMEOUT = 10
+# larger bundles are refused
+MAX_BUNDLE_SIZE = 1024 * 1024
+MAX_REDIRECTS = 5
+REDIRECT_STATUSES = (301, 302, 303, 307, 308)
+
+
+class OcaBundleResolveError(BaseError):
+    """OCA Bundle could not be resolved exception."""
+
+
+def _check_address(host: str, address: str):
+    """Refuse addresses that are not public: private, loopback, link-local..."""
+    # scoped IPv6 addresses come with a %interface suffix
+    ip = ipaddress.ip_address(address.split("%", 1)[0])
+    if not ip.is_global or ip.is_multicast:
+        raise OcaBundleResolveError(f"OCA Bundle url host {host} is not public")
+
+
+class _PublicResolver(AbstractResolver):
+    """Resolve host names for the fetches, refusing non public addresses.
+
+    Checked when connecting, for every redirect too, so a name cannot be made
+    to resolve to an internal address after it was checked.
+    """
+
+    def __init__(self, allowed_hosts: Sequence[str]):
+        self._resolver = DefaultResolver()
+        self._allowed_hosts = set(allowed_hosts)
+
+    async def resolve(
+        self, host: str, port: int = 0, family: int = socket.AF_INET
+    ) -> List[Dict[str, Any]]:
+        hosts = await self._resolver.resolve(host, port, family)
+        if host not in self._allowed_hosts:
+            for info in hosts:
+                _check_address(host, info["host"])
+        return hosts
+
+    async def close(self):
+        await self._resolver.close()
+
+
+class _Entry:
+    """A fetched bundle with the validators of its response."""
+
+    def __init__(self, bundle: dict, etag: Optional[str], last_modified: Optional[str]):
+        self.bundle = bundle
+        self.etag = etag
+        self.last_modified = last_modified
+        self.validated = time.monotonic()
+
+
+class OcaBundleResolver:
+    """Fetch OCA bundles referenced by url, with a revalidating cache.
+
+    A cached bundle is served as is for max_age seconds, then revalidated
+    with the origin (If-None-Match / If-Modified-Since), so unchanged bundles
+    are not downloaded again. When the origin cannot be reached, the cached
+    (stale) bundle is served. Concurrent requests for a url share one fetch.
+
+    Only http(s) urls are fetched and, unless allowed, only from public
+    addresses (redirects included): record urls are set by tenants and must
+    not reach the agent's own network.
+    """
+
+    def __init__(
+        self,
+        max_age: float = RESOLVER_MAX_AGE,
+        max_size: int = MAX_BUNDLE_SIZE,
+        timeout: float = RESOLVER_TIMEOUT,
+        cache_size: int = RESOLVER_CACHE_SIZE,
+        allowed_hosts: Sequence[str] = (),
+        allow_private: bool = False,
+    ):
+        """
+        Initialize an OcaBundleResolver.
+
+        Args:
+            max_age: Seconds a fetched bundle is used without revalidation
+            max_size: Maximum size of a bundle, in bytes
+            timeout: Seconds allowed for one fetch
+            cache_size: Maximum number of cached bundles
+            allowed_hosts: Hosts fetched from even when their address is not public
+            allow_private: Fetch from any address, including private ones
+        """
+        self._max_age = max_age
+        self._max_size = max_size
+        self._timeout = ClientTimeout(total=timeout)
+        self._cache = TTLCache(cache_size, RESOLVER_CACHE_TTL)
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._session: Optional[ClientSession] = None
+        self._allowed_hosts = set(allowed_hosts)
+        self._allow_private = allow_private
+
+    async def close(self):
+        if self._session:
+            await self._session.close()
+            self._session = None
+
+    def evict(self, url: str):
+        self._cache.pop(url)
+
+    async def resolve(self, url: str) -> dict:
+        """Return the bundle at url, from the cache when it is still valid."""
+        entry: Optional[_Entry] = self._cache.get(url)
+        if entry and time.monotonic() - entry.validated < self._max_age:
+            return entry.bundle
+
+        inflight = self._inflight.get(url)
+        if inflight:
+            return await asyncio.shield(inflight)
+        # shielded, a cancelled request does not cancel the others' fetch
+        future = self._inflight[url] = asyncio.ensure_future(self._fetch(url, entry))
+        future.add_done_callback(lambda _: self._inflight.pop(url, None))
+        return await asyncio.shield(future)
+
+    async def _fetch(self, url: str, entry: Optional[_Entry]) -> dict:
+        headers = {}
+        if entry and entry.etag:
+            headers[hdrs.IF_NONE_MATCH] = entry.etag
+        if entry and entry.last_modified:
+            headers[hdrs.IF_MODIFIED_SINCE] = entry.last_modified
+        if not self._session:
+            connector = None
+            if not self._allow_private:
+                connector = TCPConnector(resolver=_PublicResolver(self._allowed_hosts))
+            self._session = ClientSession(timeout=self._timeout, connector=connector)
+        try:
+            async with await self._get(url, headers) as response:
+                if response.status == 304 and entry:
+                    entry.validated = time.monotonic()
+                    self._cache.set(url, entry)
+                    return entry.bundle
+                if response.status != 200:
+                    raise OcaBundleResolveError(
+                        f"OCA Bundle url returned status {response.status}"
+                    )
+                bundle = await self._read_bundle(response)
+                new_entry = _Entry(
+                    bundle,
+                    response.headers.get(hdrs.ETAG),
+                    response.headers.get(hdrs.LAST_MODIFIED),
+                )
+        except (ClientError, asyncio.TimeoutError) as err:
+            if entry:
+                LOGGER.warning(f"serving stale OCA bundle for {url}: {err!r}")
+                return entry.bundle
+            raise OcaBundleResolveError(f"OCA Bundle url not reachable: {err!r}")
+        self._cache.set(url, new_entry)
+        return bundle
+
+    async def _get(self, url: str, headers: dict):
+        """GET url, following redirects to allowed urls only."""
+        target = URL(url)
+        for _ in range(MAX_REDIRECTS + 1):
+            self._check_url(target)
+            response = await self._session.get(
+                target, headers=headers, allow_redirects=False
+            )
+            location = response.headers.get(hdrs.LOCATION)
+            if response.status not in REDIRECT_STATUSES or not location:
+                return response
+            response.release()
+            target = target.join(URL(location))
+        raise OcaBundleResolveError("OCA Bundle url redirected too many times")
+
+    def _check_url(self, url: URL):
+        if url.scheme not in ("http", "https"):
+            raise OcaBundleResolveError("OCA Bundle url must be http or https")
+        if not url.host:
+            raise OcaBundleResolveError("OCA Bundle url has no host")
+        if self._allow_private or url.host in self._allowed_hosts:
+            return
+        try:
+            ipaddress.ip_address(url.host)
+        except ValueError:
+            # a name, its addresses are checked when it is resolved
+            return
+        _check_address(url.host, url.host)
+
+    async def _read_bundle(self, response) -> dict:
+        if (response.content_length or 0) > self._max_size:
+            raise OcaBundleResolveError("OCA Bundle is too large")
+        body = bytearray()
+        async for chunk in response.content.iter_chunked(64 * 1024):
+            body.extend(chunk)
+            if len(body) > self._max_size:
+                raise OcaBundleResolveError("OCA Bundle is too large")
+        try:
+            bundle = json.loads(body)
+        except ValueError as err:
+            raise OcaBundleResolveError("OCA Bundle is not valid JSON") from err
+        if not isinstance(bundle, dict):
+            raise OcaBundleResolveError("OCA Bundle is not a JSON object")
+        return bundle
@@ -1,3 +1,5 @@
+import hashlib
+import json
 from typing import Optional
 
 from aries_cloudagent.messaging.models.base_record import BaseRecord, BaseRecordSchema
@@ -25,6 +27,7 @@ class OcaRecord(BaseRecord):
         "schema_id",
         "cred_def_id",
         "owner_did",
+        "bundle_hash",
     }
 
     def __init__(
@@ -35,6 +38,7 @@ class OcaRecord(BaseRecord):
         cred_def_id: str = None,
         url: str = None,
         bundle: dict = None,
+        bundle_hash: str = None,
         owner_did: str = None,
         **kwargs,
     ):
@@ -44,6 +48,7 @@ class OcaRecord(BaseRecord):
         self.cred_def_id = cred_def_id
         self.url = url
         self.bundle = bundle
+        self.bundle_hash = bundle_hash
         self.owner_did = owner_did
 
     @property
@@ -54,10 +59,14 @@ class OcaRecord(BaseRecord):
     @property
     def record_value(self) -> dict:
         """Return record value."""
-        return {
+        value = {
             prop: getattr(self, prop)
-            for prop in ("schema_id", "cred_def_id", "url", "bundle", "owner_did")
+            for prop in ("schema_id", "cred_def_id", "url", "owner_did")
         }
+        if not self.bundle_hash:
+            # not in the bundle store (yet), kept inline
+            value["bundle"] = self.bundle
+        return value
 
 
 class OcaRecordSchema(BaseRecordSchema):
@@ -91,4 +100,73 @@ class OcaRecordSchema(BaseRecordSchema):
         required=False,
         description="OCA Bundle",
     )
+    bundle_hash = fields.Str(
+        required=False,
+        description="Hash of the OCA Bundle, its OCA Bundle Record identifier",
+    )
     owner_did = fields.Str(required=False, description="Public DID of OCA record owner")
+
+
+class OcaBundleRecord(BaseRecord):
+    """Traction OCA Bundle Record, one per distinct bundle.
+
+    The record id is the hash of the canonical JSON of the bundle, OCA records
+    with the same bundle share one of these.
+    """
+
+    class Meta:
+        """OcaBundleRecord Meta."""
+
+        schema_class = "OcaBundleRecordSchema"
+
+    RECORD_TYPE = "oca_bundle"
+    RECORD_ID_NAME = "bundle_hash"
+    TAG_NAMES = {}
+
+    def __init__(
+        self,
+        *,
+        bundle_hash: str = None,
+        bundle: dict = None,
+        **kwargs,
+    ):
+        """Construct record."""
+        super().__init__(bundle_hash, new_with_id=bundle_hash is not None, **kwargs)
+        self.bundle = bundle
+
+    @property
+    def bundle_hash(self) -> Optional[str]:
+        """Return record id."""
+        return self._id
+
+    @property
+    def record_value(self) -> dict:
+        """Return record value."""
+        return {"bundle": self.bundle}
+
+    @staticmethod
+    def hash_bundle(bundle: dict) -> str:
+        """Hash of the canonical JSON (sorted keys, no whitespace) of bundle."""
+        canonical = json.dumps(
+            bundle, sort_keys=True, separators=(",", ":"), ensure_ascii=False
+        )
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class OcaBundleRecordSchema(BaseRecordSchema):
+    """Traction OCA Bundle Record Schema."""
+
+    class Meta:
+        """OcaBundleRecord Meta."""
+
+        model_class = "OcaBundleRecord"
+        unknown = EXCLUDE
+
+    bundle_hash = fields.Str(
+        required=True,
+        description="OCA Bundle Record identifier, hash of the bundle",
+    )
+    bundle = fields.Dict(
+        required=False,
+        description="OCA Bundle",
+    )
@@ -1,18 +1,32 @@
 import logging
-from typing import Optional
+from typing import List, Optional, Tuple
 
 from aries_cloudagent.core.error import BaseError
-from aries_cloudagent.core.profile import Profile
+from aries_cloudagent.core.profile import Profile, ProfileSession
+from aries_cloudagent.storage.base import BaseStorageSearch
 from aries_cloudagent.storage.error import StorageDuplicateError, StorageNotFoundError
 from aries_cloudagent.wallet.base import BaseWallet
 from aries_cloudagent.wallet.did_info import DIDInfo
 from aries_cloudagent.wallet.error import WalletError
 from marshmallow import ValidationError
 
-from .models import OcaRecord
+from ..innkeeper.cache import TTLCache
+from ..innkeeper.config import get_config
+from ..innkeeper.invalidation import TOPIC_PUBLIC_DID, TOPIC_RESET
+from ..innkeeper.pagination import paginate_records
+from ..innkeeper.tenant_manager import TenantManager
+from .bundle_resolver import OcaBundleResolver
+from .models import OcaBundleRecord, OcaRecord
 
 LOGGER = logging.getLogger(__name__)
 
+# public DIDs by wallet id, the ttl is a backstop for changes not seen
+PUBLIC_DID_CACHE_SIZE = 1000
+PUBLIC_DID_CACHE_TTL = 300
+# bundles by hash, they never change
+BUNDLE_CACHE_SIZE = 256
+BUNDLE_CACHE_TTL = 3600
+
 
 class PublicDIDRequiredError(BaseError):
     """Public DID Required exception."""
@@ -26,6 +40,18 @@ class OcaService:
     def __init__(self, profile: Profile):
         self._profile = profile
         self._logger = logging.getLogger(__name__)
+        self._public_dids = TTLCache(PUBLIC_DID_CACHE_SIZE, PUBLIC_DID_CACHE_TTL)
+        # the DID being promoted by wallet id, not cached until it is public
+        self._pending_dids = TTLCache(PUBLIC_DID_CACHE_SIZE, PUBLIC_DID_CACHE_TTL)
+        self._bundles = TTLCache(BUNDLE_CACHE_SIZE, BUNDLE_CACHE_TTL)
+        config = get_config(profile.settings)
+        self._bulk_max_records = config.oca.bulk_max_records
+        resolver_config = config.oca_resolver
+        self._resolver = OcaBundleResolver(
+            allowed_hosts=resolver_config.allowed_hosts,
+            allow_private=resolver_config.allow_private,
+        )
+        self._subscribed = False
 
     @property
     def profile(self) -> Profile:
@@ -42,9 +68,65 @@ class OcaService:
     def logger(self) -> logging.Logger:
         return self._logger
 
+    @property
+    def bulk_max_records(self) -> int:
+        return self._bulk_max_records
+
+    @property
+    def resolver(self) -> OcaBundleResolver:
+        """
+        Accessor for the resolver of bundles referenced by url.
+
+        Returns:
+            The OCA bundle resolver for this service
+
+        """
+        return self._resolver
+
+    async def evict_public_did(self, issuer_profile: Profile, did: str = None):
+        """Forget the cached public DID of issuer_profile (on all instances).
+
+        did is the DID being promoted, when the promotion may not be committed
+        yet: the public DID is not cached again until the wallet returns it.
+        """
+        wallet_id = issuer_profile.settings.get("wallet.id")
+        payload = {"wallet_id": wallet_id, "did": did}
+        self._evict(payload)
+        mgr = self._profile.inject_or(TenantManager)
+        if mgr:
+            await mgr.invalidation.publish(TOPIC_PUBLIC_DID, payload)
+
+    def _evict(self, payload: dict):
+        wallet_id = payload.get("wallet_id")
+        self._public_dids.pop(wallet_id)
+        if payload.get("did"):
+            self._pending_dids.set(wallet_id, payload["did"])
+
+    def _subscribe(self):
+        # the tenant manager (and its bus) may start after this service
+        if self._subscribed:
+            return
+        mgr = self._profile.inject_or(TenantManager)
+        if mgr:
+            mgr.invalidation.subscribe(
+                TOPIC_PUBLIC_DID, self._on_public_did_invalidation
+            )
+            mgr.invalidation.subscribe(TOPIC_RESET, self._on_reset_invalidation)
+            self._subscribed = True
+
+    async def _on_public_did_invalidation(self, payload: dict):
+        self._evict(payload)
+
+    async def _on_reset_invalidation(self, payload: dict):
+        self._public_dids.clear()
+
     async def get_public_did_info(self, issuer_profile: Profile):
         self.logger.info("> get_public_did_info()")
-        result = None
+        wallet_id = issuer_profile.settings.get("wallet.id")
+        result = self._public_dids.get(wallet_id)
+        if result:
+            self.logger.info(f"< get_public_did_info() = {result} (cached)")
+            return result
         async with issuer_profile.session() as session:
             wallet = session.inject_or(BaseWallet)
             if not wallet:
@@ -53,6 +135,16 @@ class OcaService:
                 result = await wallet.get_public_did()
             except WalletError as err:
                 raise err
+        pending_did = self._pending_dids.get(wallet_id)
+        if pending_did and (not result or result.did != pending_did):
+            # read before the promotion was committed, re-checked on the next call
+            self.logger.info(f"< get_public_did_info() = {result} (promoting)")
+            return result
+        self._pending_dids.pop(wallet_id)
+        if result:
+            # no public DID is not cached, one can be set at any time
+            self._subscribe()
+            self._public_dids.set(wallet_id, result)
         self.logger.info(f"< get_public_did_info() = {result}")
         return result
 
@@ -109,40 +201,139 @@ class OcaService:
             result["cred_def_id"] = cred_def_id
         return result
 
-    def build_post_filter(self, public_info: Optional[DIDInfo]):
+    def build_owner_filter(self, public_info: Optional[DIDInfo]):
         result = {}
         if public_info and public_info.did:
             result = {"owner_did": public_info.did}
         return result
 
+    async def store_bundle(self, txn: ProfileSession, bundle: dict) -> str:
+        """Store bundle in the bundle store, unless it is already, return its hash.
+
+        The bundle record is locked in txn, the transaction saving the records
+        that refer to it, so it cannot be released before they are committed.
+        """
+        bundle_hash = OcaBundleRecord.hash_bundle(bundle)
+        # always checked in storage, it may have been released (or the session
+        # may be rolled back), the cache only says what a bundle contains
+        try:
+            await OcaBundleRecord.retrieve_by_id(txn, bundle_hash, for_update=True)
+        except StorageNotFoundError:
+            rec = OcaBundleRecord(bundle_hash=bundle_hash, bundle=bundle)
+            try:
+                await rec.save(txn, reason="Store OCA bundle")
+            except StorageDuplicateError:
+                # stored by a concurrent transaction
+                await OcaBundleRecord.retrieve_by_id(txn, bundle_hash, for_update=True)
+        self._bundles.set(bundle_hash, bundle)
+        return bundle_hash
+
+    async def release_bundle(self, bundle_hash: str):
+        """Delete a stored bundle when no OCA record refers to it anymore.
+
+        Runs in a transaction of its own, call it once the records that no
+        longer refer to the bundle are committed.
+        """
+        async with self.profile.transaction() as txn:
+            # locked first, store_bundle holds the lock until the records
+            # referring to the bundle are committed, so they are seen here
+            try:
+                rec = await OcaBundleRecord.retrieve_by_id(
+                    txn, bundle_hash, for_update=True
+                )
+            except StorageNotFoundError:
+                rec = None
+            if rec:
+                search = txn.inject(BaseStorageSearch).search_records(
+                    OcaRecord.RECORD_TYPE,
+                    OcaRecord.prefix_tag_filter({"bundle_hash": bundle_hash}),
+                    1,
+                )
+                try:
+                    in_use = bool(await search.fetch(1))
+                finally:
+                    await search.close()
+                if in_use:
+                    return
+                await rec.delete_record(txn)
+                await txn.commit()
+        self._bundles.pop(bundle_hash)
+
+    async def load_bundles(self, session: ProfileSession, records: List[OcaRecord]):
+        """Set the bundle of records that only hold a reference to it."""
+        for rec in records:
+            if rec.bundle is not None or not rec.bundle_hash:
+                continue
+            bundle = self._bundles.get(rec.bundle_hash)
+            if bundle is None:
+                try:
+                    bundle_rec = await OcaBundleRecord.retrieve_by_id(
+                        session, rec.bundle_hash
+                    )
+                except StorageNotFoundError:
+                    self.logger.warning(f"OCA bundle {rec.bundle_hash} not found")
+                    continue
+                bundle = bundle_rec.bundle
+                self._bundles.set(rec.bundle_hash, bundle)
+            rec.bundle = bundle
+
+    async def save_oca_record(
+        self, txn: ProfileSession, rec: OcaRecord, reason: str = None
+    ) -> Optional[str]:
+        """Save rec in transaction txn, its bundle (if any) goes to the bundle store.
+
+        Returns the hash of the bundle rec referred to before, if it changed.
+        The caller releases that bundle once txn is committed.
+        """
+        previous = rec.bundle_hash
+        rec.bundle_hash = (
+            await self.store_bundle(txn, rec.bundle) if rec.bundle else None
+        )
+        await rec.save(txn, reason=reason)
+        if rec.url:
+            # saved again, the bundle behind the url may have changed too
+            self._resolver.evict(rec.url)
+        if previous and previous != rec.bundle_hash:
+            return previous
+        return None
+
     async def list_oca_records(
         self,
         issuer_profile: Profile,
         schema_id: Optional[str],
         cred_def_id: Optional[str],
-    ):
+        expand: bool = False,
+        limit: int = None,
+        cursor: str = None,
+    ) -> Tuple[List[OcaRecord], Optional[str]]:
+        """Return the OCA records (one page of them with limit) and next cursor."""
         self.logger.info(
             f"> list_oca_records({issuer_profile}, {schema_id}, {cred_def_id})"
         )
         is_root_profile = issuer_profile == self.profile
         public_info = await self.get_public_did_info(issuer_profile)
         tag_filter = self.build_tag_filter(schema_id, cred_def_id)
-        post_filter = {} if is_root_profile else self.build_post_filter(public_info)
+        if not is_root_profile:
+            tag_filter.update(self.build_owner_filter(public_info))
         records = []
+        next_cursor = None
         if is_root_profile or public_info:
-            self.logger.info(f"post_filter = {post_filter}")
-            async with self.profile.session() as session:
-                records = await OcaRecord.query(
-                    session=session,
-                    tag_filter=tag_filter,
-                    post_filter_positive=post_filter,
-                    alt=True,
+            if limit:
+                records, next_cursor = await paginate_records(
+                    self.profile, OcaRecord, tag_filter, limit=limit, cursor=cursor
                 )
+            async with self.profile.session() as session:
+                if not limit:
+                    records = await OcaRecord.query(
+                        session=session, tag_filter=tag_filter, alt=True
+                    )
+                if expand:
+                    await self.load_bundles(session, records)
         else:
             # error
             self.logger.error("Profile does not have access to this function.")
         self.logger.info(f"< list_oca_records({tag_filter}): {len(records)}")
-        return records
+        return records, next_cursor
 
     async def find_or_new_oca_record(
         self, issuer_profile: Profile, oca_data: dict, update: bool = True
@@ -154,13 +345,10 @@ class OcaService:
         tag_filter = self.build_tag_filter(
             oca_data.get("schema_id"), oca_data.get("cred_def_id")
         )
-        post_filter = self.build_post_filter(public_info)
+        tag_filter.update(self.build_owner_filter(public_info))
         async with self.profile.session() as session:
             records = await OcaRecord.query(
-                session=session,
-                tag_filter=tag_filter,
-                post_filter_positive=post_filter,
-                alt=True,
+                session=session, tag_filter=tag_filter, alt=True
             )
         if len(records) > 1:
             raise StorageDuplicateError(
@@ -196,14 +384,98 @@ class OcaService:
             rec = await self.find_or_new_oca_record(issuer_profile, oca_data, True)
             try:
                 self.logger.debug(f"oca_record = {rec}")
-                async with self.profile.session() as session:
-                    await rec.save(session, reason="Create/Update OCA record")
+                async with self.profile.transaction() as txn:
+                    previous = await self.save_oca_record(
+                        txn, rec, reason="Create/Update OCA record"
+                    )
+                    await txn.commit()
+                if previous:
+                    await self.release_bundle(previous)
                 self.logger.info(f"< create_or_update_oca_record() = {rec}")
                 return rec
             except Exception as err:
                 self.logger.error("Error creating or updating OCA record.", err)
                 raise err
 
+    async def bulk_create_or_update_oca_records(
+        self, issuer_profile: Profile, items: List[dict]
+    ) -> List[dict]:
+        """Create or update many OCA records at once, return a result per item.
+
+        Items are validated against the caller's public DID, existing records
+        are found with one query and locked, all of them are saved in one
+        transaction.
+        Items that do not validate are reported and skipped.
+        """
+        self.logger.info(
+            f"> bulk_create_or_update_oca_records({issuer_profile}, {len(items)})"
+        )
+        public_did = await self.get_public_did(issuer_profile, True)
+        results = []
+        valid = []
+        for index, oca_data in enumerate(items):
+            try:
+                self.validate_oca_data(public_did, oca_data)
+            except ValidationError as err:
+                results.append(
+                    {"index": index, "success": False, "error": err.messages}
+                )
+                continue
+            results.append({"index": index, "success": True})
+            valid.append((index, oca_data))
+
+        released = set()
+        if valid:
+            tag_filter = {
+                "owner_did": public_did,
+                "cred_def_id": {"$in": list({d["cred_def_id"] for _, d in valid})},
+            }
+            async with self.profile.transaction() as txn:
+                existing = {}
+                found = await OcaRecord.query(txn, tag_filter=tag_filter)
+                # re-read under lock (in id order), they may be changing meanwhile
+                for oca_id in sorted(rec.oca_id for rec in found):
+                    try:
+                        rec = await OcaRecord.retrieve_by_id(
+                            txn, oca_id, for_update=True
+                        )
+                    except StorageNotFoundError:
+                        # deleted since the query
+                        continue
+                    key = (rec.schema_id, rec.cred_def_id)
+                    existing.setdefault(key, []).append(rec)
+                for index, oca_data in valid:
+                    key = (oca_data.get("schema_id"), oca_data.get("cred_def_id"))
+                    records = existing.setdefault(key, [])
+                    if len(records) > 1:
+                        results[index].update(
+                            success=False,
+                            error="More than one OCA record was found "
+                            "for the given criteria",
+                        )
+                        continue
+                    if records:
+                        rec = records[0]
+                    else:
+                        rec = OcaRecord(
+                            schema_id=key[0], cred_def_id=key[1], owner_did=public_did
+                        )
+                        records.append(rec)
+                    rec.url = oca_data.get("url")
+                    rec.bundle = oca_data.get("bundle")
+                    previous = await self.save_oca_record(
+                        txn, rec, reason="Bulk Create/Update OCA record"
+                    )
+                    if previous:
+                        released.add(previous)
+                    results[index]["oca_id"] = rec.oca_id
+                await txn.commit()
+
+        for bundle_hash in released:
+            await self.release_bundle(bundle_hash)
+        self.logger.info(f"< bulk_create_or_update_oca_records() = {len(valid)}")
+        return results
+
     async def read_oca_record(self, issuer_profile: Profile, oca_id: str):
         self.logger.info(f"> read_oca_record({issuer_profile}, {oca_id})")
         public_did = await self.get_public_did(issuer_profile, True)
@@ -213,17 +485,30 @@ class OcaService:
             if rec.owner_did != public_did:
                 raise PublicDIDMismatchError()
 
-            await rec.save(session)
+            await self.load_bundles(session, [rec])
         self.logger.info(f"< read_oca_record({oca_id}) = {rec}")
         return rec
 
+    async def read_oca_bundle(self, issuer_profile: Profile, oca_id: str) -> dict:
+        """Return the bundle of an OCA record, fetching it if it is only a url."""
+        self.logger.info(f"> read_oca_bundle({issuer_profile}, {oca_id})")
+        rec = await self.read_oca_record(issuer_profile, oca_id)
+        if rec.bundle is not None:
+            result = rec.bundle
+        elif rec.url:
+            result = await self._resolver.resolve(rec.url)
+        else:
+            raise StorageNotFoundError(f"OCA record {oca_id} has no bundle")
+        self.logger.info(f"< read_oca_bundle({oca_id})")
+        return result
+
     async def update_oca_record(
         self, issuer_profile: Profile, oca_id: str, oca_data: dict
     ):
         self.logger.info(f"> update_oca_record({issuer_profile}, {oca_id}, {oca_data})")
         public_did = await self.get_public_did(issuer_profile, True)
-        async with self.profile.session() as session:
-            rec = await OcaRecord.retrieve_by_id(session, oca_id, for_update=True)
+        async with self.profile.transaction() as txn:
+            rec = await OcaRecord.retrieve_by_id(txn, oca_id, for_update=True)
             # must exist, caller must be the owner...
             if rec.owner_did != public_did:
                 raise PublicDIDMismatchError()
@@ -234,7 +519,10 @@ class OcaService:
             rec.url = oca_data.get("url")
             rec.bundle = oca_data.get("bundle")
 
-            await rec.save(session)
+            previous = await self.save_oca_record(txn, rec)
+            await txn.commit()
+        if previous:
+            await self.release_bundle(previous)
         self.logger.info(f"< update_oca_record({oca_id}) = {rec}")
         return rec
 
@@ -255,5 +543,7 @@ class OcaService:
             except StorageNotFoundError:
                 # this is to be expected... do nothing, do not log
                 result = True
+        if rec.bundle_hash:
+            await self.release_bundle(rec.bundle_hash)
         self.logger.info(f"< delete_oca_record({oca_id}) = {result}")
         return result
@@ -20,9 +20,13 @@ from aries_cloudagent.messaging.valid import (
     UUIDFour,
 )
 from aries_cloudagent.storage.error import StorageNotFoundError, StorageError
-from marshmallow import fields, ValidationError
+from marshmallow import INCLUDE, fields, validate, ValidationError
 
+from ..innkeeper.pagination import MAX_LIMIT, PaginationError
+from ..innkeeper.responses import json_response, record_response
+from ..innkeeper.serializer import serialize_records
 from . import OcaService
+from .bundle_resolver import OcaBundleResolveError
 from .models import OcaRecordSchema
 from .oca_service import PublicDIDRequiredError, PublicDIDMismatchError
 
@@ -30,6 +34,9 @@ LOGGER = logging.getLogger(__name__)
 
 SWAGGER_CATEGORY = "oca"
 
+# admin route setting the public DID of the wallet
+PUBLIC_DID_PATH = "/wallet/did/public"
+
 
 def error_handler(func):
     @functools.wraps(func)
@@ -43,6 +50,10 @@ def error_handler(func):
             raise web.HTTPBadRequest(reason=err.roll_up) from err
         except PublicDIDMismatchError as err:
             raise web.HTTPUnauthorized(reason=err.roll_up) from err
+        except PaginationError as err:
+            raise web.HTTPBadRequest(reason=str(err)) from err
+        except OcaBundleResolveError as err:
+            raise web.HTTPBadGateway(reason=err.roll_up) from err
         except StorageNotFoundError as err:
             raise web.HTTPNotFound(reason=err.roll_up) from err
         except (StorageError, BaseModelError) as err:
@@ -60,6 +71,20 @@ class OcaRecordListQueryStringSchema(OpenAPISchema):
         example=INDY_CRED_DEF_ID_EXAMPLE, 
         validate=INDY_CRED_DEF_ID_VALIDATE
     )
+    expand = fields.Bool(
+        required=False,
+        description="Include the OCA bundles, not only their bundle_hash",
+    )
+    limit = fields.Int(
+        required=False,
+        description="Page size, all records are returned if not set",
+        example=100,
+        validate=validate.Range(min=1, max=MAX_LIMIT),
+    )
+    cursor = fields.Str(
+        required=False,
+        description="The next_cursor of the previous page",
+    )
 
 
 class OcaRecordListSchema(OpenAPISchema):
@@ -69,6 +94,10 @@ class OcaRecordListSchema(OpenAPISchema):
         fields.Nested(OcaRecordSchema()),
         description="List of OCA records",
     )
+    next_cursor = fields.Str(
+        required=False,
+        description="Cursor for the next page, absent on the last page",
+    )
 
 
 class AddOcaRecordRequestSchema(OpenAPISchema):
@@ -93,12 +122,55 @@ class AddOcaRecordRequestSchema(OpenAPISchema):
     )
 
 
+class BulkOcaRecordRequestSchema(OpenAPISchema):
+    """Request schema for adding or updating many oca records."""
+
+    records = fields.List(
+        fields.Nested(AddOcaRecordRequestSchema()),
+        required=True,
+        description="OCA records to create, or update if one exists for the "
+        "schema and cred def ids",
+    )
+
+
+class BulkOcaRecordResultSchema(OpenAPISchema):
+    """Result of one item of a bulk operation."""
+
+    index = fields.Int(required=True, description="Position of the item")
+    success = fields.Bool(
+        required=True,
+        description="True if the item was created or updated",
+    )
+    oca_id = fields.Str(
+        required=False, description="OCA Record identifier", example=UUIDFour.EXAMPLE
+    )
+    error = fields.Raw(required=False, description="Why the item was not saved")
+
+
+class BulkOcaRecordResponseSchema(OpenAPISchema):
+    """Response schema for bulk oca record operations."""
+
+    results = fields.List(
+        fields.Nested(BulkOcaRecordResultSchema()),
+        description="Result of each item, in request order",
+    )
+
+
 class OcaIdMatchInfoSchema(OpenAPISchema):
     oca_id = fields.Str(
         description="OCA Record identifier", required=True, example=UUIDFour.EXAMPLE
     )
 
 
+class OcaBundleSchema(OpenAPISchema):
+    """Response schema for an OCA Bundle."""
+
+    class Meta:
+        """OcaBundleSchema Meta."""
+
+        unknown = INCLUDE
+
+
 class OcaRecordOperationResponseSchema(OpenAPISchema):
     """Response schema for simple operations."""
 
@@ -119,7 +191,27 @@ async def oca_record_create(request: web.BaseRequest):
     body = await request.json()
     rec = await service.create_or_update_oca_record(context.profile, body)
 
-    return web.json_response(rec.serialize())
+    return json_response(request, rec.serialize())
+
+
+@docs(tags=[SWAGGER_CATEGORY], summary="Add or update many OCA Records")
+@request_schema(BulkOcaRecordRequestSchema())
+@response_schema(BulkOcaRecordResponseSchema(), 200, description="")
+@error_handler
+async def oca_record_bulk(request: web.BaseRequest):
+    context: AdminRequestContext = request["context"]
+    service = context.inject(OcaService)
+
+    body = await request.json()
+    records = body.get("records") or []
+    if len(records) > service.bulk_max_records:
+        raise web.HTTPBadRequest(
+            reason=f"Too many records, at most {service.bulk_max_records} "
+            "per request."
+        )
+    results = await service.bulk_create_or_update_oca_records(context.profile, records)
+
+    return json_response(request, {"results": results})
 
 
 @docs(tags=[SWAGGER_CATEGORY], summary="Read OCA Record")
@@ -133,7 +225,25 @@ async def oca_record_read(request: web.BaseRequest):
     oca_id = request.match_info["oca_id"]
     rec = await service.read_oca_record(context.profile, oca_id)
     LOGGER.info(f"rec = {rec}")
-    return web.json_response(rec.serialize())
+    return record_response(request, rec)
+
+
+@docs(
+    tags=[SWAGGER_CATEGORY],
+    summary="Read the OCA Bundle of an OCA Record",
+    description="Inline bundles are returned as stored, bundles referenced by url "
+    "are fetched (and cached) by the server.",
+)
+@match_info_schema(OcaIdMatchInfoSchema())
+@response_schema(OcaBundleSchema(), 200, description="")
+@error_handler
+async def oca_bundle_read(request: web.BaseRequest):
+    context: AdminRequestContext = request["context"]
+    service = context.inject(OcaService)
+
+    oca_id = request.match_info["oca_id"]
+    bundle = await service.read_oca_bundle(context.profile, oca_id)
+    return json_response(request, bundle)
 
 
 @docs(tags=[SWAGGER_CATEGORY], summary="Update OCA Record")
@@ -148,7 +258,7 @@ async def oca_record_update(request: web.BaseRequest):
     oca_id = request.match_info["oca_id"]
     body = await request.json()
     rec = await service.update_oca_record(context.profile, oca_id, body)
-    return web.json_response(rec.serialize())
+    return json_response(request, rec.serialize())
 
 
 @docs(tags=[SWAGGER_CATEGORY], summary="Delete OCA Record")
@@ -160,7 +270,7 @@ async def oca_record_delete(request: web.BaseRequest):
     service = context.inject(OcaService)
     oca_id = request.match_info["oca_id"]
     success = await service.delete_oca_record(context.profile, oca_id)
-    return web.json_response({"success": success})
+    return json_response(request, {"success": success})
 
 
 @docs(
@@ -173,20 +283,55 @@ async def oca_record_list(request: web.BaseRequest):
     context: AdminRequestContext = request["context"]
     service = context.inject(OcaService)
     cred_def_id = request.query.get("cred_def_id")
-    records = await service.list_oca_records(context.profile, None, cred_def_id)
-    results = [record.serialize() for record in records]
-
-    return web.json_response({"results": results})
+    expand = request.query.get("expand", "false").lower() == "true"
+    limit = request.query.get("limit")
+    try:
+        limit = int(limit) if limit else None
+    except ValueError as err:
+        raise web.HTTPBadRequest(reason=str(err)) from err
+    records, next_cursor = await service.list_oca_records(
+        context.profile,
+        None,
+        cred_def_id,
+        expand,
+        limit=limit,
+        cursor=request.query.get("cursor"),
+    )
+    response = {"results": serialize_records(records)}
+    if next_cursor:
+        response["next_cursor"] = next_cursor
+
+    return json_response(request, response)
+
+
+@web.middleware
+async def public_did_middleware(request: web.BaseRequest, handler):
+    """Evict the cached public DID of a wallet when it sets a new one."""
+    response = await handler(request)
+    if (
+        request.method == "POST"
+        and request.path == PUBLIC_DID_PATH
+        and response.status == 200
+    ):
+        context: AdminRequestContext = request["context"]
+        service = context.inject_or(OcaService)
+        if service:
+            # for an endorsed DID the promotion may still be pending
+            await service.evict_public_did(context.profile, request.query.get("did"))
+    return response
 
 
 async def register(app: web.Application):
     """Register routes."""
     LOGGER.info("> registering routes")
+    app.middlewares.append(public_did_middleware)
     app.add_routes(
         [
             web.get("/oca", oca_record_list, allow_head=False),
             web.post("/oca", oca_record_create),
+            web.post("/oca/bulk", oca_record_bulk),
             web.get("/oca/{oca_id}", oca_record_read, allow_head=False),
+            web.get("/oca/{oca_id}/bundle", oca_bundle_read, allow_head=False),
             web.put("/oca/{oca_id}", oca_record_update),
             web.delete("/oca/{oca_id}", oca_record_delete),
         ]
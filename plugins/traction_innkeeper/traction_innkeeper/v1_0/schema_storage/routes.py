@@ -11,6 +11,12 @@ from aries_cloudagent.messaging.models.openapi import OpenAPISchema
 from aries_cloudagent.storage.error import StorageNotFoundError, StorageError
 from marshmallow import fields
 
+from ..innkeeper.responses import (
+    CACHE_REVALIDATE,
+    json_response,
+    record_response,
+)
+from ..innkeeper.serializer import serialize_records
 from .models import SchemaStorageRecordSchema
 from .schema_storage_service import SchemaStorageService
 
@@ -75,9 +81,9 @@ async def schema_storage_list(request: web.BaseRequest):
     tag_filter = {}
     post_filter = {}
     records = await storage_srv.list_items(profile, tag_filter, post_filter)
-    results = [record.serialize() for record in records]
+    results = serialize_records(records)
 
-    return web.json_response({"results": results})
+    return json_response(request, {"results": results})
 
 
 @docs(
@@ -94,7 +100,7 @@ async def schema_storage_add(request: web.BaseRequest):
 
     record = await storage_srv.add_item(profile, body["schema_id"])
 
-    return web.json_response(record.serialize())
+    return json_response(request, record.serialize())
 
 
 @docs(
@@ -109,9 +115,17 @@ async def schema_storage_get(request: web.BaseRequest):
     storage_srv = context.inject_or(SchemaStorageService)
     schema_id = request.match_info["schema_id"]
 
+    # read first, the record may have been deleted (or be another tenant's)
     record = await storage_srv.read_item(profile, schema_id)
-
-    return web.json_response(record.serialize())
+    if not record:
+        raise web.HTTPNotFound(reason=f"Schema {schema_id} not found.")
+
+    return record_response(
+        request,
+        record,
+        cache_control=CACHE_REVALIDATE,
+        wallet_id=profile.settings.get("wallet.id"),
+    )
 
 
 @docs(
@@ -128,7 +142,7 @@ async def schema_storage_remove(request: web.BaseRequest):
 
     success = await storage_srv.remove_item(profile, schema_id)
 
-    return web.json_response({"success": success})
+    return json_response(request, {"success": success})
 
 
 @docs(
@@ -142,9 +156,9 @@ async def schema_storage_sync_created(request: web.BaseRequest):
     storage_srv = context.inject_or(SchemaStorageService)
 
     records = await storage_srv.sync_created(profile)
-    results = [record.serialize() for record in records]
+    results = serialize_records(records)
 
-    return web.json_response({"results": results})
+    return json_response(request, {"results": results})
 
 
 async def register(app: web.Application):
@@ -17,13 +17,18 @@ from aries_cloudagent.multitenant.admin.routes import (
 )
 from aries_cloudagent.multitenant.base import BaseMultitenantManager
 from aries_cloudagent.storage.error import StorageNotFoundError
-from aries_cloudagent.version import __version__
 from aries_cloudagent.wallet.models.wallet_record import (
     WalletRecordSchema,
     WalletRecord,
 )
 from marshmallow import fields, validate
 
+from ..innkeeper.responses import (
+    json_response,
+    prepared_response,
+    record_etag,
+    record_response,
+)
 from ..innkeeper.routes import (
     error_handler,
     TenantAuthenticationApiIdMatchInfoSchema,
@@ -32,6 +37,8 @@ from ..innkeeper.routes import (
     TenantAuthenticationsApiResponseSchema,
     TenantAuthenticationApiOperationResponseSchema,
 )
+from ..innkeeper.invalidation import TOPIC_API_KEY
+from ..innkeeper.serializer import serialize_records
 from ..innkeeper.tenant_manager import TenantManager
 from ..innkeeper.models import (
     TenantAuthenticationApiRecord,
@@ -98,7 +105,7 @@ async def tenant_self(request: web.BaseRequest):
         rec = await TenantRecord.query_by_wallet_id(session, wallet_id)
         LOGGER.info(rec)
 
-    return web.json_response(rec.serialize())
+    return record_response(request, rec)
 
 
 @docs(tags=[SWAGGER_CATEGORY], summary="Get a tenant subwallet")
@@ -119,7 +126,7 @@ async def tenant_wallet_get(request: web.BaseRequest):
         wallet_record = await WalletRecord.retrieve_by_id(session, wallet_id)
     result = format_wallet_record(wallet_record)
 
-    return web.json_response(result)
+    return json_response(request, result, etag=record_etag(wallet_record))
 
 
 @docs(tags=[SWAGGER_CATEGORY], summary="Get tenant setting")
@@ -137,14 +144,16 @@ async def tenant_config_get(request: web.BaseRequest):
     tenant_issuer_flag = tenant_record.auto_issuer
     enable_ledger_switch = tenant_record.enable_ledger_switch
     curr_ledger_id = tenant_record.curr_ledger_id
-    return web.json_response(
+    return json_response(
+        request,
         {
             "connect_to_endorser": endorser_config,
             "create_public_did": public_did_config,
             "auto_issuer": tenant_issuer_flag,
             "enable_ledger_switch": enable_ledger_switch,
             "curr_ledger_id": curr_ledger_id,
-        }
+        },
+        etag=record_etag(tenant_record),
     )
 
 
@@ -164,10 +173,11 @@ async def tenant_config_ledger_id_set(request: web.BaseRequest):
         if curr_ledger_id:
             tenant_record.curr_ledger_id = curr_ledger_id
         await tenant_record.save(session)
-    return web.json_response(
+    return json_response(
+        request,
         {
             "ledger_id": curr_ledger_id,
-        }
+        },
     )
 
 
@@ -227,7 +237,7 @@ async def tenant_wallet_update(request: web.BaseRequest):
     wallet_record = await multitenant_mgr.update_wallet(wallet_id, settings)
     result = format_wallet_record(wallet_record)
 
-    return web.json_response(result)
+    return json_response(request, result)
 
 
 @docs(tags=[SWAGGER_CATEGORY], summary="Update tenant email")
@@ -252,7 +262,7 @@ async def tenant_email_update(request: web.BaseRequest):
         rec.contact_email = contact_email
         await rec.save(session, reason="updated email")
 
-    return web.json_response(body)
+    return json_response(request, body)
 
 
 @docs(tags=[SWAGGER_CATEGORY], summary="Create API Key Record")
@@ -281,11 +291,12 @@ async def tenant_api_key(request: web.BaseRequest):
     except TenantApiKeyException as err:
         raise web.HTTPConflict(reason=str(err))
 
-    return web.json_response(
+    return json_response(
+        request,
         {
             "tenant_authentication_api_id": tenant_authentication_api_id,
             "api_key": api_key,
-        }
+        },
     )
 
 
@@ -317,7 +328,7 @@ async def tenant_api_key_get(request: web.BaseRequest):
         if rec.tenant_id != tenant_id:
             raise web.HTTPNotFound(reason="No such record")
 
-    return web.json_response(rec.serialize())
+    return json_response(request, rec.serialize())
 
 
 @docs(tags=[SWAGGER_CATEGORY], summary="List tenant API Key Records")
@@ -340,9 +351,9 @@ async def tenant_api_key_list(request: web.BaseRequest):
         records = await TenantAuthenticationApiRecord.query_by_tenant_id(
             session, tenant_id
         )
-    results = [record.serialize() for record in records]
+    results = serialize_records(records)
 
-    return web.json_response({"results": results})
+    return json_response(request, {"results": results})
 
 
 @docs(tags=[SWAGGER_CATEGORY], summary="Delete API Key")
@@ -375,6 +386,10 @@ async def tenant_api_key_delete(request: web.BaseRequest):
             raise web.HTTPNotFound(reason="No such record")
 
         await rec.delete_record(session)
+        await mgr.invalidation.publish(
+            TOPIC_API_KEY,
+            {"tenant_authentication_api_id": rec.tenant_authentication_api_id},
+        )
 
         try:
             await TenantAuthenticationApiRecord.retrieve_by_auth_api_id(
@@ -384,7 +399,7 @@ async def tenant_api_key_delete(request: web.BaseRequest):
             # this is to be expected... do nothing, do not log
             result = True
 
-    return web.json_response({"success": result})
+    return json_response(request, {"success": result})
 
 
 @docs(tags=[SWAGGER_CATEGORY], summary="Fetch the server configuration")
@@ -395,45 +410,8 @@ async def tenant_server_config_handler(request: web.BaseRequest):
     # use base/root profile for server config, use Tenant Manager profile
     # this is to not get the Innkeeper tenant's config, but the server cfg
     mgr = context.inject(TenantManager)
-    profile = mgr.profile
 
-    config = {
-        k: (
-           profile.context.settings[k]
-        )
-        for k in profile.context.settings
-        if k
-        not in [
-            "default_label",
-            "admin.admin_api_key",
-            "admin.admin_insecure_mode",
-            "admin.enabled",
-            "admin.host",
-            "admin.port",
-            "admin.webhook_urls",
-            "admin.admin_client_max_request_size",
-            "multitenant.jwt_secret",
-            "wallet.key",
-            "wallet.name",
-            "multitenant.wallet_name",
-            "wallet.storage_type",
-            "wallet.storage_config",
-            "wallet.rekey",
-            "wallet.seed",
-            "wallet.storage_creds",
-        ]
-    }
-    try:
-      del config["plugin_config"]["traction_innkeeper"]["innkeeper_wallet"]
-      config["config"]["ledger.ledger_config_list"] = [
-        {k: v for k, v in d.items() if k != "genesis_transactions"}
-        for d in config["config"]["ledger.ledger_config_list"]
-      ]
-    except KeyError as e:
-      LOGGER.warn(f"The key to be removed: '{e.args[0]}' is missing from the dictionary.")
-    config["version"] = __version__
-
-    return web.json_response({"config": config})
+    return prepared_response(request, mgr.server_config.tenant)
 
 
 async def register(app: web.Application):